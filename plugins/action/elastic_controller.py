@@ -0,0 +1,178 @@
+# Copyright 2021 Expedient
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+## Runs the collection's modules inside the controller's task worker instead of shipping them to the target.
+## Every module is a plain Kibana, Elasticsearch or ECE API client, so when a task runs on the controller anyway
+## (localhost, delegate_to: localhost, connection: local) building the AnsiballZ payload, writing it out and starting a
+## new interpreter for it is pure overhead. The module source is executed in the worker with the task's arguments
+## and environment, and its exit_json/fail_json output is read back as the task result.
+##
+## Each module has an action plugin of the same name that only imports ActionModule from here. Tasks still run the
+## module the usual way when the connection is not local, with become, async, an explicit python interpreter other
+## than the controller's, for modules without a main() or with EXPEDIENT_CONTROLLER_MODULES=0 in the task environment
+## or on the controller.
+## Connections are pooled for the run of the module like they are on a target. Every task has its own worker process,
+## so keeping them open across tasks still takes EXPEDIENT_SESSION_DAEMON=1, which stays opt-in.
+
+import ast
+import importlib.util
+import io
+import json
+import os
+import sys
+import traceback
+from contextlib import redirect_stdout
+
+from ansible.module_utils import basic
+from ansible.plugins.action import ActionBase
+## Older Ansible releases than these imports need (meta/runtime.yml still allows 2.9.10) run every module the usual way
+try:
+  from ansible.module_utils.common.json import AnsibleJSONEncoder
+  from ansible.module_utils.json_utils import _filter_non_json_lines
+  HAS_CONTROLLER_EXECUTION = True
+except ImportError:
+  HAS_CONTROLLER_EXECUTION = False
+
+LOCAL_CONNECTIONS = ('local', 'ansible.builtin.local', 'ansible.legacy.local')
+MODULES_PACKAGE = __name__.rsplit('.action.', 1)[0] + '.modules'
+
+_entry_points = {}
+
+def is_controller_execution_enabled(environment):
+  setting = environment.get('EXPEDIENT_CONTROLLER_MODULES', os.environ.get('EXPEDIENT_CONTROLLER_MODULES', '1'))
+  return setting.lower() not in ('0', 'false', 'no', 'off')
+
+def has_main(module_spec):
+  """
+  Returns True when the module source defines a top level main(). Modules doing their work at import time cannot be
+  run in-process without running it twice, so they are left to the usual module execution.
+  """
+  if module_spec.origin not in _entry_points:
+    try:
+      with open(module_spec.origin, 'rb') as module_file:
+        module_tree = ast.parse(module_file.read(), module_spec.origin)
+    except (OSError, SyntaxError, TypeError):
+      _entry_points[module_spec.origin] = False
+    else:
+      _entry_points[module_spec.origin] = any(isinstance(node, ast.FunctionDef) and node.name == 'main' for node in module_tree.body)
+  return _entry_points[module_spec.origin]
+
+def find_module_spec(module_name):
+  try:
+    return importlib.util.find_spec(f'{MODULES_PACKAGE}.{module_name}')
+  except (ImportError, ValueError):
+    return None
+
+class ActionModule(ActionBase):
+  TRANSFERS_FILES = False
+
+  def get_module_name(self):
+    return self._task.action.rsplit('.', 1)[-1]
+
+  def runs_on_controller(self, task_vars, environment):
+    """
+    Returns True when the task can run in this process: the connection is local and nothing about the task needs a
+    separate module process.
+    """
+    if not is_controller_execution_enabled(environment):
+      return False
+    connection_name = getattr(self._connection, '_load_name', None) or getattr(self._connection, 'transport', None)
+    if connection_name not in LOCAL_CONNECTIONS:
+      return False
+    if self._task.async_val or self._play_context.become:
+      return False
+    host_vars = task_vars
+    if self._task.delegate_to:
+      host_vars = task_vars.get('ansible_delegated_vars', {}).get(self._task.delegate_to, task_vars)
+    python_interpreter = host_vars.get('ansible_python_interpreter')
+    if python_interpreter and not str(python_interpreter).startswith('auto'):
+      python_interpreter = self._templar.template(python_interpreter)
+      if os.path.realpath(os.path.expanduser(str(python_interpreter))) != os.path.realpath(sys.executable):
+        return False
+    return True
+
+  def get_task_environment(self):
+    """
+    Returns the task's environment keyword as a dict, the variables the module would have been started with.
+    """
+    environment = {}
+    self._compute_environment_string(environment)
+    return {str(name): str(value) for name, value in environment.items()}
+
+  def run_module(self, module_spec, module_args, environment):
+    """
+    Executes a fresh copy of the module and runs its main() with module_args, as AnsibleModule reads them when the
+    module is started by Ansible. Returns the module's output parsed as the task result.
+
+    variables:
+      module_spec(ModuleSpec): Spec of the module under the collection's modules package
+      module_args(dict): Task arguments including the _ansible_* internal arguments
+      environment(dict): Environment variables set while the module runs
+
+    A fresh copy is executed on every run so module level state (results dicts and such) never leaks between tasks.
+    """
+    module_stdout = io.StringIO()
+    previous_args = basic._ANSIBLE_ARGS
+    previous_environment = {name: os.environ.get(name) for name in environment}
+    basic._ANSIBLE_ARGS = json.dumps({'ANSIBLE_MODULE_ARGS': module_args}, cls=AnsibleJSONEncoder, vault_to_text=True).encode('utf-8')
+    os.environ.update(environment)
+    try:
+      with redirect_stdout(module_stdout):
+        module_code = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module_code)
+        module_code.main()
+    except SystemExit:
+      pass
+    except Exception as e:
+      return {
+        'failed': True,
+        'msg': f'MODULE FAILURE: {type(e).__name__}: {e}',
+        'exception': traceback.format_exc(),
+        'module_stdout': module_stdout.getvalue()
+      }
+    finally:
+      basic._ANSIBLE_ARGS = previous_args
+      for name, value in previous_environment.items():
+        if value is None:
+          os.environ.pop(name, None)
+        else:
+          os.environ[name] = value
+
+    output = module_stdout.getvalue()
+    try:
+      results = json.loads(_filter_non_json_lines(output)[0])
+    except ValueError:
+      return {'failed': True, 'msg': 'MODULE FAILURE: the module did not return JSON', 'module_stdout': output}
+    results['_ansible_parsed'] = True
+    return results
+
+  def run(self, tmp=None, task_vars=None):
+    task_vars = task_vars or {}
+    result = super(ActionModule, self).run(tmp, task_vars)
+    del tmp
+
+    if not HAS_CONTROLLER_EXECUTION:
+      result.update(self._execute_module(module_args=self._task.args, task_vars=task_vars))
+      return result
+
+    module_spec = find_module_spec(self.get_module_name())
+    environment = self.get_task_environment()
+    if module_spec is None or not has_main(module_spec) or not self.runs_on_controller(task_vars, environment):
+      result.update(self._execute_module(module_args=self._task.args, task_vars=task_vars))
+      return result
+
+    module_args = self._task.args.copy()
+    self._update_module_args(self.get_module_name(), module_args, task_vars)
+    result.update(self.run_module(module_spec, module_args, environment))
+    return result
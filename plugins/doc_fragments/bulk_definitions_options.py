@@ -0,0 +1,50 @@
+# Copyright 2021 Expedient
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# -*- coding: utf-8 -*-
+
+
+# Options for managing many index templates, component templates or ILM policies in one task
+
+class ModuleDocFragment(object):
+  DOCUMENTATION = r'''
+options:
+  definitions:
+    description:
+    - Objects to manage declaratively in one task instead of the single object options
+    - All existing objects are fetched with one request, only missing or changed ones are written
+    - Results list the created, updated and unchanged names, with the differences found per updated object
+    type: list
+    elements: dict
+    suboptions:
+      name:
+        description: Object name
+        type: str
+        required: true
+      body:
+        description: Body as it would be PUT to the API, for ILM policies either the policy or {policy:...}
+        type: dict
+        required: true
+  definitions_dir:
+    description:
+    - Directory of .json, .yml and .yaml files to manage along with definitions, one object per file
+    - The file name without its extension is the object name and the content its body
+    type: path
+  definitions_concurrency:
+    description:
+    - Number of changed objects written at the same time
+    default: 8
+    type: int
+
+'''
@@ -0,0 +1,37 @@
+# Copyright 2021 Expedient
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# -*- coding: utf-8 -*-
+
+# Options for running a module against many ECE deployments in one task
+
+class ModuleDocFragment(object):
+  DOCUMENTATION = r'''
+options:
+  deployments:
+    description:
+    - List of deployment_info dicts to run the same operation against through the ECE API proxy, instead of the single deployment_info
+    - All deployments share one ECE login and connection pool, results are returned per deployment in C(deployments)
+    - A failure on one deployment does not stop the others, the task fails at the end and lists them in C(failed_deployments)
+    - Each entry takes the deployment_info keys, deployment_name is looked up when deployment_id is not given
+    - host, port, username and password are the ECE ones when this is used
+    type: list
+    elements: dict
+  deployment_concurrency:
+    description:
+    - Number of deployments worked on at the same time when deployments is set
+    default: 8
+    type: int
+
+'''
@@ -45,5 +45,12 @@ options:
     - Should always be True in prod
     default: True
     type: bool
+  token_cache_path:
+    description:
+    - File the ECE bearer token is cached in between module runs, so that every task does not have to log in again
+    - The file is created with mode 0600, tokens are kept until they expire or ECE rejects them
+    - Defaults to the EXPEDIENT_ECE_TOKEN_CACHE environment variable, or ~/.ansible/tmp/expedient_elastic_ece_tokens.json
+    - Set to an empty string to disable the cache
+    type: str
 
 '''
\ No newline at end of file
@@ -0,0 +1,38 @@
+# Copyright 2021 Expedient
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# -*- coding: utf-8 -*-
+
+
+# Options for the Elastic Package Registry manifest cache used when creating package policies
+
+class ModuleDocFragment(object):
+  DOCUMENTATION = r'''
+options:
+  epr_revalidate_after:
+    description:
+    - Seconds a cached Elastic Package Registry manifest is used before it is revalidated with a conditional request
+    - Manifests are cached per package and version in the EXPEDIENT_EPR_CACHE directory, or ~/.ansible/tmp/expedient_elastic_epr
+    - A cached manifest is also used when the registry cannot be reached
+    - Set to 0 to revalidate on every run
+    default: 86400
+    type: int
+  epr_offline:
+    description:
+    - Never query the Elastic Package Registry, cached manifests are used whatever their age
+    - Fails when the manifest of the integration version has not been cached yet
+    default: false
+    type: bool
+
+'''
@@ -0,0 +1,36 @@
+# Copyright 2021 Expedient
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# -*- coding: utf-8 -*-
+
+# Options for how the Kibana version is found when connecting to Kibana directly
+
+class ModuleDocFragment(object):
+  DOCUMENTATION = r'''
+options:
+  kibana_version:
+    description:
+    - Kibana version, for example from a fact gathered earlier in the play
+    - When set, Kibana's status API is not queried for the version
+    type: str
+  version_cache_ttl:
+    description:
+    - Seconds the Kibana version found through the status API is cached for, per host and port
+    - The cache is kept in the EXPEDIENT_KIBANA_VERSION_CACHE file, or ~/.ansible/tmp/expedient_elastic_kibana_versions.json
+    - A cached version Kibana rejects as out of date is refreshed automatically
+    - Set to 0 to query the status API on every run
+    default: 3600
+    type: int
+
+'''
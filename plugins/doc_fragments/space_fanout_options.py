@@ -0,0 +1,35 @@
+# Copyright 2021 Expedient
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# -*- coding: utf-8 -*-
+
+# Options for running a Kibana operation across several spaces in one task
+
+class ModuleDocFragment(object):
+  DOCUMENTATION = r'''
+options:
+  space_ids:
+    description:
+    - List of space ids to run the operation in, instead of the single space_id
+    - C(all) runs it in every space in Kibana
+    - Results are returned per space in C(spaces), a failure in one space does not stop the others
+    type: list
+    elements: str
+  space_concurrency:
+    description:
+    - Number of spaces worked on at the same time when space_ids is set
+    default: 8
+    type: int
+
+'''
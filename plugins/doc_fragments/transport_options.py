@@ -0,0 +1,38 @@
+# Copyright 2021 Expedient
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# -*- coding: utf-8 -*-
+
+# Options for the shared keep-alive connection pool
+
+class ModuleDocFragment(object):
+  DOCUMENTATION = r'''
+options:
+  pool_connections:
+    description:
+    - Number of distinct host/port/verify_ssl_cert connection pools to keep open during the module run
+    - The least recently used pool is closed when the limit is reached
+    - With EXPEDIENT_SESSION_DAEMON=1 in the task environment, requests go through a local daemon that keeps its
+      connections open across every task of the play, started by the first task and stopped after
+      EXPEDIENT_SESSION_DAEMON_IDLE seconds (default 600) without requests
+    default: 10
+    type: int
+  pool_maxsize:
+    description:
+    - Maximum number of idle keep-alive connections kept per host
+    - Requests beyond this still run, their connections are just closed instead of being reused
+    default: 10
+    type: int
+
+'''
@@ -0,0 +1,153 @@
+# Copyright 2021 Expedient
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+## Canonical forms of index templates, component templates and ILM policies, so that the body a task would PUT can be
+## compared with what Elasticsearch returns for the live object. Elasticsearch echoes these back normalized: settings
+## nested under "index" with every value a string, defaults filled in, empty sections dropped. Both sides are brought
+## to the same form before comparing, and key order never matters.
+
+from json import dumps
+
+INDEX_TEMPLATE_DEFAULTS = {'composed_of': []}
+DATA_STREAM_DEFAULTS = {'hidden': False, 'allow_custom_routing': False}
+ILM_PHASE_DEFAULTS = {'min_age': '0ms'}
+ILM_ACTION_DEFAULTS = {
+  'delete': {'delete_searchable_snapshot': True},
+  'searchable_snapshot': {'force_merge_index': True},
+  'shrink': {'allow_write_after_shrink': False},
+  'migrate': {'enabled': True}
+}
+
+def is_empty(value):
+  return value is None or value == {} or value == []
+
+def stringify_setting(value):
+  if isinstance(value, bool):
+    return 'true' if value else 'false'
+  if isinstance(value, list):
+    return [stringify_setting(list_value) for list_value in value]
+  return str(value)
+
+def flatten_settings(settings, prefix = ''):
+  """
+  Flattens index settings to dotted keys under "index." with string values, the form Elasticsearch compares them in.
+  {"number_of_shards": 1} and {"index": {"number_of_shards": "1"}} both become {"index.number_of_shards": "1"}.
+  """
+  flat_settings = {}
+  for setting_key, setting_value in (settings or {}).items():
+    setting_key = f'{prefix}{setting_key}'
+    if isinstance(setting_value, dict):
+      flat_settings.update(flatten_settings(setting_value, f'{setting_key}.'))
+    elif setting_value is not None:
+      flat_settings[setting_key] = stringify_setting(setting_value)
+  if prefix:
+    return flat_settings
+  return {(setting_key if setting_key.startswith('index.') else f'index.{setting_key}'): setting_value
+          for setting_key, setting_value in flat_settings.items()}
+
+def canonicalize_mappings(mappings):
+  """
+  Drops the "type": "object" Elasticsearch leaves out of fields that have properties, and empty sections.
+  """
+  if isinstance(mappings, dict):
+    canonical_mappings = {}
+    for mapping_key, mapping_value in mappings.items():
+      mapping_value = canonicalize_mappings(mapping_value)
+      if not is_empty(mapping_value):
+        canonical_mappings[mapping_key] = mapping_value
+    if canonical_mappings.get('type') == 'object' and 'properties' in canonical_mappings:
+      canonical_mappings.pop('type')
+    return canonical_mappings
+  if isinstance(mappings, list):
+    return [canonicalize_mappings(mapping_value) for mapping_value in mappings]
+  return mappings
+
+def canonicalize_template(template):
+  """
+  Canonical form of the template section (settings, mappings, aliases) of an index or component template.
+  """
+  template = template or {}
+  canonical_template = {
+    'settings': flatten_settings(template.get('settings')),
+    'mappings': canonicalize_mappings(template.get('mappings')),
+    'aliases': {alias_name: {alias_key: alias_value for alias_key, alias_value in (alias or {}).items() if not is_empty(alias_value)}
+                for alias_name, alias in (template.get('aliases') or {}).items()}
+  }
+  if 'lifecycle' in template:
+    canonical_template['lifecycle'] = template['lifecycle']
+  return {template_key: template_value for template_key, template_value in canonical_template.items() if not is_empty(template_value)}
+
+def strip_defaults(values, defaults):
+  return {value_key: value for value_key, value in (values or {}).items()
+          if not is_empty(value) and not (value_key in defaults and defaults[value_key] == value)}
+
+def canonicalize_index_template(index_template):
+  """
+  Canonical form of an index template body, as PUT to _index_template or found under "index_template" in a GET.
+  """
+  canonical_template = strip_defaults(index_template, INDEX_TEMPLATE_DEFAULTS)
+  canonical_template.pop('name', None)
+  if 'index_patterns' in canonical_template:
+    patterns = canonical_template['index_patterns']
+    canonical_template['index_patterns'] = sorted(set([patterns] if isinstance(patterns, str) else patterns))
+  if 'template' in canonical_template:
+    canonical_template['template'] = canonicalize_template(canonical_template['template'])
+  canonical_template = {template_key: template_value for template_key, template_value in canonical_template.items() if not is_empty(template_value)}
+  if (index_template or {}).get('data_stream') is not None:
+    ## {} is how a data stream template is asked for, so it is kept even when only defaults are left
+    canonical_template['data_stream'] = strip_defaults(index_template['data_stream'], DATA_STREAM_DEFAULTS)
+  return canonical_template
+
+def canonicalize_component_template(component_template):
+  """
+  Canonical form of a component template body, as PUT to _component_template or found under "component_template" in a GET.
+  """
+  canonical_template = strip_defaults(component_template, {})
+  canonical_template.pop('name', None)
+  if 'template' in canonical_template:
+    canonical_template['template'] = canonicalize_template(canonical_template['template'])
+  return {template_key: template_value for template_key, template_value in canonical_template.items() if not is_empty(template_value)}
+
+def canonicalize_ilm_policy(policy):
+  """
+  Canonical form of an ILM policy, the "policy" object of a PUT to _ilm/policy or of a GET. Actions are kept even when
+  they have no options, {"readonly": {}} is a complete action.
+  """
+  canonical_phases = {}
+  for phase_name, phase in ((policy or {}).get('phases') or {}).items():
+    canonical_phase = strip_defaults({phase_key: phase_value for phase_key, phase_value in (phase or {}).items() if phase_key != 'actions'}, ILM_PHASE_DEFAULTS)
+    canonical_phase['actions'] = {action_name: strip_defaults(action, ILM_ACTION_DEFAULTS.get(action_name, {}))
+                                  for action_name, action in ((phase or {}).get('actions') or {}).items()}
+    canonical_phases[phase_name] = canonical_phase
+  canonical_policy = {'phases': canonical_phases}
+  if not is_empty((policy or {}).get('_meta')):
+    canonical_policy['_meta'] = policy['_meta']
+  return canonical_policy
+
+def canonical_json(value):
+  """
+  Serializes an already canonicalized value with sorted keys, equal objects always give the same string.
+  """
+  return dumps(value, sort_keys = True, separators = (',', ':'))
+
+def get_differences(before, after, path = ''):
+  """
+  Returns the dotted paths at which two canonicalized objects differ.
+  """
+  if isinstance(before, dict) and isinstance(after, dict):
+    differences = []
+    for key in sorted(set(before) | set(after)):
+      differences += get_differences(before.get(key), after.get(key), f'{path}.{key}' if path else key)
+    return differences
+  return [] if before == after else [path]
@@ -0,0 +1,82 @@
+# Copyright 2021 Expedient
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+## Loads the object definitions (index templates, component templates, ILM policies) a bulk task manages, from the
+## definitions option and from a directory holding one JSON or YAML file per object.
+
+import os
+from json import loads
+from yaml import load
+try:
+    from yaml import CLoader as Loader
+except ImportError:
+    from yaml import Loader
+
+DEFINITION_FILE_EXTENSIONS = ('.json', '.yml', '.yaml')
+
+def load_definition_file(path):
+  with open(path) as definition_file:
+    if path.endswith('.json'):
+      return loads(definition_file.read())
+    return load(definition_file, Loader=Loader)
+
+def load_definitions(definitions = None, definitions_dir = None):
+  """
+  Returns the definitions as a list of {'name': ..., 'body': ...}.
+
+  variables:
+    definitions(list): {'name': ..., 'body': ...} dicts given inline
+    definitions_dir(str): Directory of .json, .yml and .yaml files, each file's name without its extension is the object
+                          name and its content the body
+
+  A name defined twice is an error rather than one definition silently replacing the other.
+  """
+  loaded_definitions = []
+  for definition in definitions or []:
+    if not definition.get('name') or not isinstance(definition.get('body'), dict):
+      raise ValueError(f'definitions need a name and a body: {definition}')
+    loaded_definitions.append({'name': definition['name'], 'body': definition['body']})
+  if definitions_dir:
+    definitions_dir = os.path.expanduser(definitions_dir)
+    for file_name in sorted(os.listdir(definitions_dir)):
+      definition_name, extension = os.path.splitext(file_name)
+      if extension in DEFINITION_FILE_EXTENSIONS:
+        body = load_definition_file(os.path.join(definitions_dir, file_name))
+        ## An empty file loads as None and a list is not one object, neither is a body
+        if not isinstance(body, dict):
+          raise ValueError(f'definitions need a name and a body: {file_name} does not hold an object')
+        loaded_definitions.append({'name': definition_name, 'body': body})
+
+  seen_names = set()
+  for definition in loaded_definitions:
+    if definition['name'] in seen_names:
+      raise ValueError(f"{definition['name']} is defined more than once")
+    seen_names.add(definition['name'])
+  return loaded_definitions
+
+def apply_definitions(module, elastic, object_type):
+  """
+  Loads the definitions and definitions_dir options and syncs them with Elastic.sync_definitions.
+  The results are marked failed, with a msg, when the definitions cannot be loaded or any of them could not be written.
+  """
+  try:
+    definitions = load_definitions(module.params.get('definitions'), module.params.get('definitions_dir'))
+  except Exception as e:
+    return {'changed': False, 'failed': True, 'msg': f'definitions could not be loaded: {e}'}
+  results = elastic.sync_definitions(object_type, definitions, check_mode = module.check_mode,
+                                     max_workers = module.params.get('definitions_concurrency') or 8)
+  if results['failed_definitions']:
+    results['failed'] = True
+    results['msg'] = f"definitions could not be written: {', '.join(results['failed_definitions'])}"
+  return results
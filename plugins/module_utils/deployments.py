@@ -0,0 +1,127 @@
+# Copyright 2021 Expedient
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+## Runs one module operation against many ECE deployments through the ECE API proxy.
+## Every deployment gets its own Kibana/Elastic client, but they all share one ECE login and the process wide
+## connection pool, so a task covering 200 deployments logs in once instead of 200 times.
+## Each deployment's operation gets a DeploymentModule standing in for the AnsibleModule, so module code that ends with
+## exit_json or fail_json ends that deployment's run rather than the whole task.
+
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from urllib.error import HTTPError
+
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.ece import ECE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from ece import ECE
+
+DEFAULT_DEPLOYMENT_CONCURRENCY = 8
+## deployment_info would be ignored when deployments is given, so a module may only take one of them
+DEPLOYMENTS_MUTUALLY_EXCLUSIVE = [('deployment_info', 'deployments')]
+
+def deployments_argument_spec():
+  """
+  Returns the module arguments of the deployments_options doc fragment, for module_args.update().
+  """
+  return dict(
+    deployments=dict(type='list', elements='dict'),
+    deployment_concurrency=dict(type='int', default=DEFAULT_DEPLOYMENT_CONCURRENCY),
+  )
+
+class DeploymentExit(Exception):
+  def __init__(self, results):
+    super().__init__(results.get('msg'))
+    self.results = results
+
+class DeploymentModule(object):
+  """
+  Stands in for the AnsibleModule during one deployment's operation. params are the module's own with deployment_info
+  set to that deployment, exit_json and fail_json end the operation with their results instead of exiting, and
+  everything else is the module's.
+  """
+  def __init__(self, module, deployment_info):
+    self.module = module
+    self.params = deepcopy(module.params)
+    self.params['deployment_info'] = deployment_info
+    self.params['deployments'] = None
+
+  def __getattr__(self, name):
+    return getattr(self.module, name)
+
+  def exit_json(self, **kwargs):
+    raise DeploymentExit(kwargs)
+
+  def fail_json(self, msg, **kwargs):
+    raise DeploymentExit(dict(kwargs, failed = True, msg = msg))
+
+def get_deployment_key(deployment_info):
+  return deployment_info.get('deployment_name') or deployment_info.get('deployment_id')
+
+def run_on_deployments(module, client_class, operation, deployments = None, max_workers = None):
+  """
+  Calls operation(deployment_module, client) for every deployment on a bounded thread pool, the results it returns or
+  passes to exit_json/fail_json are that deployment's result.
+
+  variables:
+    client_class(class): Kibana or Elastic (or a subclass), built per deployment with the shared ECE login
+    deployments(list): deployment_info dicts, defaults to the module's deployments option, deployment_name is resolved
+                       to deployment_id when only the name is given
+    max_workers(int): defaults to the module's deployment_concurrency option
+
+  Returns:
+    dict of {deployment name or id: {'result': ...}} or {...: {'failed': True, 'msg': ...}} in deployments order,
+    a failure on one deployment does not stop the others
+  """
+  deployments = deployments if deployments is not None else module.params.get('deployments')
+  max_workers = max_workers or module.params.get('deployment_concurrency') or DEFAULT_DEPLOYMENT_CONCURRENCY
+  ece_auth = ECE(module)
+
+  def run_operation(deployment_info):
+    try:
+      if not deployment_info.get('deployment_id'):
+        deployment_id = ece_auth.get_deployment_id(deployment_info.get('deployment_name'))
+        if not deployment_id:
+          return {'failed': True, 'msg': f"deployment {deployment_info.get('deployment_name')} was not found"}
+        deployment_info = dict(deployment_info, deployment_id = deployment_id)
+      deployment_module = DeploymentModule(module, deployment_info)
+      client = client_class(deployment_module, deployment_info = deployment_info, ece_auth = ece_auth)
+      return {'result': operation(deployment_module, client)}
+    except DeploymentExit as e:
+      return {'result': e.results}
+    except HTTPError as e:
+      return {'failed': True, 'msg': f'{e.code} {e.reason}: {e.read().decode(errors="replace")}'}
+    except Exception as e:
+      return {'failed': True, 'msg': str(e)}
+
+  with ThreadPoolExecutor(max_workers = max(1, min(max_workers, len(deployments) or 1))) as executor:
+    deployment_results = list(executor.map(run_operation, deployments))
+  return dict(zip([get_deployment_key(deployment_info) for deployment_info in deployments], deployment_results))
+
+def exit_with_deployment_results(module, deployment_results, results = None):
+  """
+  Exits the module with the per deployment results, changed when any deployment changed and failed when any failed,
+  either by raising or by returning a result marked failed.
+  """
+  results = dict(results or {})
+  results['deployments'] = deployment_results
+  results['changed'] = any((deployment_result.get('result') or {}).get('changed') for deployment_result in deployment_results.values())
+  results['failed_deployments'] = [deployment_key for deployment_key, deployment_result in deployment_results.items() if deployment_result.get('failed') or (deployment_result.get('result') or {}).get('failed')]
+  if results['failed_deployments']:
+    module.fail_json(msg=f"operation failed on deployments: {', '.join(str(deployment_key) for deployment_key in results['failed_deployments'])}", **results)
+  module.exit_json(**results)
@@ -14,6 +14,7 @@
 
 from ansible.module_utils.urls import open_url, urllib_error
 from json import loads, dumps
+import threading
 import time
 from yaml import load, dump
 try:
@@ -21,6 +22,32 @@ try:
 except ImportError:
     from yaml import Loader, Dumper
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.transport import get_transport
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from transport import get_transport
+
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.token_cache import TokenCache
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from token_cache import TokenCache
+
+from urllib.error import HTTPError
+
+WAIT_RESOURCE_KINDS = ('elasticsearch', 'kibana', 'apm', 'integrations_server')
+
+## Deployment name -> {id, name} index, shared by every ECE client in the process and keyed by (host, port)
+_deployment_index = {}
+_deployment_index_lock = threading.Lock()
+
 class ECE(object):
   def __init__(self, module):
     self.module = module
@@ -29,43 +56,125 @@ class ECE(object):
     self.username = module.params.get('username')
     self.password = module.params.get('password')
     self.validate_certs = module.params.get('verify_ssl_cert')
+    self.transport = get_transport(module)
+
+    token_cache_path = module.params.get('token_cache_path')
+    self.token_cache = TokenCache(token_cache_path) if token_cache_path != '' else None
+    self.token = None
+    self.token_lock = threading.Lock()
 
     if self.username and self.password:
-      url = f'https://{self.host}:{self.port}/api/v1/users/auth/_login'
-      data = {
-        'username': self.username,
-        'password': self.password
-      }
-      payload = dumps(data)
-      headers = {'Content-Type': 'application/json'}
-      response = open_url(url, data=payload, headers=headers, method='POST', validate_certs=self.validate_certs, timeout=120)
-      content = loads(response.read())
-      self.token = content['token']
+      self.token_cache_key = TokenCache.get_cache_key(self.host, self.port, self.username, self.password)
+      if self.token_cache:
+        self.token = self.token_cache.get(self.token_cache_key)
+      if not self.token:
+        self.login()
+
+  def login(self):
+    url = f'https://{self.host}:{self.port}/api/v1/users/auth/_login'
+    data = {
+      'username': self.username,
+      'password': self.password
+    }
+    payload = dumps(data)
+    headers = {'Content-Type': 'application/json'}
+    response = self.transport.open_url(url, data=payload, headers=headers, method='POST', validate_certs=self.validate_certs, timeout=120)
+    content = loads(response.read())
+    self.token = content['token']
+    if self.token_cache:
+      self.token_cache.set(self.token_cache_key, self.token)
+    return self.token
+
+  def refresh_token(self, rejected_token):
+    ## A cached token can be revoked or expire early, in which case it is dropped and a new login is done.
+    ## Several clients can share one ECE object, so only the first to see the rejected token logs in again.
+    with self.token_lock:
+      if self.token == rejected_token:
+        if self.token_cache:
+          self.token_cache.delete(self.token_cache_key)
+        self.login()
+    return self.token
 
   def send_api_request(self, endpoint, method, data=None):
     url = f'https://{self.host}:{self.port}/api/v1/{endpoint}'
-    headers = {'Authorization': f'Bearer {self.token}'}
     payload = None
+    headers = {}
     if data:
       payload = dumps(data)
       headers['Content-Type'] = 'application/json'
-    response = open_url(url, data=payload, headers=headers, method=method, validate_certs=self.validate_certs, timeout=120)
+    token = self.token
+    headers['Authorization'] = f'Bearer {token}'
+    try:
+      response = self.transport.open_url(url, data=payload, headers=headers, method=method, validate_certs=self.validate_certs, timeout=120)
+    except HTTPError as e:
+      if e.code != 401 or not self.password:
+        raise
+      headers['Authorization'] = f'Bearer {self.refresh_token(token)}'
+      response = self.transport.open_url(url, data=payload, headers=headers, method=method, validate_certs=self.validate_certs, timeout=120)
     content = loads(response.read())
     return content
 
+  def get_deployment_index(self):
+    with _deployment_index_lock:
+      return _deployment_index.setdefault((self.host, self.port), {'deployments': {}})
+
+  def index_deployment(self, deployment_id, deployment_name):
+    deployment_index = self.get_deployment_index()
+    with _deployment_index_lock:
+      deployment_index['deployments'][str(deployment_name).upper()] = {'id': deployment_id, 'name': deployment_name}
+
+  def unindex_deployment(self, deployment_id):
+    deployment_index = self.get_deployment_index()
+    with _deployment_index_lock:
+      for index_key, indexed_deployment in list(deployment_index['deployments'].items()):
+        if indexed_deployment['id'] == deployment_id:
+          del deployment_index['deployments'][index_key]
+
+  def search_deployments(self, query, size = 100):
+    """
+    Runs a query against deployments/_search, following the cursor until every match has been returned.
+    """
+    endpoint = 'deployments/_search'
+    body = {'query': query, 'size': size}
+    deployments = []
+    while True:
+      response = self.send_api_request(endpoint, 'POST', body)
+      page = response.get('deployments') or []
+      deployments.extend(page)
+      if not response.get('cursor') or len(page) < size or len(deployments) >= response.get('match_count', 0):
+        return deployments
+      body = {'query': query, 'size': size, 'cursor': response['cursor']}
+
+  def get_deployment_id(self, deployment_name):
+    """
+    Resolves a deployment name to its id (names match case insensitively).
+    Names are looked up on deployments/_search and remembered for the rest of the process. The exact term query is
+    paired with a match query on the analyzed name, so names differing only in case are found by the same search and
+    a name that does not exist costs one search, never the full deployments list.
+    """
+    index_key = str(deployment_name).upper()
+    deployment_index = self.get_deployment_index()
+    if index_key in deployment_index['deployments']:
+      return deployment_index['deployments'][index_key]['id']
+
+    query = {'bool': {'should': [
+      {'term': {'name': {'value': deployment_name}}},
+      {'match': {'name': {'query': deployment_name, 'operator': 'and'}}}
+    ]}}
+    for deployment in self.search_deployments(query):
+      self.index_deployment(deployment['id'], deployment['name'])
+
+    indexed_deployment = deployment_index['deployments'].get(index_key)
+    return indexed_deployment['id'] if indexed_deployment else None
+
   def get_deployment_info(self, deployment_name = None):
-    endpoint  = 'deployments'
-    all_deployment_objects = self.send_api_request(endpoint, 'GET')
-    deployment_objects = None
     if deployment_name:
-      for deployment in all_deployment_objects['deployments']:
-        if str(deployment['name']).upper() == str(deployment_name).upper():
-          endpoint  = 'deployments/' + deployment['id']
-          deployment_objects = self.send_api_request(endpoint, 'GET')
-          break
-    else:
-      deployment_objects = all_deployment_objects
-    return deployment_objects
+      deployment_id = self.get_deployment_id(deployment_name)
+      if not deployment_id:
+        return None
+      return self.get_deployment_byid(deployment_id)
+    endpoint  = 'deployments'
+    return self.send_api_request(endpoint, 'GET')
 
   def get_deployment_byid(self, deployment_id):
     endpoint  = f'deployments/{deployment_id}'
@@ -103,16 +212,14 @@ class ECE(object):
     #endpoint = f'clusters/elasticsearch?q=cluster_name={cluster_name}'
     #clusters = self.send_api_request(endpoint, 'GET')
     #return next(filter(lambda x: x['cluster_name'] == cluster_name, clusters['elasticsearch_clusters']), None)
-    clusters = self.get_clusters()
-    target_cluster = None
+    deployment_id = self.get_deployment_id(cluster_name)
+    if not deployment_id:
+      return None
+    target_cluster = self.get_cluster_by_id(deployment_id)
     target_cluster_resource = None
-    for cluster in clusters:
-      if cluster['name'] == cluster_name:
-        target_cluster = cluster
-        for resource in cluster['resources'][resource_kind]:
-          if resource['kind'] == resource_kind:
-            target_cluster_resource = self.get_cluster_resource_by_id(target_cluster['id'],resource_kind, resource['ref_id'])
-            break
+    for resource in target_cluster['resources'].get(resource_kind) or []:
+      target_cluster_resource = self.get_deployment_resource_by_id(target_cluster['id'], resource_kind, resource['ref_id'])
+      break
     return target_cluster_resource
 
   def get_cluster_by_id(self, cluster_id):
@@ -132,43 +239,143 @@ class ECE(object):
     templates = self.send_api_request(endpoint, 'GET')
     return next(filter(lambda x: x['name'] == template_name, templates), None)
 
+  def get_deployment_status(self, deployment_id):
+    ## Trimmed deployment document: per resource status and current/pending plan only, without settings, plan logs or history
+    endpoint = (f'deployments/{deployment_id}?show_metadata=false&show_settings=false&show_plans=true&show_plan_logs=false'
+                '&show_plan_history=false&show_plan_defaults=false&show_security=false&show_instance_configurations=false')
+    return self.send_api_request(endpoint, 'GET')
+
+  @staticmethod
+  def is_resource_ready(resource_kind, resource, cluster_state = 'started'):
+    resource_info = resource.get('info') or {}
+    if resource_info.get('status') != cluster_state:
+      return False
+    if (resource_info.get('plan_info') or {}).get('pending'):
+      return False
+    if cluster_state == 'started' and resource_kind in ('apm', 'integrations_server'):
+      services_urls = (resource_info.get('metadata') or {}).get('services_urls', [])
+      found_apm_url = any(service_url['service'] == "apm" and service_url['url'] for service_url in services_urls)
+      found_fleet_url = any(service_url['service'] == "fleet" and service_url['url'] for service_url in services_urls)
+      return found_apm_url and found_fleet_url
+    return True
+
+  def is_deployment_ready(self, deployment_object, resources = None, cluster_state = 'started', cluster_health = None):
+    if cluster_health is not None and deployment_object.get('healthy') != cluster_health:
+      return False
+    deployment_resources = deployment_object.get('resources') or {}
+    if resources is None:
+      ## Track every kind that actually exists in the deployment
+      resources = {kind: None for kind in WAIT_RESOURCE_KINDS if deployment_resources.get(kind)}
+    for resource_kind, resource_ref_id in resources.items():
+      kind_resources = deployment_resources.get(resource_kind) or []
+      if resource_ref_id is not None:
+        kind_resources = [resource for resource in kind_resources if resource['ref_id'] == resource_ref_id]
+      if not kind_resources:
+        return False
+      for resource in kind_resources:
+        if not self.is_resource_ready(resource_kind, resource, cluster_state):
+          return False
+    return True
+
+  def get_plan_handle(self, deployment_id, resources = None, cluster_state = 'started', cluster_health = None, deployment_name = None):
+    """
+    Returns a handle describing what a plan change is expected to converge to, so the wait can be done later,
+    possibly in another task, with wait_for_plan_handles() or the ece_plan_status module.
+    """
+    return {
+      'deployment_id': deployment_id,
+      'deployment_name': deployment_name,
+      'resources': resources,
+      'cluster_state': cluster_state,
+      'cluster_health': cluster_health
+    }
+
+  @staticmethod
+  def get_deployment_status_summary(deployment_object):
+    resources_summary = {}
+    for resource_kind in WAIT_RESOURCE_KINDS:
+      kind_resources = (deployment_object.get('resources') or {}).get(resource_kind) or []
+      if kind_resources:
+        resources_summary[resource_kind] = [{
+          'ref_id': resource['ref_id'],
+          'status': (resource.get('info') or {}).get('status'),
+          'plan_pending': bool(((resource.get('info') or {}).get('plan_info') or {}).get('pending'))
+        } for resource in kind_resources]
+    return {
+      'healthy': deployment_object.get('healthy'),
+      'resources': resources_summary
+    }
+
+  def wait_for_plan_handles(self, plan_handles, completion_timeout = 1800, initial_interval = 2, max_interval = 30):
+    """
+    Waits on many plan handles from a single polling loop, each round only polls the deployments that are not ready yet.
+    The poll interval starts at initial_interval and doubles up to max_interval.
+
+    variables:
+      plan_handles(list): handles returned by get_plan_handle()
+      completion_timeout(int): Seconds to wait for all handles, 0 checks each handle once
+
+    Returns:
+      dict keyed by deployment id, each entry holding ready(bool), healthy and the per resource status
+    """
+    timeout = time.time() + completion_timeout
+    interval = initial_interval
+    pending = list(plan_handles)
+    statuses = {}
+    while True:
+      still_pending = []
+      for plan_handle in pending:
+        deployment_object = self.get_deployment_status(plan_handle['deployment_id'])
+        status = self.get_deployment_status_summary(deployment_object)
+        status['deployment_name'] = plan_handle.get('deployment_name') or deployment_object.get('name')
+        status['ready'] = self.is_deployment_ready(
+          deployment_object,
+          plan_handle.get('resources'),
+          plan_handle.get('cluster_state') or 'started',
+          plan_handle.get('cluster_health'))
+        statuses[plan_handle['deployment_id']] = status
+        if not status['ready']:
+          still_pending.append(plan_handle)
+      pending = still_pending
+      remaining = timeout - time.time()
+      if not pending or remaining <= 0:
+        return statuses
+      time.sleep(min(interval, remaining))
+      interval = min(interval * 2, max_interval)
+
+  def wait_for_deployment(
+    self,
+    deployment_id,
+    resources = None,
+    cluster_state = 'started',
+    cluster_health = None,
+    completion_timeout = 1800,
+    initial_interval = 2,
+    max_interval = 30
+    ):
+    """
+    Polls the deployment until every tracked resource has reached cluster_state with no pending plan.
+    All resource kinds are checked from a single status request per poll, see wait_for_plan_handles() for the backoff.
+
+    variables:
+      resources(dict): {resource_kind: ref_id} to track, a ref_id of None tracks every resource of that kind.
+                       Defaults to every elasticsearch, kibana, apm and integrations_server resource in the deployment.
+      cluster_health(bool): When set, the deployment's healthy flag must also match
+
+    Returns:
+      True once ready, False if completion_timeout is reached first
+    """
+    plan_handle = self.get_plan_handle(deployment_id, resources, cluster_state, cluster_health)
+    statuses = self.wait_for_plan_handles([plan_handle], completion_timeout, initial_interval, max_interval)
+    return statuses[deployment_id]['ready']
+
   def wait_for_cluster_state(self, cluster_id, resource_kind, resource_ref_id = None, cluster_state = 'started', completion_timeout=1800):
     if resource_ref_id is None:
       resource_ref_id = f"main-{resource_kind}"
-    timeout = time.time() + completion_timeout
-
-    while time.time() < timeout:
-      cluster_object = self.get_cluster_by_id(cluster_id)
-
-      if resource_kind not in cluster_object['resources']:
-        time.sleep(15)
-        continue
-
-      for resource in cluster_object['resources'][resource_kind]:
-        if resource['ref_id'] == resource_ref_id:
-          if resource['info']['status'] == cluster_state:
-            if resource_kind == "apm":
-              found_apm_url = any(service_url['service'] == "apm" and service_url['url'] for service_url in resource['info']['metadata'].get('services_urls', []))
-              found_fleet_url = any(service_url['service'] == "fleet" and service_url['url'] for service_url in resource['info']['metadata'].get('services_urls', []))
-              if found_apm_url and found_fleet_url:
-                return True
-            else:
-              return True
-  
-      time.sleep(15)
-
-    return False
+    return self.wait_for_deployment(cluster_id, {resource_kind: resource_ref_id}, cluster_state, completion_timeout = completion_timeout)
 
   def wait_for_cluster_healthy(self, cluster_id, cluster_health=True, completion_timeout=1800):
-      timeout = time.time() + completion_timeout
-      while time.time() < timeout:
-          cluster_object = self.get_cluster_by_id(cluster_id)
-          if 'healthy' in cluster_object and cluster_object['healthy'] == cluster_health:
-              return True
-          time.sleep(15)
-
-      return False
-
+    return self.wait_for_deployment(cluster_id, {}, cluster_health = cluster_health, completion_timeout = completion_timeout)
 
   def get_traffic_rulesets(self, include_assocations=False):
     endpoint = 'deployments/traffic-filter/rulesets'
@@ -196,13 +403,10 @@ class ECE(object):
     return deployment_resource
 
   def update_deployment_info(self, deployment_name, config):
-    deployment_objects = self.get_deployment_info()
+    deployment_id = self.get_deployment_id(deployment_name)
     target_deployment_object = ""
-    for deployment in deployment_objects['deployments']:
-      if str(deployment['name']).upper() == str(deployment_name).upper():
-        endpoint  = 'deployments/' + deployment['id']
-        target_deployment_object = self.send_api_request(endpoint, 'PUT', config)
-        break
+    if deployment_id:
+      target_deployment_object = self.update_deployment_byid(deployment_id, config)
     return target_deployment_object
 
   def update_deployment_byid(self, deployment_id, body):
@@ -369,14 +573,10 @@ class ECE(object):
         method = 'POST'
 
       cluster_creation_result = self.send_api_request(endpoint, method, data=data)
+      if method == 'POST':
+        self.index_deployment(cluster_creation_result['id'], cluster_name)
       if wait_for_completion:
-        
-        elastic_deployment_result = self. wait_for_cluster_state(cluster_creation_result['id'],'elasticsearch','main-elasticsearch','started', completion_timeout)
-        kibana_deployment_result = self.wait_for_cluster_state(cluster_creation_result['id'],'kibana','main-kibana','started', completion_timeout)
-        apm_deployment_result = self.wait_for_cluster_state(cluster_creation_result['id'],'kibana','main-apm','started', completion_timeout)
-        
-        if not elastic_deployment_result and not kibana_deployment_result and not apm_deployment_result:
-          return False
+        self.wait_for_deployment(cluster_creation_result['id'], completion_timeout = completion_timeout)
       return cluster_creation_result
 
   def get_matching_clusters(self, cluster_name):
@@ -391,6 +591,7 @@ class ECE(object):
     #endpoint = f'deployments/{deployment_id}/{resource_kind}/{target_resource_ref_id}'
     endpoint = f'deployments/{deployment_id}'
     delete_result = self.send_api_request(endpoint, 'DELETE')
+    self.unindex_deployment(deployment_id)
     return delete_result
 
   def terminate_cluster(self, deployment_id, resource_kind = "elasticsearch"):
@@ -401,7 +602,7 @@ class ECE(object):
       target_resource_ref_id = resource['ref_id']
       endpoint = f'deployments/{deployment_id}/{resource_kind}/{target_resource_ref_id}/_shutdown'
       stop_result = self.send_api_request(endpoint, 'POST')
-      wait_result = self.wait_for_cluster_state(deployment_id, resource_kind, target_resource_ref_id,'stopped', self.completion_timeout)
+      wait_result = self.wait_for_cluster_state(deployment_id, resource_kind, target_resource_ref_id,'stopped', self.module.params.get('completion_timeout') or 1800)
     if not wait_result:
       self.module.fail_json(msg=f'failed to stop deployment {deployment_id}')
     return stop_result
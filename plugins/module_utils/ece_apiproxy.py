@@ -21,10 +21,36 @@ except:
   sys.path.append(util_path)
   from ece import ECE
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.transport import get_transport
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from transport import get_transport
+
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.ndjson import iter_ndjson, load_json
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from ndjson import iter_ndjson, load_json
+
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.multipart import encode_multipart_file
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from multipart import encode_multipart_file
+
 from ansible.module_utils.urls import open_url, urllib_error
 from json import loads, dumps
 import time
-import requests
 from yaml import load, dump
 from urllib.error import HTTPError
 try:
@@ -33,27 +59,32 @@ except ImportError:
     from yaml import Loader, Dumper
 
 class ECE_API_Proxy(object):
-  def __init__(self, module):
+  def __init__(self, module, deployment_info = None, ece_auth = None):
+    ## deployment_info and ece_auth are passed in when one module run works on many deployments with one ECE login
     self.module = module
     self.host = module.params.get('host')
     self.port = module.params.get('port')
     self.username = module.params.get('username')
     self.password = module.params.get('password')
-    self.deployment_info = module.params.get('deployment_info')
+    self.deployment_info = deployment_info or module.params.get('deployment_info')
     self.deployment_id = self.deployment_info['deployment_id']
     self.resource_type = self.deployment_info['resource_type']
     self.ref_id = self.deployment_info['ref_id']
     self.validate_certs = module.params.get('verify_ssl_cert')
-    self.ece_auth = ECE(module)
+    self.transport = get_transport(module)
+    self.ece_auth = ece_auth or ECE(module)
 
-  def send_api_request(self, endpoint, method, data=None, headers={}, timeout=600, space_id='default', no_kbnver=False, version=None):
+  def send_api_request(self, endpoint, method, data=None, headers={}, timeout=600, space_id='default', no_kbnver=False, version=None, stream=False):
 
     if endpoint.startswith('_'):
       url = f'https://{self.host}:{self.port}/api/v1/deployments/{self.deployment_id}/{self.resource_type}/{self.ref_id}/proxy/{endpoint}'
     else:
       url = f'https://{self.host}:{self.port}/api/v1/deployments/{self.deployment_id}/{self.resource_type}/{self.ref_id}/proxy/s/{space_id}/api/{endpoint}'
     payload = None
-    headers['Authorization'] = f'Bearer {self.ece_auth.token}'
+    ## Copied, the default headers dict is shared by every client and deployments may be worked on concurrently
+    headers = dict(headers)
+    token = self.ece_auth.token
+    headers['Authorization'] = f'Bearer {token}'
     headers['Content-Type'] = 'application/json'
     headers['X-Management-Request'] = 'True'
     
@@ -62,44 +93,59 @@ class ECE_API_Proxy(object):
       
     if data:
       payload = dumps(data)
-    response = open_url(
-      url, 
-      data=payload, 
-      headers=headers, 
-      method=method, 
-      validate_certs=self.validate_certs,
-      timeout=timeout
-      )
+    try:
+      response = self.transport.open_url(
+        url, 
+        data=payload, 
+        headers=headers, 
+        method=method, 
+        validate_certs=self.validate_certs,
+        timeout=timeout
+        )
+    except HTTPError as e:
+      ## ECE answers 401 itself when the bearer token is no longer valid, anything else comes from the proxied cluster
+      if e.code != 401:
+        raise
+      headers['Authorization'] = f'Bearer {self.ece_auth.refresh_token(token)}'
+      response = self.transport.open_url(
+        url, 
+        data=payload, 
+        headers=headers, 
+        method=method, 
+        validate_certs=self.validate_certs,
+        timeout=timeout
+        )
+    if stream:
+      return iter_ndjson(response) if response.reason != 'No Content' else iter(())
     if response.reason != 'No Content':
-      content = loads(response.read())
+      content = load_json(response)
     else:
       content = ''
     return content
 
-  def send_file_api_request(self, endpoint, method, data=None, headers={}, file=None, timeout=600, space_id = "default", no_kbnver=False, version=None, *args, **kwargs):
+  def send_file_api_request(self, endpoint, method, data=None, headers={}, file=None, timeout=600, space_id = "default", no_kbnver=False, version=None, content=None, *args, **kwargs):
 
     url = f'https://{self.host}:{self.port}/api/v1/deployments/{self.deployment_id}/{self.resource_type}/{self.ref_id}/proxy/s/{space_id}/api/{endpoint}'
     
-    response = None
-    headers = {}
-    headers['Authorization'] =  f'Bearer {self.ece_auth.token}'
+    token = self.ece_auth.token
+    headers, body = encode_multipart_file(content = content, path = file)
+    headers['Authorization'] =  f'Bearer {token}'
     headers['X-Management-Request'] = 'True'
-    #headers['Content-Type'] = 'application/json'
+    headers['kbn-xsrf'] = 'true'
       
     if no_kbnver == False and version != None:
       headers['kbn-version'] = version
 
-    if method == "POST":
-      try:
-        response = requests.post(
-          url, 
-          files={'file': open(file,'rb')}, 
-          headers=headers,
-          timeout=timeout
-        )
-      except HTTPError as e:
-        raise e ## This allows errors raised during the request to be inspected while debugging
-    return loads(response.content.decode())
+    ## The body is a generator that can only be sent once, so unlike send_api_request this is not retried on a 401
+    response = self.transport.open_url(
+      url, 
+      data=body, 
+      headers=headers, 
+      method=method, 
+      validate_certs=self.validate_certs,
+      timeout=timeout
+      )
+    return load_json(response)
 
   def get_cluster_status(self):
     endpoint = 'status'
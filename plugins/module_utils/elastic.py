@@ -16,11 +16,30 @@
 from ansible.module_utils.urls import open_url, urllib_error
 from json import loads, dumps
 from urllib.error import HTTPError
-#import urllib.parse
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 #import requests
 #import tempfile
 #import os
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.transport import get_transport
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from transport import get_transport
+
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.ndjson import iter_ndjson, load_ndjson
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from ndjson import iter_ndjson, load_ndjson
+
 try:
   from ansible_collections.expedient.elastic.plugins.module_utils.ece_apiproxy import ECE_API_Proxy
 except:
@@ -30,27 +49,41 @@ except:
   sys.path.append(util_path)
   from ece_apiproxy import ECE_API_Proxy
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.canonical import canonicalize_index_template, canonicalize_component_template, canonicalize_ilm_policy, canonical_json, get_differences
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from canonical import canonicalize_index_template, canonicalize_component_template, canonicalize_ilm_policy, canonical_json, get_differences
+
 class Elastic(object):
-  def __init__(self, module):
+  def __init__(self, module, deployment_info = None, ece_auth = None):
     self.module = module
     self.host = module.params.get('host')
     self.port = module.params.get('port')
     self.username = module.params.get('username')
     self.password = module.params.get('password')
     self.validate_certs = module.params.get('verify_ssl_cert')
-    self.deployment_info = module.params.get('deployment_info')
+    self.transport = get_transport(module)
+    self.deployment_info = deployment_info or module.params.get('deployment_info')
     if self.deployment_info:
-      self.ece_api_proxy = ECE_API_Proxy(module)
+      self.ece_api_proxy = ECE_API_Proxy(module, self.deployment_info, ece_auth)
       
-  def send_api_request(self, endpoint, method, data = None, headers = {}, timeout = 120, *args, **kwargs):
+  def send_api_request(self, endpoint, method, data = None, headers = {}, timeout = 120, stream = False, *args, **kwargs):
     
     if self.deployment_info:
-      result = self.ece_api_proxy.send_api_request(endpoint, method, data, headers, timeout)
+      result = self.ece_api_proxy.send_api_request(endpoint, method, data, headers, timeout, stream = stream)
     else:
-      result = self.send_elastic_api_request(endpoint, method, data, headers, timeout)
+      result = self.send_elastic_api_request(endpoint, method, data, headers, timeout, stream = stream)
     return result
 
-  def send_elastic_api_request(self, endpoint, method, data=None, headers={}, timeout=120, *args, **kwargs):
+  def send_elastic_api_request(self, endpoint, method, data=None, headers={}, timeout=120, stream = False, *args, **kwargs):
+    """
+    With stream set, a generator yielding each object of the (ND)JSON response as it is read off the connection is
+    returned instead of the parsed body.
+    """
     
     url = f'https://{self.host}:{self.port}/{endpoint}'
 
@@ -59,24 +92,16 @@ class Elastic(object):
       headers['Content-Type'] = 'application/json'
       payload = dumps(data)
     try:
-      response = open_url(url, data=payload, method=method, validate_certs=self.validate_certs, headers=headers,
+      response = self.transport.open_url(url, data=payload, method=method, validate_certs=self.validate_certs, headers=headers,
                           force_basic_auth=True, url_username=self.username, url_password=self.password, timeout=timeout)
     except HTTPError as e:
       raise e ## This allows errors raised during the request to be inspected while debugging
     if response.msg == 'No Content' and str(response.status).startswith('2'):
-      return
+      return iter(()) if stream else None
+    elif stream:
+      return iter_ndjson(response)
     else:
-      response_output = response.read()
-      response_str = response_output.decode()
-      response_return = str(response_str).split('\n')
-      response_list = []
-      for i in response_return:
-        return_load = loads(i)
-        response_list.append(return_load)
-      if len(response_list) > 1:
-        return response_list
-      else:
-        return response_list[0]
+      return load_ndjson(response)
 
   ## get_users() and get_user() support the native realm only
   def get_users(self):
@@ -131,11 +156,29 @@ class Elastic(object):
     index_lifecycle_policy = self.send_api_request(endpoint, 'GET')
     return index_lifecycle_policy
   
-  def update_index_lifecycle_policy(self, policy_name, index_lifecycle_policy_data):
+  def update_index_lifecycle_policy(self, policy_name, index_lifecycle_policy_data, check_mode = False):
+    """
+    PUTs the policy only when its canonical form differs from the live policy's.
+
+    Returns:
+      dict with changed, differences (dotted paths that differ) and index_lifecycle_policy (the PUT response, or the
+      live policy when nothing had to be written)
+    """
     endpoint = '_ilm/policy/' + policy_name
-    index_lifecycle_policy = self.send_api_request(endpoint, 'PUT', data=index_lifecycle_policy_data)
-    return index_lifecycle_policy
-  
+    try:
+      live_policy = (self.send_api_request(endpoint, 'GET') or {}).get(policy_name, {}).get('policy')
+    except HTTPError as e:
+      if e.code != 404:
+        raise e
+      live_policy = None
+    wanted_policy = canonicalize_ilm_policy(index_lifecycle_policy_data.get('policy'))
+    if live_policy is not None and canonical_json(canonicalize_ilm_policy(live_policy)) == canonical_json(wanted_policy):
+      return {'changed': False, 'differences': [], 'index_lifecycle_policy': live_policy}
+    differences = get_differences(canonicalize_ilm_policy(live_policy), wanted_policy) if live_policy is not None else ['policy']
+    index_lifecycle_policy = None
+    if not check_mode:
+      index_lifecycle_policy = self.send_api_request(endpoint, 'PUT', data=index_lifecycle_policy_data)
+    return {'changed': True, 'differences': differences, 'index_lifecycle_policy': index_lifecycle_policy}
     
   ########### Update Settings
   
@@ -148,40 +191,180 @@ class Elastic(object):
     ########### Component Template
     
   def get_component_template(self, template_name = None):
-    endpoint = '_component_template'
-    target_component_template = None
-    component_templates = self.send_api_request(endpoint, 'GET')
-    for component_template in component_templates['component_templates']:
-      if component_template['name'] == template_name:
-        target_component_template = component_template
-        break
-    return target_component_template
-  
-  def update_component_template(self, template_name, body):
+    if not template_name:
+      return None
+    return self.get_component_templates([template_name]).get(template_name)
+
+  def get_component_templates(self, template_names):
+    """
+    Fetches several component templates with one GET _component_template/a,b,c.
+    Elasticsearch answers 404 when any of the names does not exist, the names are then fetched one at a time.
+
+    Returns:
+      dict of {name: {'name': ..., 'component_template': ...}} holding the templates that exist
+    """
+    template_names = list(dict.fromkeys(template_names or []))
+    if not template_names:
+      return {}
+    try:
+      component_templates = self.send_api_request('_component_template/' + ','.join(urllib.parse.quote(name, safe='') for name in template_names), 'GET')
+    except HTTPError as e:
+      if e.code != 404:
+        raise e
+      if len(template_names) == 1:
+        return {}
+      component_templates = {'component_templates': []}
+      for template_name in template_names:
+        component_templates['component_templates'] += self.get_component_templates([template_name]).values()
+    return {component_template['name']: component_template for component_template in (component_templates or {}).get('component_templates', [])
+            if component_template['name'] in template_names}
+
+  def update_component_template(self, template_name, body, check_mode = False):
+    """
+    PUTs the component template only when it does not exist or its canonical form differs from body's.
+
+    Returns:
+      dict with changed, differences and component_template (the PUT response, or the live template when nothing
+      had to be written)
+    """
     endpoint = f'_component_template/{template_name}'
     target_template = self.get_component_template(template_name=template_name)
+    wanted_template = canonicalize_component_template(body)
+    if target_template != None:
+      live_template = canonicalize_component_template(target_template['component_template'])
+      if canonical_json(live_template) == canonical_json(wanted_template):
+        return {'changed': False, 'differences': [], 'component_template': target_template}
+      differences = get_differences(live_template, wanted_template)
+    else:
+      differences = ['component_template']
     component_template = None
-    if target_template == None:
-    #json_body = dumps(body)
+    if not check_mode:
       component_template = self.send_api_request(endpoint, 'PUT', data=body)
-    return component_template
+    return {'changed': True, 'differences': differences, 'component_template': component_template}
   
       ########### Index Template
     
   def get_index_template(self, template_name = None):
-    endpoint = '_index_template'
-    target_index_template = None
-    index_templates = self.send_api_request(endpoint, 'GET')
-    for index_template in index_templates['index_templates']:
+    if not template_name:
+      return None
+    endpoint = '_index_template/' + urllib.parse.quote(template_name, safe='')
+    try:
+      index_templates = self.send_api_request(endpoint, 'GET')
+    except HTTPError as e:
+      if e.code != 404:
+        raise e
+      return None
+    for index_template in (index_templates or {}).get('index_templates', []):
       if index_template['name'] == template_name:
-        target_index_template = index_template
-        break
-    return target_index_template
+        return index_template
+    return None
   
-  def update_index_template(self, template_name, body):
+  def update_index_template(self, template_name, body, live_template = None, check_mode = False):
+    """
+    PUTs an existing index template only when its canonical form differs from body's.
+    live_template is the index_template object already fetched by the caller, it is fetched when not given.
+
+    Returns:
+      dict with changed, differences and index_template (the PUT response, or the live template when nothing had
+      to be written), or None when the template does not exist
+    """
     endpoint = f'_index_template/{template_name}'
-    target_template = self.get_index_template(template_name=template_name)
-    if target_template != None:
-    #json_body = dumps(body)
+    if live_template is None:
+      target_template = self.get_index_template(template_name=template_name)
+      if target_template == None:
+        return None
+      live_template = target_template['index_template']
+    canonical_live_template = canonicalize_index_template(live_template)
+    wanted_template = canonicalize_index_template(body)
+    if canonical_json(canonical_live_template) == canonical_json(wanted_template):
+      return {'changed': False, 'differences': [], 'index_template': live_template}
+    index_template = None
+    if not check_mode:
       index_template = self.send_api_request(endpoint, 'PUT', data=body)
-    return index_template
\ No newline at end of file
+    return {'changed': True, 'differences': get_differences(canonical_live_template, wanted_template), 'index_template': index_template}
+
+  ########### Declarative bulk definitions
+
+  def get_live_definitions(self, object_type):
+    """
+    Fetches every object of object_type ('index_template', 'component_template' or 'ilm_policy') with one GET.
+
+    Returns:
+      dict of {name: body as it would be PUT}
+    """
+    if object_type == 'index_template':
+      index_templates = self.send_api_request('_index_template', 'GET') or {}
+      return {index_template['name']: index_template['index_template'] for index_template in index_templates.get('index_templates', [])}
+    if object_type == 'component_template':
+      component_templates = self.send_api_request('_component_template', 'GET') or {}
+      return {component_template['name']: component_template['component_template'] for component_template in component_templates.get('component_templates', [])}
+    ilm_policies = self.send_api_request('_ilm/policy', 'GET') or {}
+    return {policy_name: {'policy': ilm_policy.get('policy')} for policy_name, ilm_policy in ilm_policies.items()}
+
+  @staticmethod
+  def canonicalize_definition(object_type, body):
+    if object_type == 'index_template':
+      return canonicalize_index_template(body)
+    if object_type == 'component_template':
+      return canonicalize_component_template(body)
+    return canonicalize_ilm_policy((body or {}).get('policy'))
+
+  def sync_definitions(self, object_type, definitions, check_mode = False, max_workers = 8):
+    """
+    Declaratively applies many index templates, component templates or ILM policies: the live objects are fetched
+    with one GET, compared locally in canonical form and only the missing or changed ones are PUT, max_workers at a time.
+
+    variables:
+      object_type(str): 'index_template', 'component_template' or 'ilm_policy'
+      definitions(list): {'name': ..., 'body': ...} dicts, an ILM body is the policy itself or {'policy': ...}
+
+    Returns:
+      dict with changed, created, updated and unchanged name lists, differences per changed name and
+      failed_definitions ({name: msg}), a failed PUT does not stop the others
+    """
+    endpoint_prefix = {'index_template': '_index_template', 'component_template': '_component_template', 'ilm_policy': '_ilm/policy'}[object_type]
+    live_definitions = self.get_live_definitions(object_type)
+    results = {'changed': False, 'created': [], 'updated': [], 'unchanged': [], 'differences': {}, 'failed_definitions': {}}
+
+    pending_definitions = []
+    for definition in definitions:
+      body = definition['body']
+      if object_type == 'ilm_policy' and 'policy' not in body:
+        body = {'policy': body}
+      wanted_definition = self.canonicalize_definition(object_type, body)
+      if definition['name'] not in live_definitions:
+        results['created'].append(definition['name'])
+      else:
+        live_definition = self.canonicalize_definition(object_type, live_definitions[definition['name']])
+        if canonical_json(live_definition) == canonical_json(wanted_definition):
+          results['unchanged'].append(definition['name'])
+          continue
+        results['updated'].append(definition['name'])
+        results['differences'][definition['name']] = get_differences(live_definition, wanted_definition)
+      pending_definitions.append((definition['name'], body))
+
+    results['changed'] = bool(pending_definitions)
+    if check_mode or not pending_definitions:
+      return results
+
+    def put_definition(pending_definition):
+      definition_name, body = pending_definition
+      try:
+        self.send_api_request(f"{endpoint_prefix}/{urllib.parse.quote(definition_name, safe='')}", 'PUT', data=body)
+      except HTTPError as e:
+        return f'{e.code} {e.reason}: {e.read().decode(errors="replace")}'
+      except Exception as e:
+        ## Connection errors and timeouts are recorded like any failed PUT so the other definitions are still written
+        return f'{type(e).__name__}: {e}'
+      return None
+
+    with ThreadPoolExecutor(max_workers = max(1, min(max_workers, len(pending_definitions)))) as executor:
+      put_errors = list(executor.map(put_definition, pending_definitions))
+    for (definition_name, body), put_error in zip(pending_definitions, put_errors):
+      if put_error:
+        results['failed_definitions'][definition_name] = put_error
+    ## Only what was actually written is reported as created or updated
+    results['created'] = [name for name in results['created'] if name not in results['failed_definitions']]
+    results['updated'] = [name for name in results['updated'] if name not in results['failed_definitions']]
+    results['changed'] = bool(results['created'] or results['updated'])
+    return results
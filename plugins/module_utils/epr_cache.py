@@ -0,0 +1,149 @@
+# Copyright 2021 Expedient
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+## On disk cache of Elastic Package Registry (epr.elastic.co) package manifests.
+## Manifests are stored once per content digest under objects/, index.json maps package@version to the digest along
+## with the ETag and Last-Modified needed to revalidate it. A published package version does not change, so a cached
+## manifest is used without asking EPR for revalidate_after seconds and then revalidated with a conditional GET.
+## Parsed manifests are also kept for the rest of the process and shared between callers, they must not be modified.
+
+import hashlib
+import os
+import threading
+import time
+from json import loads
+from urllib.error import HTTPError, URLError
+
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.file_cache import FileCache
+except:
+  import sys
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from file_cache import FileCache
+
+DEFAULT_EPR_CACHE_DIR = '~/.ansible/tmp/expedient_elastic_epr'
+DEFAULT_EPR_REVALIDATE_AFTER = 86400
+INDEX_ENTRY_TTL = 30 * 86400 # index entries not used for this long are pruned
+
+_manifests = {}
+_manifest_locks = {}
+_manifests_lock = threading.Lock()
+
+class EprManifestCache(object):
+  def __init__(self, cache_dir = None, revalidate_after = DEFAULT_EPR_REVALIDATE_AFTER, offline = False):
+    self.cache_dir = os.path.expanduser(cache_dir or os.environ.get('EXPEDIENT_EPR_CACHE') or DEFAULT_EPR_CACHE_DIR)
+    self.revalidate_after = revalidate_after
+    self.offline = offline
+    self.index = FileCache(os.path.join(self.cache_dir, 'index.json'))
+
+  def get_object_path(self, digest):
+    return os.path.join(self.cache_dir, 'objects', f'{digest}.json')
+
+  def read_object(self, digest):
+    try:
+      with open(self.get_object_path(digest), 'rb') as object_file:
+        return object_file.read()
+    except OSError:
+      return None
+
+  def write_object(self, content):
+    """
+    Stores content under its sha256 digest and returns the digest. The file is written next to its final name and
+    renamed into place, so a reader never sees a partial manifest.
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    object_path = self.get_object_path(digest)
+    if os.path.exists(object_path):
+      return digest
+    try:
+      os.makedirs(os.path.dirname(object_path), mode=0o700, exist_ok=True)
+      temp_path = f'{object_path}.{os.getpid()}.{threading.get_ident()}'
+      fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+      with os.fdopen(fd, 'wb') as object_file:
+        object_file.write(content)
+      os.replace(temp_path, object_path)
+    except OSError:
+      ## The cache only saves requests, failing to write it must not fail the module
+      pass
+    return digest
+
+  @staticmethod
+  def get_manifest_lock(manifest_key):
+    with _manifests_lock:
+      return _manifest_locks.setdefault(manifest_key, threading.Lock())
+
+  def get_manifest(self, package_name, package_version, fetch):
+    """
+    Returns the manifest of package_name at package_version.
+
+    variables:
+      fetch(function): fetch(headers) sends GET package/{name}/{version} to EPR with the given conditional headers and
+                       returns the response, a 304 response means the cached manifest is still current
+
+    The cached copy is used as is while it is younger than revalidate_after seconds, when offline is set, or when EPR
+    cannot be reached or fails with a server error. Only a manifest that was never cached has to be fetched.
+    """
+    manifest_key = (self.cache_dir, package_name, package_version)
+    with self.get_manifest_lock(manifest_key):
+      if manifest_key in _manifests:
+        return _manifests[manifest_key]
+
+      index_key = f'{package_name}@{package_version}'
+      entry = self.index.get(index_key)
+      content = self.read_object(entry['digest']) if entry else None
+      now = time.time()
+
+      if content is not None and (self.offline or now - entry.get('checked_at', 0) < self.revalidate_after):
+        manifest = loads(content)
+      elif self.offline:
+        raise ValueError(f'The EPR manifest for {index_key} is not cached and EPR may not be queried offline')
+      else:
+        headers = {}
+        if content is not None:
+          if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+          if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        try:
+          response = fetch(headers)
+        except HTTPError as e:
+          if content is None or e.code < 500:
+            raise e
+          response = None
+        except (URLError, OSError):
+          if content is None:
+            raise
+          response = None
+
+        if response is None:
+          manifest = loads(content)
+        elif response.status == 304:
+          response.read()
+          entry['checked_at'] = now
+          manifest = loads(content)
+        else:
+          content = response.read()
+          manifest = loads(content)
+          entry = {
+            'digest': self.write_object(content),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'checked_at': now
+          }
+        if response is not None:
+          self.index.set(index_key, entry, now + INDEX_ENTRY_TTL)
+
+      _manifests[manifest_key] = manifest
+      return manifest
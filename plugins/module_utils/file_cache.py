@@ -0,0 +1,84 @@
+# Copyright 2021 Expedient
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+## Small JSON file cache shared between module runs, every task in a play is its own process so anything worth
+## remembering between tasks has to go to disk. The file is only readable by its owner and guarded with flock.
+
+import fcntl
+import os
+import time
+from json import loads, dumps
+
+class FileCache(object):
+  def __init__(self, path):
+    self.path = os.path.expanduser(path)
+
+  def open_locked(self):
+    cache_dir = os.path.dirname(self.path)
+    if cache_dir:
+      os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+    cache_file = os.fdopen(fd, 'r+')
+    fcntl.flock(cache_file, fcntl.LOCK_EX)
+    return cache_file
+
+  @staticmethod
+  def read_entries(cache_file):
+    cache_file.seek(0)
+    try:
+      return loads(cache_file.read() or '{}')
+    except ValueError:
+      return {}
+
+  @staticmethod
+  def write_entries(cache_file, entries):
+    now = time.time()
+    entries = {key: entry for key, entry in entries.items() if entry.get('expires_at', 0) > now}
+    cache_file.seek(0)
+    cache_file.truncate()
+    cache_file.write(dumps(entries))
+    cache_file.flush()
+    os.fchmod(cache_file.fileno(), 0o600)
+
+  def get(self, key, margin = 0):
+    """
+    Returns the value cached under key, or None when it is missing or expires within margin seconds.
+    """
+    try:
+      with self.open_locked() as cache_file:
+        entry = self.read_entries(cache_file).get(key)
+    except OSError:
+      return None
+    if entry and entry.get('expires_at', 0) - margin > time.time():
+      return entry['value']
+    return None
+
+  def set(self, key, value, expires_at):
+    try:
+      with self.open_locked() as cache_file:
+        entries = self.read_entries(cache_file)
+        entries[key] = {'value': value, 'expires_at': expires_at}
+        self.write_entries(cache_file, entries)
+    except OSError:
+      ## The cache only saves requests, failing to write it must not fail the module
+      pass
+
+  def delete(self, key):
+    try:
+      with self.open_locked() as cache_file:
+        entries = self.read_entries(cache_file)
+        if entries.pop(key, None) is not None:
+          self.write_entries(cache_file, entries)
+    except OSError:
+      pass
@@ -17,9 +17,12 @@ from ansible.module_utils.urls import open_url, urllib_error
 from json import loads, dumps
 from urllib.error import HTTPError
 import urllib.parse
-import requests
-import tempfile
+import hashlib
 import os
+import io
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 try:
   import ansible_collections.expedient.elastic.plugins.module_utils.lookups as lookups
@@ -30,6 +33,15 @@ except:
   sys.path.append(util_path)
   import lookups as lookups
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.transport import get_transport
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from transport import get_transport
+
 try:
   from ansible_collections.expedient.elastic.plugins.module_utils.ece_apiproxy import ECE_API_Proxy
 except:
@@ -39,31 +51,76 @@ except:
   sys.path.append(util_path)
   from ece_apiproxy import ECE_API_Proxy
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.ndjson import iter_ndjson, load_json, load_ndjson, write_ndjson
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from ndjson import iter_ndjson, load_json, load_ndjson, write_ndjson
+
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.multipart import encode_multipart_file
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from multipart import encode_multipart_file
+
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.file_cache import FileCache
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from file_cache import FileCache
+
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.epr_cache import EprManifestCache, DEFAULT_EPR_REVALIDATE_AFTER
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from epr_cache import EprManifestCache, DEFAULT_EPR_REVALIDATE_AFTER
+
+DEFAULT_VERSION_CACHE_PATH = '~/.ansible/tmp/expedient_elastic_kibana_versions.json'
+DEFAULT_VERSION_CACHE_TTL = 3600
+
 class Kibana(object):
-  def __init__(self, module):
+  def __init__(self, module, deployment_info = None, ece_auth = None):
     self.module = module
     self.host = module.params.get('host')
     self.port = module.params.get('port')
     self.username = module.params.get('username')
     self.password = module.params.get('password')
     self.validate_certs = module.params.get('verify_ssl_cert')
+    self.transport = get_transport(module)
+    self.version_source = None
     self.version = None # this is a hack to make it so that we can run the first request to get the clutser version without erroring out
-    self.deployment_info = module.params.get('deployment_info')
+    self.deployment_info = deployment_info or module.params.get('deployment_info')
     if self.deployment_info:
-      self.ece_api_proxy = ECE_API_Proxy(module)
+      self.ece_api_proxy = ECE_API_Proxy(module, self.deployment_info, ece_auth)
     else:
-      self.version = self.get_cluster_version()
+      self.version = self.get_kibana_version()
       self.major_version,self.minor_version,self.patch_version = self.version.split(".")
 
-  def send_api_request(self, endpoint, method, data = None, headers = {}, timeout = 600, space_id = "default", no_kbnver = False,*args, **kwargs):
+  def send_api_request(self, endpoint, method, data = None, headers = {}, timeout = 600, space_id = "default", no_kbnver = False, stream = False, *args, **kwargs):
     
     if self.deployment_info:
-      result = self.ece_api_proxy.send_api_request(endpoint, method, data, headers, timeout, space_id, no_kbnver)
+      result = self.ece_api_proxy.send_api_request(endpoint, method, data, headers, timeout, space_id, no_kbnver, stream = stream)
     else:
-      result = self.send_kibana_api_request(endpoint, method, data, headers, timeout, space_id, no_kbnver)
+      result = self.send_kibana_api_request(endpoint, method, data, headers, timeout, space_id, no_kbnver, stream = stream)
     return result
 
-  def send_kibana_api_request(self, endpoint, method, data=None, headers={}, timeout = 600, space_id = "default", no_kbnver = False, *args, **kwargs):
+  def send_kibana_api_request(self, endpoint, method, data=None, headers={}, timeout = 600, space_id = "default", no_kbnver = False, stream = False, *args, **kwargs):
+    """
+    With stream set, a generator yielding each object of the (ND)JSON response as it is read off the connection is
+    returned instead of the parsed body.
+    """
     
     if space_id != "default":
       url = f'https://{self.host}:{self.port}/s/{space_id}/api/{endpoint}'
@@ -77,7 +134,7 @@ class Kibana(object):
     if self.version and no_kbnver == False:
       headers['kbn-version'] = self.version
     try:
-      response = open_url(
+      response = self.transport.open_url(
         url, 
         data=payload, 
         method=method, 
@@ -88,83 +145,213 @@ class Kibana(object):
         url_password=self.password, 
         timeout=timeout)
     except HTTPError as e:
-      raise e ## This allows errors raised during the request to be inspected while debugging
+      if e.code != 400 or 'kbn-version' not in headers or self.version_source == 'probe':
+        raise e ## This allows errors raised during the request to be inspected while debugging
+      error_body = e.read()
+      if b'out of date' not in error_body:
+        raise HTTPError(e.url, e.code, e.msg, e.hdrs, io.BytesIO(error_body))
+      ## Kibana rejects a kbn-version that no longer matches, which happens when it was upgraded after the version was cached
+      self.refresh_kibana_version()
+      headers['kbn-version'] = self.version
+      response = self.transport.open_url(
+        url, 
+        data=payload, 
+        method=method, 
+        validate_certs=self.validate_certs, 
+        headers=headers,
+        force_basic_auth=True, 
+        url_username=self.username, 
+        url_password=self.password, 
+        timeout=timeout)
     if response.msg == 'No Content' and str(response.status).startswith('2'):
-      return
+      return iter(()) if stream else None
+    elif stream:
+      return iter_ndjson(response)
     else:
-      response_output = response.read()
-      response_str = response_output.decode()
-      response_return = str(response_str).split('\n')
-      response_list = []
-      for i in response_return:
-        return_load = loads(i)
-        response_list.append(return_load)
-      if len(response_list) > 1:
-        return response_list
-      else:
-        return response_list[0]
+      return load_ndjson(response)
   
-  def send_epr_api_request(self, endpoint, method, data=None, headers={}, timeout=600):
+  def send_epr_api_request(self, endpoint, method, data=None, headers={}, timeout=600, raw=False):
     url = f'https://epr.elastic.co/{endpoint}'
     payload = None
+    headers = dict(headers)
     if data:
       headers['Content-Type'] = 'application/json'
       payload = dumps(data)
     if self.version:
       headers['kbn-version'] = self.version
     try:
-      response = open_url(url, data=payload, method=method, validate_certs=self.validate_certs, headers=headers,
+      response = self.transport.open_url(url, data=payload, method=method, validate_certs=self.validate_certs, headers=headers,
                           force_basic_auth=True, url_username=self.username, url_password=self.password, timeout=timeout)
     except HTTPError as e:
       raise e ## This allows errors raised during the request to be inspected while debugging
+    if raw:
+      return response
     return loads(response.read())
 
-  def send_file_api_request(self, endpoint, method, data = None,  headers = {}, file = None, timeout = 600, space_id = "default", no_kbnver = False,*args, **kwargs):
+  def send_file_api_request(self, endpoint, method, data = None,  headers = {}, file = None, timeout = 600, space_id = "default", no_kbnver = False, content = None, *args, **kwargs):
     
     if self.deployment_info:
-      result = self.ece_api_proxy.send_file_api_request(endpoint, method, data, headers, file, timeout, space_id, no_kbnver)
+      result = self.ece_api_proxy.send_file_api_request(endpoint, method, data, headers, file, timeout, space_id, no_kbnver, content = content)
     else:
-      result = self.send_kibana_file_api_request(endpoint, method, data, headers, file, space_id, timeout )
+      result = self.send_kibana_file_api_request(endpoint, method, data, headers, file, space_id, timeout, content = content)
     return result
 
-  def send_kibana_file_api_request(self, endpoint, method, data=None, headers={}, file=None, space_id = "default", timeout = 600, *args, **kwargs):
+  def send_kibana_file_api_request(self, endpoint, method, data=None, headers={}, file=None, space_id = "default", timeout = 600, content = None, *args, **kwargs):
+    """
+    Uploads file (a path) or content (bytes, str or a generator of chunks) as the multipart "file" field.
+    The body is streamed over the shared transport as it is encoded.
+    """
 
     if space_id != "default":
       url = f'https://{self.host}:{self.port}/s/{space_id}/api/{endpoint}'
     else:
       url = f'https://{self.host}:{self.port}/api/{endpoint}'
       
-    headers = {}
-
-    response = None
-    
-    if data:
-      headers['Content-Type'] = 'application/json'
+    headers, body = encode_multipart_file(content = content, path = file)
+    headers['kbn-xsrf'] = 'true'
       
     if self.version:
       headers['kbn-version'] = self.version
     
-    if method == "POST":
-      try:
-        response = requests.post(
-          url, 
-          auth=(self.username, self.password),
-          files={'file': open(file,'rb')}, 
-          headers=headers,
-          timeout=timeout
-        )
-      except HTTPError as e:
-        raise e ## This allows errors raised during the request to be inspected while debugging
-    return loads(response.content.decode())
+    try:
+      response = self.transport.open_url(
+        url, 
+        data=body, 
+        method=method, 
+        validate_certs=self.validate_certs, 
+        headers=headers,
+        force_basic_auth=True, 
+        url_username=self.username, 
+        url_password=self.password, 
+        timeout=timeout)
+    except HTTPError as e:
+      raise e ## This allows errors raised during the request to be inspected while debugging
+    return load_json(response)
+
+  def paginate(
+    self,
+    endpoint,
+    items_key = 'items',
+    page_size = 500,
+    page_param = 'page',
+    size_param = 'perPage',
+    space_id = 'default',
+    prefetch = 0,
+    max_workers = 1,
+    *args,
+    **kwargs
+    ):
+    """
+    Generator that walks every page of a paged Fleet/Kibana list endpoint and yields the items one at a time,
+    so callers never hold more than a few pages in memory.
+
+    variables:
+      endpoint(str): List endpoint, may already carry query parameters (kuery, type, etc.)
+      items_key(str|tuple): Key holding the page's items. A tuple is tried in order (fleet/agents uses 'list' on older versions)
+      page_size(int): Number of items requested per page
+      page_param(str)/size_param(str): Query parameter names, saved objects and detection rules use 'per_page'
+      prefetch(int): Number of pages fetched ahead on a background thread while the current page is consumed
+      max_workers(int): Number of pages fetched concurrently once the first page has returned the total.
+                        Pages are still yielded in page order.
+
+    Returns:
+      generator of dict
+    """
+    separator = '&' if '?' in endpoint else '?'
+    keys = (items_key,) if isinstance(items_key, str) else tuple(items_key)
+
+    def fetch_page(page_number):
+      page_endpoint = f'{endpoint}{separator}{page_param}={page_number}&{size_param}={page_size}'
+      page = self.send_api_request(page_endpoint, 'GET', headers = {}, space_id = space_id)
+      for key in keys:
+        if page and key in page:
+          return page[key] or [], page.get('total')
+      return [], page.get('total') if page else None
+
+    items, total = fetch_page(1)
+    for item in items:
+      yield item
+
+    if total is not None:
+      last_page = -(-total // page_size)
+    else:
+      last_page = None
+
+    if (prefetch or max_workers > 1) and last_page:
+      ## total is known, so the remaining pages can be requested while the current one is being consumed.
+      ## At most `window` pages are in flight or buffered at any time, which keeps memory bounded.
+      window = max(prefetch, max_workers)
+      with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        pending = deque()
+        next_page = 2
+        while next_page <= last_page or pending:
+          while next_page <= last_page and len(pending) < window:
+            pending.append(executor.submit(fetch_page, next_page))
+            next_page = next_page + 1
+          items, total = pending.popleft().result()
+          if not items:
+            for future in pending:
+              future.cancel()
+            break
+          for item in items:
+            yield item
+      return
+
+    page_number = 1
+    while items and len(items) >= page_size and (last_page is None or page_number < last_page):
+      page_number = page_number + 1
+      items, total = fetch_page(page_number)
+      for item in items:
+        yield item
+
+  @staticmethod
+  def format_kuery_value(value):
+    escaped_value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped_value}"'
 
   def get_cluster_status(self):
     endpoint = 'status'
-    return self.send_api_request(endpoint, 'GET')
+    # status is what the version comes from, so it is always sent without a kbn-version header
+    return self.send_api_request(endpoint, 'GET', headers = {}, no_kbnver = True)
 
   def get_cluster_version(self):
     status = self.get_cluster_status()
     return status['version']['number']
 
+  def get_version_cache(self):
+    version_cache_ttl = self.module.params.get('version_cache_ttl')
+    if version_cache_ttl is None:
+      version_cache_ttl = DEFAULT_VERSION_CACHE_TTL
+    if version_cache_ttl <= 0:
+      return None, 0
+    return FileCache(os.environ.get('EXPEDIENT_KIBANA_VERSION_CACHE') or DEFAULT_VERSION_CACHE_PATH), version_cache_ttl
+
+  def get_kibana_version(self):
+    """
+    Returns the Kibana version without a status request where possible: the kibana_version option is used as is,
+    otherwise the version cached for this host within version_cache_ttl seconds, and only then GET status.
+    """
+    kibana_version = self.module.params.get('kibana_version')
+    if kibana_version:
+      self.version_source = 'fact'
+      return kibana_version
+    version_cache, version_cache_ttl = self.get_version_cache()
+    if version_cache:
+      kibana_version = version_cache.get(f'{self.host}:{self.port}')
+      if kibana_version:
+        self.version_source = 'cache'
+        return kibana_version
+    return self.refresh_kibana_version()
+
+  def refresh_kibana_version(self):
+    self.version_source = 'probe'
+    self.version = self.get_cluster_version()
+    self.major_version,self.minor_version,self.patch_version = self.version.split(".")
+    version_cache, version_cache_ttl = self.get_version_cache()
+    if version_cache:
+      version_cache.set(f'{self.host}:{self.port}', self.version, time.time() + version_cache_ttl)
+    return self.version
+
   def get_alert_types(self):
     endpoint = 'alert/types'
     alert_types = self.send_api_request(endpoint, 'GET')
@@ -462,30 +649,90 @@ class Kibana(object):
     update_rule = self.update_security_rule(body)
     return update_rule
 
-  def activate_security_rule(self, rule_name, page_size = 500):
+  def find_security_rules(self, rule_names = None, rule_tags = None, page_size = 500, names_per_query = 50):
+    """
+    Finds detection rules by exact name and/or by tag with paginated detection_engine/rules/_find queries, the
+    names and tags OR'ed together in one KQL filter. Very long name lists are split into names_per_query names
+    per query to keep the URL short.
 
-    #### Getting first page of rules
-    page_number = 1
-    rules = self.get_security_rules_byfilter(rule_name)
-    noOfRules = rules['total']
-    allrules = rules['data']
-    #### Going through each rule page by page and enabling each rule that isn't enabled.
-    while noOfRules > page_size * (page_number - 1):
-        for rule in allrules:
-          if rule['enabled'] == False and rule_name == rule['name']:
-            enable_rule = self.enable_security_rule(rule['id'])
-            return(rule['name'] + ": Rule is updated")
-          elif rule['enabled'] == True and rule_name == rule['name']:
-            return(rule['name'] + ": Rule is already enabled")
-        #page_number = page_number + 1
-        #rules = self.get_security_rules(page_size,page_number)
-        #allrules = rules['data']
+    Returns:
+      dict of {rule id: rule} for every matching rule
+    """
+    rule_names = list(rule_names or [])
+    rule_tags = list(rule_tags or [])
+    filters = []
+    for batch_start in range(0, len(rule_names), names_per_query):
+      batch = rule_names[batch_start:batch_start + names_per_query]
+      filters.append('alert.attributes.name:(' + ' OR '.join(self.format_kuery_value(rule_name) for rule_name in batch) + ')')
+    if rule_tags:
+      filters.append('alert.attributes.tags:(' + ' OR '.join(self.format_kuery_value(rule_tag) for rule_tag in rule_tags) + ')')
+
+    wanted_names = set(rule_names)
+    wanted_tags = set(rule_tags)
+    found_rules = {}
+    for rule_filter in filters:
+      endpoint = f'detection_engine/rules/_find?filter={urllib.parse.quote(rule_filter)}'
+      for rule in self.paginate(endpoint, items_key = 'data', page_size = page_size, size_param = 'per_page'):
+        # The name filter is a phrase match, only exact names are kept
+        if rule['name'] in wanted_names or wanted_tags.intersection(rule.get('tags') or []):
+          found_rules[rule['id']] = rule
+    return found_rules
+
+  def bulk_security_rule_action(self, rule_ids, action = 'enable', batch_size = 100):
+    """
+    Runs a detection engine bulk action (enable, disable, ...) on rule_ids, batch_size rules per request.
+    Kibana versions without _bulk_action fall back to one PATCH per rule for enable and disable.
+
+    Returns:
+      list of the _bulk_action responses, or of the patched rules when falling back
+    """
+    rule_ids = list(rule_ids)
+    responses = []
+    headers = {'kbn-xsrf': True}
+    for batch_start in range(0, len(rule_ids), batch_size):
+      body = {
+        'action': action,
+        'ids': rule_ids[batch_start:batch_start + batch_size]
+      }
+      try:
+        responses.append(self.send_api_request('detection_engine/rules/_bulk_action', 'POST', data = body, headers = headers))
+      except HTTPError as e:
+        if e.code != 404 or responses or action not in ('enable', 'disable'):
+          raise e
+        return [self.send_api_request('detection_engine/rules', 'PATCH', data = {'id': rule_id, 'enabled': action == 'enable'}, headers = headers) for rule_id in rule_ids]
+    return responses
+
+  def set_security_rules_enabled(self, rule_names = None, rule_tags = None, enabled = True, batch_size = 100, check_mode = False):
+    """
+    Enables (or disables) every rule matching rule_names or rule_tags that is not already in that state.
+
+    Returns:
+      dict with changed, the updated and already set rule names, and the requested names that were not found
+    """
+    found_rules = self.find_security_rules(rule_names, rule_tags)
+    rules_to_update = [rule for rule in found_rules.values() if rule['enabled'] != enabled]
+    found_names = set(rule['name'] for rule in found_rules.values())
+    if rules_to_update and not check_mode:
+      self.bulk_security_rule_action([rule['id'] for rule in rules_to_update], 'enable' if enabled else 'disable', batch_size)
+    return {
+      'changed': bool(rules_to_update),
+      'updated': sorted(rule['name'] for rule in rules_to_update),
+      'unchanged': sorted(rule['name'] for rule in found_rules.values() if rule['enabled'] == enabled),
+      'not_found': [rule_name for rule_name in (rule_names or []) if rule_name not in found_names]
+    }
+
+  def activate_security_rule(self, rule_name, page_size = 500):
+    rule_state = self.set_security_rules_enabled([rule_name])
+    if rule_state['updated']:
+      return rule_name + ": Rule is updated"
+    elif rule_state['unchanged']:
+      return rule_name + ": Rule is already enabled"
     return rule_name + ": Rule not found"
 
   # Elastic Integration functions
 
   def get_integrations(self):
-    if 'self.major_version' in locals():
+    if hasattr(self, 'major_version'):
       major_version = self.major_version
       minor_version = self.minor_version
     else:
@@ -546,9 +793,18 @@ class Kibana(object):
         
   # Elastic Integration Package Policy functions
 
+  def iter_pkg_policies(self, perPage = 500, prefetch = 0, kuery = None):
+      endpoint  = 'fleet/package_policies'
+      if kuery:
+        endpoint = f'{endpoint}?kuery={urllib.parse.quote(kuery)}'
+      return self.paginate(endpoint, page_size = perPage, prefetch = prefetch)
+
   def get_all_pkg_policies(self, perPage = 500):
-      endpoint  = 'fleet/package_policies?perPage='+ str(perPage)
-      pkgpolicy_objects = self.send_api_request(endpoint, 'GET')
+      pkgpolicy_items = list(self.iter_pkg_policies(perPage))
+      pkgpolicy_objects = {
+        'items': pkgpolicy_items,
+        'total': len(pkgpolicy_items)
+      }
       return pkgpolicy_objects
   
   def update_pkg_policy(self,pkgpolicy_id,body):
@@ -586,18 +842,41 @@ class Kibana(object):
       return pkg_policy_update
   
   def get_pkg_policy(self,pkg_policy_name):
-    pkg_policy_objects = self.get_all_pkg_policies()
+    ## The name filter is applied by Fleet, the comparison below only guards against partial matches
+    kuery = f'ingest-package-policies.name:{self.format_kuery_value(pkg_policy_name)}'
     pkg_policy_object = ""
-    for pkgPolicy in pkg_policy_objects['items']:
+    for pkgPolicy in self.iter_pkg_policies(perPage = 20, kuery = kuery):
       if pkgPolicy['name'].upper() == pkg_policy_name.upper():
         pkg_policy_object = pkgPolicy
         break
     return pkg_policy_object
   
+  def get_epr_cache(self):
+    epr_revalidate_after = self.module.params.get('epr_revalidate_after')
+    if epr_revalidate_after is None:
+      epr_revalidate_after = DEFAULT_EPR_REVALIDATE_AFTER
+    return EprManifestCache(revalidate_after = epr_revalidate_after, offline = bool(self.module.params.get('epr_offline')))
+
   def get_elatic_package_repository_package_info(self, package_name, package_version):
+    """
+    Returns the EPR manifest of the package version from the on disk manifest cache, fetching or revalidating it only
+    when needed. The manifest is shared with every other caller in the process and must not be modified.
+    """
     endpoint = "package/" + package_name + "/" + package_version
-    epr_object = self.send_epr_api_request(endpoint, 'GET')
-    return epr_object
+    return self.get_epr_cache().get_manifest(package_name, package_version,
+      lambda headers: self.send_epr_api_request(endpoint, 'GET', headers = headers, raw = True))
+
+  @staticmethod
+  def get_pkg_policy_var(epr_var):
+    """
+    Turns an EPR manifest variable into a package policy variable, the default becomes the value.
+    A new dict is returned, the manifest is left as it is.
+    """
+    pkg_policy_var = {var_key: var_value for var_key, var_value in epr_var.items()
+                      if var_key not in ('name', 'title', 'multi', 'required', 'show_user', 'description', 'default')}
+    if 'default' in epr_var:
+      pkg_policy_var['value'] = epr_var['default']
+    return pkg_policy_var
   
   def create_pkg_policy(self,pkg_policy_name, pkg_policy_desc, agent_policy_id, integration_object, space_id="default", var_list=None):
     pkg_policy_object = self.get_pkg_policy(pkg_policy_name)
@@ -629,18 +908,7 @@ class Kibana(object):
               if 'vars' in epr_inputs:
                 inputs_entry['vars'] = {}
                 for epr_inputs_var in epr_inputs['vars']:
-                  epr_inputs_var.pop('title')
-                  epr_inputs_var.pop('multi')
-                  epr_inputs_var.pop('required')
-                  epr_inputs_var.pop('show_user')
-                  if 'description' in epr_inputs_var: 
-                    epr_inputs_var.pop('description')
-                  if 'default' in epr_inputs_var:
-                    epr_inputs_var['value'] = epr_inputs_var['default']
-                    epr_inputs_var.pop('default')
-                  var_name = epr_inputs_var['name']
-                  epr_inputs_var.pop('name')
-                  inputs_entry['vars'][var_name] = epr_inputs_var
+                  inputs_entry['vars'][epr_inputs_var['name']] = self.get_pkg_policy_var(epr_inputs_var)
                   #inputs_entry['vars'].update(epr_inputs_var)
               else:
                 inputs_entry['vars'] = {}
@@ -660,24 +928,15 @@ class Kibana(object):
                         inputs_body_streams_entry['vars'] = {}
                         for epr_stream_var in epr_stream['vars']:
                           inputs_body_streams_var_entry = {}
-                          epr_stream_var.pop('title')
-                          epr_stream_var.pop('multi')
-                          epr_stream_var.pop('required')
-                          epr_stream_var.pop('show_user')
-                          if 'description' in epr_stream_var:
-                            epr_stream_var.pop('description')
                           var_name = epr_stream_var['name']
-                          epr_stream_var.pop('name')
-                          if 'default' in epr_stream_var:
-                            epr_stream_var['value'] = epr_stream_var['default']
-                            epr_stream_var.pop('default')
+                          pkg_policy_stream_var = self.get_pkg_policy_var(epr_stream_var)
                           if var_list_JSON != None:
                             for var_JSON in var_list_JSON:
                               for var_key, var_value in var_JSON.items():
                                 var_key_type, var_key_name = var_key.split(':')
                                 if var_key_type == epr_inputs['type'] and var_name == var_key_name:
-                                  epr_stream_var['value'] = var_value
-                          inputs_body_streams_var_entry[var_name] = epr_stream_var
+                                  pkg_policy_stream_var['value'] = var_value
+                          inputs_body_streams_var_entry[var_name] = pkg_policy_stream_var
                           inputs_body_streams_entry['vars'].update(inputs_body_streams_var_entry)
                       if inputs_body_streams_entry:
                         inputs_entry['streams'].append(inputs_body_streams_entry)
@@ -733,13 +992,33 @@ class Kibana(object):
 # Elastic Agent Policy functions
 
   def get_agentpolicy_enrollment_tokens(self, perPage = 500):
-    endpoint  = 'fleet/enrollment_api_keys?perPage='+ str(perPage)
-    enrollment_api_objects = self.send_api_request(endpoint, 'GET')
+    endpoint  = 'fleet/enrollment_api_keys'
+    enrollment_api_items = list(self.paginate(endpoint, items_key = ('items', 'list'), page_size = perPage))
+    enrollment_api_objects = {
+      'items': enrollment_api_items,
+      'total': len(enrollment_api_items)
+    }
     return enrollment_api_objects
 
+  def iter_agent_policies(self, perPage = 500, prefetch = 0, kuery = None, agent_count = True, full = None):
+    query = []
+    if kuery:
+      query.append(f'kuery={urllib.parse.quote(kuery)}')
+    if not agent_count:
+      query.append('noAgentCount=true') # skips counting the enrolled agents of every returned policy
+    if full is not None:
+      query.append(f'full={str(full).lower()}') # full=false leaves the package policies out of every returned policy
+    endpoint  = 'fleet/agent_policies'
+    if query:
+      endpoint = f'{endpoint}?{"&".join(query)}'
+    return self.paginate(endpoint, page_size = perPage, prefetch = prefetch)
+
   def get_all_agent_policys(self, perPage = 500):
-    endpoint  = 'fleet/agent_policies?perPage='+ str(perPage)
-    agent_policy_objects = self.send_api_request(endpoint, 'GET')
+    agent_policy_items = list(self.iter_agent_policies(perPage))
+    agent_policy_objects = {
+      'items': agent_policy_items,
+      'total': len(agent_policy_items)
+    }
     return agent_policy_objects
 
   def create_agent_policy(self, agent_policy_id, agent_policy_name, agent_policy_desc, protected=False, space_id="default", monitoring=[]):
@@ -768,11 +1047,11 @@ class Kibana(object):
 
   def get_agent_policy_byname(self, agent_policy_name):
     agent_policy_object = None
-    agent_policy_objects = self.get_all_agent_policys()
-    for agent_policy in agent_policy_objects['items']:
+    kuery = f'ingest-agent-policies.name:{self.format_kuery_value(agent_policy_name)}'
+    for agent_policy in self.iter_agent_policies(perPage = 20, kuery = kuery, agent_count = False, full = False):
         if agent_policy['name'].upper() == agent_policy_name.upper():
             agent_policy_object = agent_policy
-            continue
+            break
     return agent_policy_object
  
   def get_agent_policy_byid(self, agent_policy_id):
@@ -811,20 +1090,16 @@ class Kibana(object):
 
 # Elastic Agent functions
 
-  def get_agent_list(self, page_size = 500, page_number = 1) :
-    endpoint  = "fleet/agents?page=" + str(page_number) + "&perPage=" + str(page_size)
-    agent_list = self.send_api_request(endpoint, 'GET')
-    noOfAgents = agent_list['total']
-    #agent_list_result = agent_list['list']
-    agent_list_result = agent_list
-    while noOfAgents > page_size * (page_number - 1):
-      agent_no = 0
-      endpoint  = "fleet/agents?page=" + str(page_number) + "&perPage=" + str(page_size)
-      agent_list_page = self.send_api_request(endpoint, 'GET')
-      while agent_no < len(agent_list_page['list']):
-        agent_list_result['list'].append(agent_list_page['list'][agent_no])   
-        agent_no = agent_no + 1
-      page_number = page_number + 1
+  def iter_agents(self, page_size = 500, prefetch = 0, max_workers = 1):
+    endpoint  = 'fleet/agents'
+    return self.paginate(endpoint, items_key = ('items', 'list'), page_size = page_size, prefetch = prefetch, max_workers = max_workers)
+
+  def get_agent_list(self, page_size = 500, prefetch = 0, max_workers = 1) :
+    agent_list = list(self.iter_agents(page_size, prefetch, max_workers))
+    agent_list_result = {
+      'list': agent_list,
+      'total': len(agent_list)
+    }
     return agent_list_result
 
 # Elastic Saved Objects
@@ -858,16 +1133,93 @@ class Kibana(object):
       endpoint  = f'saved_objects/{object_type}/{object_id}'
       try:
         target_object = self.send_api_request(endpoint, 'GET', space_id = space_id)
-      except:
+      except HTTPError as e:
+        if e.code != 404:
+          raise e
         target_object = {}
     return target_object
 
-  def get_saved_objects_list(self, object_string, object_type, space_id = 'default'):
-    page_size = 500
-    page_number = 1
+  def bulk_get_saved_objects(self, objects, space_id = 'default', batch_size = 100):
+    """
+    Fetches many saved objects by type and id with saved_objects/_bulk_get, batch_size objects per request.
+
+    variables:
+      objects(list): [{'type': ..., 'id': ...}]
+
+    Returns:
+      list in the same order as objects, holding the saved object or None where it was not found
+    """
+    found_objects = []
+    headers = {'kbn-xsrf': True}
+    for batch_start in range(0, len(objects), batch_size):
+      batch = [{'type': saved_object['type'], 'id': saved_object['id']} for saved_object in objects[batch_start:batch_start + batch_size]]
+      result = self.send_api_request('saved_objects/_bulk_get', 'POST', data = batch, headers = headers, space_id = space_id)
+      for found_object in result['saved_objects']:
+        found_objects.append(None if found_object.get('error') else found_object)
+    return found_objects
+
+  def find_saved_objects_by_name(self, objects, space_id = 'default', names_per_query = 50, page_size = 1000):
+    """
+    Finds many saved objects by type and name (or title) with one combined _find query, the names OR'ed together as
+    quoted phrases. Very long name lists are split into names_per_query names per query to keep the URL short.
+
+    variables:
+      objects(list): [{'type': ..., 'name': ...}]
+
+    Returns:
+      dict of {(type, name): saved object} for the objects that were found
+    """
+    found_objects = {}
+    wanted = set((saved_object['type'], saved_object['name']) for saved_object in objects)
+    wanted_list = sorted(wanted)
+    for batch_start in range(0, len(wanted_list), names_per_query):
+      batch = wanted_list[batch_start:batch_start + names_per_query]
+      object_types = sorted(set(object_type for object_type, object_name in batch))
+      search = ' | '.join(sorted(set(self.format_kuery_value(object_name) for object_type, object_name in batch)))
+      type_params = '&'.join(f'type={urllib.parse.quote(object_type)}' for object_type in object_types)
+      endpoint = f'saved_objects/_find?{type_params}&search_fields=name&search_fields=title&search={urllib.parse.quote(search)}'
+      for found_object in self.paginate(endpoint, items_key = 'saved_objects', page_size = page_size, size_param = 'per_page', space_id = space_id):
+        attributes = found_object.get('attributes') or {}
+        for attribute_name in ('name', 'title'):
+          object_key = (found_object['type'], attributes.get(attribute_name))
+          if object_key in wanted and object_key not in found_objects:
+            found_objects[object_key] = found_object
+    return found_objects
+
+  def get_saved_objects(self, objects, space_id = 'default'):
+    """
+    Resolves a list of saved object references, each either {'type', 'id'} or {'type', 'name'}, using _bulk_get for
+    the ids and a combined _find for the names.
+
+    Returns:
+      list in the same order as objects, holding the saved object or None where it was not found
+    """
+    id_objects = [saved_object for saved_object in objects if saved_object.get('id')]
+    name_objects = [saved_object for saved_object in objects if not saved_object.get('id') and saved_object.get('name')]
+    found_by_id = {}
+    if id_objects:
+      for saved_object, found_object in zip(id_objects, self.bulk_get_saved_objects(id_objects, space_id = space_id)):
+        found_by_id[(saved_object['type'], saved_object['id'])] = found_object
+    found_by_name = self.find_saved_objects_by_name(name_objects, space_id = space_id) if name_objects else {}
+    found_objects = []
+    for saved_object in objects:
+      if saved_object.get('id'):
+        found_objects.append(found_by_id.get((saved_object['type'], saved_object['id'])))
+      else:
+        found_objects.append(found_by_name.get((saved_object['type'], saved_object.get('name'))))
+    return found_objects
+
+  def iter_saved_objects(self, object_string, object_type, space_id = 'default', page_size = 500, prefetch = 0):
     object_name_quote = urllib.parse.quote(object_string)
-    endpoint  = f'saved_objects/_find?type={object_type}&search_fields=name&search_fields=title&search={object_name_quote}&page={str(page_number)}&per_page={str(page_size)}'
-    found_objects = self.send_api_request(endpoint, 'GET', space_id = space_id)
+    endpoint  = f'saved_objects/_find?type={object_type}&search_fields=name&search_fields=title&search={object_name_quote}'
+    return self.paginate(endpoint, items_key = 'saved_objects', page_size = page_size, size_param = 'per_page', space_id = space_id, prefetch = prefetch)
+
+  def get_saved_objects_list(self, object_string, object_type, space_id = 'default'):
+    saved_objects = list(self.iter_saved_objects(object_string, object_type, space_id = space_id))
+    found_objects = {
+      'saved_objects': saved_objects,
+      'total': len(saved_objects)
+    }
     return found_objects
 
   def update_saved_object(self, saved_object, object_type, object_id, object_attributes, *args, **kwargs):
@@ -888,15 +1240,72 @@ class Kibana(object):
       deleted_object = ''
     return deleted_object
   
+  def resolve_saved_object_names(self, object_type, object_names, space_id = 'default', page_size = 1000):
+    """
+    Resolves many saved object names (or titles) to ids with a single paginated _find over the object type, only
+    fetching the name and title attributes. Returns {name: id} for the names that were found.
+    """
+    wanted_names = set(object_names)
+    resolved_names = {}
+    endpoint = f'saved_objects/_find?type={object_type}&fields=name&fields=title'
+    for found_object in self.paginate(endpoint, items_key = 'saved_objects', page_size = page_size, size_param = 'per_page', space_id = space_id):
+      attributes = found_object.get('attributes') or {}
+      for attribute_name in ('name', 'title'):
+        if attributes.get(attribute_name) in wanted_names and attributes[attribute_name] not in resolved_names:
+          resolved_names[attributes[attribute_name]] = found_object['id']
+      if len(resolved_names) == len(wanted_names):
+        break
+    return resolved_names
+
+  def bulk_delete_saved_objects(self, object_type, object_ids, space_id = 'default', batch_size = 100, force = False):
+    """
+    Deletes saved objects with saved_objects/_bulk_delete, batch_size objects per request.
+    Kibana versions without _bulk_delete fall back to one DELETE per object.
+
+    Returns:
+      list of {id, type, success, error} statuses, one per object
+    """
+    statuses = []
+    object_ids = list(object_ids)
+    headers = {'kbn-xsrf': True}
+    for batch_start in range(0, len(object_ids), batch_size):
+      batch = [{'type': object_type, 'id': object_id} for object_id in object_ids[batch_start:batch_start + batch_size]]
+      endpoint = f'saved_objects/_bulk_delete?force={str(force).lower()}'
+      try:
+        result = self.send_api_request(endpoint, 'POST', data = batch, headers = headers, space_id = space_id)
+        statuses.extend(result['statuses'])
+      except HTTPError as e:
+        if e.code != 404 or statuses:
+          raise e
+        return self.delete_saved_objects_one_by_one(object_type, object_ids, space_id)
+    return statuses
+
+  def delete_saved_objects_one_by_one(self, object_type, object_ids, space_id = 'default'):
+    statuses = []
+    for object_id in object_ids:
+      endpoint  = f'saved_objects/{object_type}/{object_id}'
+      try:
+        self.send_api_request(endpoint, 'DELETE', headers = {'kbn-xsrf': True}, space_id = space_id)
+        statuses.append({'id': object_id, 'type': object_type, 'success': True})
+      except HTTPError as e:
+        statuses.append({'id': object_id, 'type': object_type, 'success': False, 'error': {'statusCode': e.code, 'message': e.reason}})
+    return statuses
+
   def export_saved_object(self,
       object_type, 
       object_id, 
       space_id = "default", 
       includeReferencesDeep = True, 
       excludeExportDetails = True, 
+      export_file = None,
       *args, 
       **kwargs 
     ):
+    """
+    Exports a saved object (and by default everything it references).
+    With export_file set, the export is streamed straight to that file as NDJSON and the number of exported objects is
+    returned, so large exports never have to fit in memory.
+    """
     endpoint = "saved_objects/_export"
     object = {
       "type": object_type,
@@ -910,24 +1319,23 @@ class Kibana(object):
     objects.append(object)
     body['objects'] = objects
     #body['excludeExportDetails'] = True
-    body_JSON = dumps(body)
     headers = {}
     headers['kbn-xsrf'] = True
-    export_object = self.send_api_request(endpoint, 'POST', data=body_JSON, headers = headers, space_id = space_id, no_kbnver = True)
+    if export_file:
+      export_objects = self.send_api_request(endpoint, 'POST', data=body, headers = headers, space_id = space_id, no_kbnver = True, stream = True)
+      return write_ndjson(export_objects, export_file)
+    export_object = self.send_api_request(endpoint, 'POST', data=body, headers = headers, space_id = space_id, no_kbnver = True)
     return export_object
 
   def import_saved_object(self, object_attributes, space_id = "default", overwrite = False, createNewCopies = True):
-    importObjectJSON = tempfile.NamedTemporaryFile(delete=False,suffix='.ndjson', prefix='saved_object_')
-    #object_attributes_json = loads(object_attributes)
-    import_file = open(importObjectJSON.name, 'a')
-    #for i in object_attributes_json:
-    #  import_file.write(dumps(i) + '\n')
-    import_file.write(object_attributes)
-    import_file.close()
-    importObjectJSON.close()
+    """
+    Imports saved objects. object_attributes is the NDJSON export as a str or bytes, a list of saved object dicts,
+    or a generator of NDJSON lines, and is streamed to Kibana as it is encoded.
+    """
+    if isinstance(object_attributes, list):
+      object_attributes = (dumps(saved_object) + '\n' for saved_object in object_attributes)
     endpoint = f'saved_objects/_import?createNewCopies={createNewCopies}&overwrite={overwrite}'
-    import_object = self.send_file_api_request(endpoint, 'POST', file=importObjectJSON.name, space_id = space_id)
-    os.remove(importObjectJSON.name)
+    import_object = self.send_file_api_request(endpoint, 'POST', content = object_attributes, space_id = space_id)
     return import_object
 
   def get_fleet_server_hosts(self):
@@ -967,6 +1375,40 @@ class Kibana(object):
 
 # Elastic Space
 
+  def get_spaces(self):
+    endpoint  = 'spaces/space'
+    return self.send_api_request(endpoint, 'GET')
+
+  def resolve_space_ids(self, space_ids):
+    """
+    Expands a space_ids option, 'all' (on its own or in the list) stands for every space in Kibana.
+    """
+    if isinstance(space_ids, str):
+      space_ids = [space_ids]
+    if 'all' in space_ids:
+      return [space['id'] for space in self.get_spaces()]
+    return list(dict.fromkeys(space_ids))
+
+  def run_in_spaces(self, space_ids, operation, max_workers = 8):
+    """
+    Runs operation(space_id) for every space on a bounded thread pool, sharing this client's connections, login and
+    Kibana version. A failure in one space is recorded against it and does not stop the others.
+
+    Returns:
+      dict of {space_id: {'result': ...}} or {space_id: {'failed': True, 'msg': ...}} in space_ids order
+    """
+    def run_operation(space_id):
+      try:
+        return {'result': operation(space_id)}
+      except HTTPError as e:
+        return {'failed': True, 'msg': f'{e.code} {e.reason}: {e.read().decode(errors="replace")}'}
+      except Exception as e:
+        return {'failed': True, 'msg': str(e)}
+
+    with ThreadPoolExecutor(max_workers = max(1, min(max_workers, len(space_ids) or 1))) as executor:
+      space_results = list(executor.map(run_operation, space_ids))
+    return dict(zip(space_ids, space_results))
+
   def get_space(self, id, *args, **kwargs ):
       endpoint  = f'spaces/space'
       spaces = self.send_api_request(endpoint, 'GET')
@@ -1078,27 +1520,59 @@ class Kibana(object):
     kibana_settings = self.send_api_request(endpoint, 'GET', space_id = space_id)
     return kibana_settings
 
-  def update_kibana_settings(self, settings, space_id = 'default', *args, **kwargs ):
+  @staticmethod
+  def diff_kibana_settings(settings, current_settings):
+    """
+    Compares the wanted settings with the user values returned by get_kibana_settings().
+
+    Returns:
+      dict of {setting: {'changed', 'before', 'after'}} for every wanted setting
+    """
+    current_values = (current_settings or {}).get('settings') or {}
+    settings_diff = {}
     for setting, value in settings.items():
-      endpoint  = f'kibana/settings/{setting}'
+      before = (current_values.get(setting) or {}).get('userValue')
+      settings_diff[setting] = {
+        'changed': before != value,
+        'before': before,
+        'after': value
+      }
+    return settings_diff
+
+  def update_kibana_settings(self, settings, space_id = 'default', check_mode = False, *args, **kwargs ):
+    """
+    Writes only the settings whose value differs from the current one, all of them in a single changes request.
+
+    Returns:
+      dict with changed, the per setting diff in settings, and the Kibana response in result when something was written
+    """
+    settings_diff = self.diff_kibana_settings(settings, self.get_kibana_settings(space_id))
+    changes = {setting: setting_diff['after'] for setting, setting_diff in settings_diff.items() if setting_diff['changed']}
+    result = None
+    if changes and not check_mode:
+      endpoint  = 'kibana/settings'
       body = {
-        "value": value
-      } 
-      body_json = dumps(body)
-      result = self.send_api_request(endpoint, 'POST', data = body_json, space_id = space_id)
-    return result
+        "changes": changes
+      }
+      result = self.send_api_request(endpoint, 'POST', data = body, headers = {'kbn-xsrf': True}, space_id = space_id)
+    return {
+      'changed': bool(changes),
+      'settings': settings_diff,
+      'result': result
+    }
   
 # Exception Lists
 
-  def get_security_exception_list(self, namespace_type = 'agnostic', space_id = 'default'):
+  def get_security_exception_list(self, namespace_type = 'agnostic', space_id = 'default', page_size = 100):
     endpoint = f'exception_lists/_find?namespace_type={namespace_type}'
-    result = self.send_api_request(endpoint, 'GET', space_id = space_id)
-    return result['data']
+    return list(self.paginate(endpoint, items_key = 'data', page_size = page_size, size_param = 'per_page', space_id = space_id))
 
-  def get_security_exception_list_item(self, list_id = 'endpoint_list', namespace_type = 'agnostic', space_id = 'default'):
+  def iter_security_exception_list_items(self, list_id = 'endpoint_list', namespace_type = 'agnostic', space_id = 'default', page_size = 100, prefetch = 0):
     endpoint = f'exception_lists/items/_find?list_id={list_id}&namespace_type={namespace_type}'
-    result = self.send_api_request(endpoint, 'GET', space_id = space_id)
-    return result['data']
+    return self.paginate(endpoint, items_key = 'data', page_size = page_size, size_param = 'per_page', space_id = space_id, prefetch = prefetch)
+
+  def get_security_exception_list_item(self, list_id = 'endpoint_list', namespace_type = 'agnostic', space_id = 'default'):
+    return list(self.iter_security_exception_list_items(list_id, namespace_type, space_id))
   
   def create_security_exception_list_items(self, id, body, space_id = 'default', namespace_type = 'agnostic'):
     endpoint = f'exception_lists/items?id={id}&namespace_type={namespace_type}'
@@ -1110,6 +1584,70 @@ class Kibana(object):
     endpoint = f'exception_lists/items?item_id={item_id}&namespace_type={namespace_type}'
     result = self.send_api_request(endpoint, 'DELETE', space_id = space_id)
     return result
+
+  def update_security_exception_list_items(self, item_id, body, space_id = 'default', namespace_type = 'agnostic'):
+    endpoint = 'exception_lists/items'
+    body = dict(body, item_id = item_id, namespace_type = namespace_type)
+    body.pop('list_id', None)
+    result = self.send_api_request(endpoint, 'PUT', data = body, headers = {'kbn-xsrf': True}, space_id = space_id)
+    return result
+
+  @staticmethod
+  def hash_exception_list_item(item, fields):
+    ## Only the fields the wanted item sets are compared, the server adds ids, timestamps and versions of its own
+    projection = {field: item.get(field) for field in sorted(fields) if field not in ('item_id', 'list_id', 'namespace_type')}
+    return hashlib.sha256(dumps(projection, sort_keys = True).encode('utf-8')).hexdigest()
+
+  def sync_security_exception_list_items(self, items, list_id = 'endpoint_list', space_id = 'default', namespace_type = 'agnostic', purge = False, check_mode = False):
+    """
+    Converges an exception list onto the wanted items. Existing items are read once, page by page, and indexed by
+    item_id and by upper cased name. Each wanted item is matched by its item_id, or by name when it has none, and
+    compared by hash, so only new items are created and only items that differ are updated. Extra items sharing
+    a wanted item's name are deleted, and with purge every item that is not wanted is deleted too.
+
+    Returns:
+      dict with the created, updated, deleted and unchanged item names, and changed
+    """
+    existing_by_id = {}
+    existing_by_name = {}
+    for existing_item in self.iter_security_exception_list_items(list_id, namespace_type, space_id):
+      existing_by_id[existing_item['item_id']] = existing_item
+      existing_by_name.setdefault(str(existing_item.get('name')).upper(), []).append(existing_item)
+
+    sync_result = {'created': [], 'updated': [], 'deleted': [], 'unchanged': []}
+    kept_item_ids = set()
+    for item in items:
+      if item.get('item_id'):
+        matching_items = [existing_by_id[item['item_id']]] if item['item_id'] in existing_by_id else []
+      else:
+        matching_items = existing_by_name.get(str(item.get('name')).upper(), [])
+
+      if not matching_items:
+        if not check_mode:
+          self.create_security_exception_list_items(id = list_id, body = dict(item, list_id = list_id), space_id = space_id, namespace_type = namespace_type)
+        sync_result['created'].append(item.get('name'))
+        continue
+
+      kept_item = matching_items[0]
+      kept_item_ids.add(kept_item['item_id'])
+      if self.hash_exception_list_item(item, item.keys()) != self.hash_exception_list_item(kept_item, item.keys()):
+        if not check_mode:
+          self.update_security_exception_list_items(kept_item['item_id'], item, space_id = space_id, namespace_type = namespace_type)
+        sync_result['updated'].append(item.get('name'))
+      else:
+        sync_result['unchanged'].append(item.get('name'))
+
+    wanted_names = set(str(item.get('name')).upper() for item in items if not item.get('item_id'))
+    for existing_item in existing_by_id.values():
+      if existing_item['item_id'] in kept_item_ids:
+        continue
+      if str(existing_item.get('name')).upper() in wanted_names or purge:
+        if not check_mode:
+          self.delete_security_exception_list_items(item_id = existing_item['item_id'], space_id = space_id, namespace_type = namespace_type)
+        sync_result['deleted'].append(existing_item.get('name'))
+
+    sync_result['changed'] = bool(sync_result['created'] or sync_result['updated'] or sync_result['deleted'])
+    return sync_result
   
 # Data View
 
@@ -0,0 +1,80 @@
+# Copyright 2021 Expedient
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+## Streaming multipart/form-data encoder for file uploads (saved object import) over the shared transport.
+## The file part is produced chunk by chunk from bytes, a path, an open file or a generator, never copied into
+## a second buffer or a temporary file.
+
+import os
+import uuid
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+def iter_content_chunks(content, chunk_size = DEFAULT_CHUNK_SIZE):
+  if isinstance(content, str):
+    content = content.encode('utf-8')
+  if isinstance(content, (bytes, bytearray)):
+    yield bytes(content)
+  elif hasattr(content, 'read'):
+    while True:
+      chunk = content.read(chunk_size)
+      if not chunk:
+        break
+      yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+  else:
+    for chunk in content:
+      yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+def encode_multipart_file(content = None, path = None, field_name = 'file', filename = 'file.ndjson', content_type = 'application/ndjson', boundary = None):
+  """
+  Builds a multipart/form-data body holding a single file field.
+
+  variables:
+    content(bytes|str|file|iterable): File content, an iterable is sent as it is consumed
+    path(str): Path of a file to stream instead of content
+
+  Returns:
+    headers(dict): Content-Type, plus Content-Length when the size is known up front (otherwise the body is sent chunked)
+    body(generator): bytes of the request body
+  """
+  boundary = boundary or uuid.uuid4().hex
+  if isinstance(content, str):
+    content = content.encode('utf-8')
+  if path:
+    filename = os.path.basename(path)
+  preamble = (
+    f'--{boundary}\r\n'
+    f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+    f'Content-Type: {content_type}\r\n\r\n'
+  ).encode('utf-8')
+  epilogue = f'\r\n--{boundary}--\r\n'.encode('utf-8')
+
+  headers = {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+  if path:
+    headers['Content-Length'] = str(len(preamble) + os.path.getsize(path) + len(epilogue))
+  elif isinstance(content, (bytes, bytearray)):
+    headers['Content-Length'] = str(len(preamble) + len(content) + len(epilogue))
+
+  def body():
+    yield preamble
+    if path:
+      with open(path, 'rb') as content_file:
+        for chunk in iter_content_chunks(content_file):
+          yield chunk
+    else:
+      for chunk in iter_content_chunks(content):
+        yield chunk
+    yield epilogue
+
+  return headers, body()
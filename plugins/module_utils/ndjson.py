@@ -0,0 +1,79 @@
+# Copyright 2021 Expedient
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+## Incremental parsing of JSON and newline delimited JSON (saved object exports, bulk and msearch responses)
+
+from json import loads, dumps
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+def iter_ndjson_lines(response, chunk_size = DEFAULT_CHUNK_SIZE):
+  """
+  Yields every non blank line of the response body, reading it chunk_size bytes at a time so that only one
+  line is held in memory however large the body is.
+  """
+  remainder = b''
+  while True:
+    chunk = response.read(chunk_size)
+    if not chunk:
+      break
+    lines = (remainder + chunk).split(b'\n')
+    remainder = lines.pop()
+    for line in lines:
+      if line.strip():
+        yield line
+  if remainder.strip():
+    yield remainder
+
+def iter_ndjson(response, chunk_size = DEFAULT_CHUNK_SIZE):
+  """
+  Yields each object of a newline delimited JSON response as soon as its line has arrived.
+  """
+  for line in iter_ndjson_lines(response, chunk_size):
+    yield loads(line)
+
+def load_ndjson(response):
+  """
+  Parses a JSON or newline delimited JSON response the way the API clients always have: a single object is returned
+  as is and several objects as a list. Blank lines, such as a trailing newline, are skipped and None is returned for
+  an empty body.
+  """
+  response_list = list(iter_ndjson(response))
+  if len(response_list) > 1:
+    return response_list
+  elif response_list:
+    return response_list[0]
+  return None
+
+def load_json(response):
+  """
+  Parses a response body as one JSON document, which may span several lines (pretty printed responses). Bodies sent
+  as application/x-ndjson or application/ndjson are parsed line by line with load_ndjson instead.
+  """
+  content_type = (response.headers.get('Content-Type') or '') if response.headers else ''
+  if 'ndjson' in content_type:
+    return load_ndjson(response)
+  content = response.read()
+  return loads(content) if content.strip() else None
+
+def write_ndjson(objects, path):
+  """
+  Writes objects to path one JSON document per line and returns how many were written.
+  """
+  object_count = 0
+  with open(path, 'w') as ndjson_file:
+    for ndjson_object in objects:
+      ndjson_file.write(dumps(ndjson_object) + '\n')
+      object_count = object_count + 1
+  return object_count
@@ -0,0 +1,187 @@
+# Copyright 2021 Expedient
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+## Structural diff and patch of Fleet package policies, shared by the package policy modules.
+## Inputs are indexed by type and their streams by dataset and data stream type once, so each requested toggle or
+## variable override is a lookup instead of another walk over inputs x streams. Changes are made to the policy as
+## read and compared against a snapshot taken first, so the policy only has to be PUT when something differs.
+## Fields Fleet generates from the rest of the policy (compiled_input, compiled_stream) never count as a difference,
+## inputs supplied by a task do not carry them.
+
+from copy import deepcopy
+
+_MISSING = object()
+GENERATED_KEYS = ('compiled_input', 'compiled_stream')
+
+class PkgPolicyDiff(object):
+  def __init__(self, pkg_policy):
+    self.original = deepcopy(pkg_policy)
+    self.pkg_policy = pkg_policy
+    self.index_inputs()
+
+  def index_inputs(self):
+    self.inputs_by_type = {}
+    self.streams_by_input = {}
+    for policy_input in self.pkg_policy.get('inputs') or []:
+      if 'type' in policy_input:
+        self.inputs_by_type.setdefault(policy_input['type'], []).append(policy_input)
+      streams_by_key = {}
+      for stream in policy_input.get('streams') or []:
+        data_stream = stream.get('data_stream') or {}
+        for stream_key in {data_stream.get('dataset'), data_stream.get('type')} - {None}:
+          streams_by_key.setdefault(stream_key, []).append(stream)
+      self.streams_by_input[id(policy_input)] = streams_by_key
+
+  def get_inputs(self, input_type = None):
+    if input_type is None:
+      return self.pkg_policy.get('inputs') or []
+    return self.inputs_by_type.get(input_type, [])
+
+  def get_streams(self, policy_input, stream_key = None):
+    """
+    Returns the streams of policy_input, or only those whose dataset or data stream type is stream_key.
+    """
+    if stream_key is None:
+      return policy_input.get('streams') or []
+    return self.streams_by_input.get(id(policy_input), {}).get(stream_key, [])
+
+  def set_inputs_enabled(self, enabled, streams_enabled = None):
+    """
+    Sets enabled on every typed input, and on all of their streams when streams_enabled is given.
+    """
+    for policy_input in self.get_inputs():
+      if 'type' in policy_input:
+        policy_input['enabled'] = enabled
+        if streams_enabled is not None:
+          for stream in self.get_streams(policy_input):
+            stream['enabled'] = streams_enabled
+
+  def apply_setting_updates(self, setting_updates):
+    """
+    Applies integration_setting_updates in one pass: every input and stream is disabled, then for each
+    {input type: {param: value}} entry the matching inputs get param set, "vars" overrides the value of existing
+    input variables, and "dataset_or_type:param" sets param on the matching streams of those inputs.
+    """
+    self.set_inputs_enabled(False, streams_enabled = False)
+    for setting_update in setting_updates:
+      for input_type, setting_params in setting_update.items():
+        for policy_input in self.get_inputs(input_type):
+          for setting_param, setting_value in setting_params.items():
+            if ':' in setting_param:
+              stream_key, stream_param = setting_param.split(':', 1)
+              for stream in self.get_streams(policy_input, stream_key):
+                stream[stream_param] = setting_value
+            elif setting_param == 'vars':
+              input_vars = policy_input.get('vars') or {}
+              for var_name, var_value in setting_value.items():
+                if var_name in input_vars:
+                  input_vars[var_name]['value'] = var_value
+            else:
+              policy_input[setting_param] = setting_value
+
+  @classmethod
+  def overlay_values(cls, target, values):
+    """
+    Sets the keys of values on target, merging nested dicts so that keys only Fleet sets are kept.
+    """
+    for key, value in values.items():
+      if isinstance(value, dict) and isinstance(target.get(key), dict):
+        cls.overlay_values(target[key], value)
+      else:
+        target[key] = deepcopy(value)
+
+  def overlay_streams(self, policy_input, streams):
+    for stream in streams:
+      data_stream = stream.get('data_stream') or {}
+      stream_key = data_stream.get('dataset') or data_stream.get('type')
+      existing_streams = self.get_streams(policy_input, stream_key) if stream_key else []
+      if existing_streams:
+        self.overlay_values(existing_streams[0], stream)
+      else:
+        policy_input.setdefault('streams', []).append(deepcopy(stream))
+
+  def overlay_inputs(self, inputs):
+    """
+    Applies the inputs requested for the policy onto the inputs it already has. An existing input, matched by type
+    (and policy_template when given), only gets the keys requested for it, and so do its streams matched by dataset
+    or data stream type, so the stream ids, compiled_* fields and template defaults Fleet keeps do not differ from
+    the request. Inputs the policy does not have yet are added as requested.
+    """
+    matched_inputs = set()
+    for new_input in inputs:
+      existing_input = None
+      for policy_input in self.get_inputs(new_input.get('type')):
+        if id(policy_input) in matched_inputs:
+          continue
+        if new_input.get('policy_template') and policy_input.get('policy_template') != new_input['policy_template']:
+          continue
+        existing_input = policy_input
+        break
+      if existing_input is None:
+        self.pkg_policy.setdefault('inputs', []).append(deepcopy(new_input))
+        continue
+      matched_inputs.add(id(existing_input))
+      self.overlay_values(existing_input, {key: value for key, value in new_input.items() if key != 'streams'})
+      self.overlay_streams(existing_input, new_input.get('streams') or [])
+    self.index_inputs()
+
+  @classmethod
+  def strip_generated_keys(cls, value):
+    if isinstance(value, dict):
+      return {key: cls.strip_generated_keys(item) for key, item in value.items() if key not in GENERATED_KEYS}
+    if isinstance(value, list):
+      return [cls.strip_generated_keys(item) for item in value]
+    return value
+
+  @property
+  def changed(self):
+    return self.strip_generated_keys(self.pkg_policy) != self.strip_generated_keys(self.original)
+
+  @staticmethod
+  def get_item_key(item, position):
+    if isinstance(item, dict):
+      if isinstance(item.get('data_stream'), dict) and item['data_stream'].get('dataset'):
+        return item['data_stream']['dataset']
+      if 'type' in item:
+        return ':'.join(str(key_part) for key_part in (item.get('policy_template'), item['type']) if key_part)
+    return position
+
+  @classmethod
+  def diff_values(cls, before, after, path, changes):
+    if isinstance(before, dict) and isinstance(after, dict):
+      for key in list(before) + [key for key in after if key not in before]:
+        cls.diff_values(before.get(key, _MISSING), after.get(key, _MISSING), f'{path}.{key}' if path else key, changes)
+    elif isinstance(before, list) and isinstance(after, list) and before != after:
+      before_items = {cls.get_item_key(item, position): item for position, item in enumerate(before)}
+      after_items = {cls.get_item_key(item, position): item for position, item in enumerate(after)}
+      if len(before_items) != len(before) or len(after_items) != len(after):
+        changes.append({'path': path, 'before': before, 'after': after})
+        return
+      for key in list(before_items) + [key for key in after_items if key not in before_items]:
+        cls.diff_values(before_items.get(key, _MISSING), after_items.get(key, _MISSING), f'{path}[{key}]', changes)
+    elif before != after:
+      changes.append({
+        'path': path,
+        'before': None if before is _MISSING else before,
+        'after': None if after is _MISSING else after
+      })
+
+  def get_changes(self):
+    """
+    Returns the minimal set of changes made to the policy, as a list of {'path', 'before', 'after'}.
+    Inputs are matched by policy template and type and streams by dataset, not by position.
+    """
+    changes = []
+    self.diff_values(self.strip_generated_keys(self.original), self.strip_generated_keys(self.pkg_policy), '', changes)
+    return changes
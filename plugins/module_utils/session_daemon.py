@@ -0,0 +1,389 @@
+# Copyright 2021 Expedient
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+## Optional local session daemon that keeps the keep-alive connection pools warm for a whole play.
+## Every task is its own process, so without it each task opens new TCP connections and TLS handshakes to Kibana,
+## Elasticsearch and ECE. With EXPEDIENT_SESSION_DAEMON=1 in the task environment, the first module forks a daemon
+## listening on a Unix socket (EXPEDIENT_SESSION_SOCKET, or ~/.ansible/tmp/expedient_elastic_session.sock) and every
+## client request of every later task is sent through it over that daemon's pooled connections. The daemon exits on
+## its own after EXPEDIENT_SESSION_DAEMON_IDLE seconds (default 600) without requests.
+## ECE tokens and Kibana versions already persist between tasks in their file caches, the daemon only adds connections.
+##
+## Messages are a 4 byte big endian length followed by a JSON document, request bodies are base64 encoded. Response
+## bodies follow their status message as length prefixed chunks of at most RELAY_CHUNK_SIZE bytes ended by an empty
+## one, and are read off the socket only as the module reads them, so streamed exports stay bounded in memory on
+## both sides. The socket is only accessible to its owner.
+
+import base64
+import errno
+import fcntl
+import io
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from http.client import HTTPMessage
+from json import loads, dumps
+from urllib.error import HTTPError, URLError
+
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.transport import Transport
+except:
+  import sys
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from transport import Transport
+
+DEFAULT_SOCKET_PATH = '~/.ansible/tmp/expedient_elastic_session.sock'
+DEFAULT_IDLE_TIMEOUT = 600
+START_TIMEOUT = 5
+MAX_MESSAGE_SIZE = 1024 * 1024 * 1024
+RELAY_CHUNK_SIZE = 64 * 1024
+
+def is_session_daemon_enabled():
+  return os.environ.get('EXPEDIENT_SESSION_DAEMON', '').lower() in ('1', 'true', 'yes', 'on')
+
+def get_socket_path():
+  return os.path.expanduser(os.environ.get('EXPEDIENT_SESSION_SOCKET') or DEFAULT_SOCKET_PATH)
+
+def send_message(sock, message):
+  payload = dumps(message).encode('utf-8')
+  sock.sendall(struct.pack('>I', len(payload)) + payload)
+
+def receive_exactly(sock, size):
+  chunks = []
+  while size:
+    chunk = sock.recv(min(size, 1024 * 1024))
+    if not chunk:
+      raise ConnectionError('session daemon connection closed')
+    chunks.append(chunk)
+    size -= len(chunk)
+  return b''.join(chunks)
+
+def receive_message(sock):
+  (size,) = struct.unpack('>I', receive_exactly(sock, 4))
+  if size > MAX_MESSAGE_SIZE:
+    raise ConnectionError('session daemon message too large')
+  return loads(receive_exactly(sock, size))
+
+def send_chunk(sock, chunk):
+  sock.sendall(struct.pack('>I', len(chunk)) + chunk)
+
+def receive_chunk(sock):
+  (size,) = struct.unpack('>I', receive_exactly(sock, 4))
+  if size > RELAY_CHUNK_SIZE:
+    raise ConnectionError('session daemon chunk too large')
+  return receive_exactly(sock, size) if size else b''
+
+class SessionRequestHandler(socketserver.BaseRequestHandler):
+  def handle(self):
+    self.server.touch()
+    try:
+      message = receive_message(self.request)
+    except (ConnectionError, ValueError, struct.error):
+      return
+    if message.get('op') == 'ping':
+      send_message(self.request, {'pid': os.getpid()})
+      return
+    if message.get('op') == 'shutdown':
+      send_message(self.request, {'pid': os.getpid()})
+      self.server.idle_timeout = 0
+      return
+
+    data = message.get('data')
+    if data is not None:
+      data = base64.b64decode(data)
+    try:
+      response = self.server.transport.open_url(message['url'], data=data, headers=message.get('headers'), method=message.get('method'),
+                                                validate_certs=message.get('validate_certs', True), force_basic_auth=message.get('force_basic_auth', False),
+                                                url_username=message.get('url_username'), url_password=message.get('url_password'),
+                                                timeout=message.get('timeout', 10))
+      status, reason, headers = response.status, response.reason, response.headers
+    except HTTPError as e:
+      response = e
+      status, reason, headers = e.code, e.reason, e.headers
+    except Exception as e:
+      send_message(self.request, {'error': f'{type(e).__name__}: {e}'})
+      return
+    finally:
+      self.server.touch()
+    try:
+      send_message(self.request, {
+        'status': status,
+        'reason': reason,
+        'headers': list(headers.items()) if headers else []
+      })
+      ## Relayed chunk by chunk, a module that stops reading early leaves the rest of the body on the upstream connection
+      ## and closing the response then drops that connection instead of pooling it
+      while True:
+        chunk = response.read(RELAY_CHUNK_SIZE)
+        self.server.touch()
+        if not chunk:
+          break
+        send_chunk(self.request, chunk)
+      send_chunk(self.request, b'')
+    except OSError:
+      pass
+    finally:
+      response.close()
+
+class SessionServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+  daemon_threads = True
+
+  def __init__(self, socket_path, idle_timeout):
+    self.transport = Transport()
+    self.idle_timeout = idle_timeout
+    self.last_activity = time.time()
+    super().__init__(socket_path, SessionRequestHandler)
+
+  def touch(self):
+    self.last_activity = time.time()
+
+def run_session_daemon(socket_path, idle_timeout):
+  """
+  Serves requests on socket_path until idle_timeout seconds pass without any, then removes the socket.
+  """
+  old_umask = os.umask(0o177)
+  try:
+    server = SessionServer(socket_path, idle_timeout)
+  finally:
+    os.umask(old_umask)
+  server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+  server_thread.start()
+  try:
+    while time.time() - server.last_activity < server.idle_timeout:
+      time.sleep(1)
+  finally:
+    server.shutdown()
+    server.server_close()
+    server.transport.close()
+    try:
+      os.unlink(socket_path)
+    except OSError:
+      pass
+
+def start_session_daemon(socket_path, idle_timeout):
+  """
+  Forks a detached daemon serving socket_path. Forking rather than running a new interpreter keeps working when the
+  module runs from Ansible's zipped payload, which is gone once the task ends.
+  """
+  pid = os.fork()
+  if pid:
+    os.waitpid(pid, 0)
+    return
+  try:
+    os.setsid()
+    if os.fork():
+      os._exit(0)
+    ## The daemon must not hold the module's stdout open, Ansible waits for it to close before finishing the task
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+      os.dup2(devnull, fd)
+    ## Nor the start lock, pooled sockets or any other descriptor of the module
+    os.closerange(3, os.sysconf('SC_OPEN_MAX'))
+    os.chdir('/')
+    run_session_daemon(socket_path, idle_timeout)
+  finally:
+    os._exit(0)
+
+def connect(socket_path, timeout):
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  sock.settimeout(timeout)
+  try:
+    sock.connect(socket_path)
+  except OSError:
+    sock.close()
+    raise
+  return sock
+
+def ensure_session_daemon(socket_path):
+  """
+  Returns True once a daemon answers on socket_path, starting one when none does. A lock file keeps tasks running
+  at the same time from starting several.
+  """
+  def ping():
+    try:
+      sock = connect(socket_path, 2)
+    except OSError:
+      return False
+    try:
+      send_message(sock, {'op': 'ping'})
+      receive_message(sock)
+      return True
+    except (OSError, ValueError, struct.error):
+      return False
+    finally:
+      sock.close()
+
+  if ping():
+    return True
+  socket_dir = os.path.dirname(socket_path)
+  os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+  with open(f'{socket_path}.lock', 'a') as lock_file:
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    if ping():
+      return True
+    try:
+      os.unlink(socket_path)
+    except OSError as e:
+      if e.errno != errno.ENOENT:
+        return False
+    idle_timeout = int(os.environ.get('EXPEDIENT_SESSION_DAEMON_IDLE') or DEFAULT_IDLE_TIMEOUT)
+    start_session_daemon(socket_path, idle_timeout)
+    deadline = time.time() + START_TIMEOUT
+    while time.time() < deadline:
+      if ping():
+        return True
+      time.sleep(0.05)
+  return False
+
+class SessionResponse(object):
+  """
+  Response relayed by the daemon, used the same way as TransportResponse. The body is read off the daemon socket
+  only as it is asked for, the socket is closed once the last chunk has been read or the response is closed.
+  """
+  def __init__(self, sock, status, reason, headers):
+    self.sock = sock
+    self.status = status
+    self.reason = reason
+    self.msg = reason
+    self.headers = headers
+    self.buffer = b''
+
+  def getcode(self):
+    return self.status
+
+  def read_chunk(self):
+    if self.sock is None:
+      return b''
+    chunk = receive_chunk(self.sock)
+    if not chunk:
+      self.release()
+    return chunk
+
+  def read(self, amt=None):
+    if amt is None:
+      chunks = [self.buffer]
+      chunk = self.read_chunk()
+      while chunk:
+        chunks.append(chunk)
+        chunk = self.read_chunk()
+      self.buffer = b''
+      return b''.join(chunks)
+    while len(self.buffer) < amt and self.sock is not None:
+      chunk = self.read_chunk()
+      if not chunk:
+        break
+      self.buffer += chunk
+    data, self.buffer = self.buffer[:amt], self.buffer[amt:]
+    return data
+
+  def readline(self, limit=-1):
+    while b'\n' not in self.buffer and (limit < 0 or len(self.buffer) < limit) and self.sock is not None:
+      chunk = self.read_chunk()
+      if not chunk:
+        break
+      self.buffer += chunk
+    line_end = self.buffer.find(b'\n') + 1 or len(self.buffer)
+    if limit >= 0:
+      line_end = min(line_end, limit)
+    data, self.buffer = self.buffer[:line_end], self.buffer[line_end:]
+    return data
+
+  def release(self):
+    if self.sock is not None:
+      self.sock.close()
+      self.sock = None
+
+  def close(self):
+    self.release()
+    self.buffer = b''
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+class SessionTransport(object):
+  """
+  Transport sending requests through the session daemon. Streamed uploads (generator bodies) and any request made
+  while the daemon cannot be reached go over the local transport instead.
+  """
+  def __init__(self, socket_path, local_transport):
+    self.socket_path = socket_path
+    self.local_transport = local_transport
+
+  def open_url(self, url, data=None, headers=None, method=None, validate_certs=True, force_basic_auth=False,
+               url_username=None, url_password=None, timeout=10, *args, **kwargs):
+    if isinstance(data, str):
+      data = data.encode('utf-8')
+    if data is not None and not isinstance(data, bytes):
+      return self.local_transport.open_url(url, data=data, headers=headers, method=method, validate_certs=validate_certs, force_basic_auth=force_basic_auth,
+                                           url_username=url_username, url_password=url_password, timeout=timeout)
+    message = {
+      'op': 'request',
+      'url': url,
+      'data': base64.b64encode(data).decode('ascii') if data is not None else None,
+      'headers': dict(headers or {}),
+      'method': method,
+      'validate_certs': validate_certs,
+      'force_basic_auth': force_basic_auth,
+      'url_username': url_username,
+      'url_password': url_password,
+      'timeout': timeout
+    }
+    try:
+      sock = connect(self.socket_path, timeout + 30)
+    except OSError:
+      return self.local_transport.open_url(url, data=data, headers=headers, method=method, validate_certs=validate_certs, force_basic_auth=force_basic_auth,
+                                           url_username=url_username, url_password=url_password, timeout=timeout)
+    try:
+      send_message(sock, message)
+      reply = receive_message(sock)
+    except BaseException:
+      sock.close()
+      raise
+    if 'error' in reply:
+      sock.close()
+      raise URLError(reply['error'])
+
+    response_headers = HTTPMessage()
+    for header_name, header_value in reply['headers']:
+      response_headers[header_name] = header_value
+    response = SessionResponse(sock, reply['status'], reply['reason'], response_headers)
+    if reply['status'] >= 400:
+      ## Error bodies are small, read whole so the socket is not left to the caller
+      with response:
+        raise HTTPError(url, reply['status'], reply['reason'], response_headers, io.BytesIO(response.read()))
+    return response
+
+  def close(self):
+    self.local_transport.close()
+
+def get_session_transport(local_transport):
+  """
+  Returns a SessionTransport when the daemon is enabled and running (starting it if needed), otherwise None.
+  """
+  if not is_session_daemon_enabled():
+    return None
+  socket_path = get_socket_path()
+  try:
+    if not ensure_session_daemon(socket_path):
+      return None
+  except OSError:
+    return None
+  return SessionTransport(socket_path, local_transport)
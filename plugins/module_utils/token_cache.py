@@ -0,0 +1,61 @@
+# Copyright 2021 Expedient
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+## On disk cache of ECE bearer tokens, so that every task in a play does not have to log in again.
+## Entries are keyed by a digest of host, port, username and password.
+
+import base64
+import hashlib
+import os
+import time
+from json import loads
+
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.file_cache import FileCache
+except:
+  import sys
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from file_cache import FileCache
+
+DEFAULT_TOKEN_CACHE_PATH = '~/.ansible/tmp/expedient_elastic_ece_tokens.json'
+DEFAULT_TOKEN_TTL = 900
+EXPIRY_MARGIN = 60
+
+class TokenCache(FileCache):
+  def __init__(self, path = None):
+    super().__init__(path or os.environ.get('EXPEDIENT_ECE_TOKEN_CACHE') or DEFAULT_TOKEN_CACHE_PATH)
+
+  @staticmethod
+  def get_cache_key(host, port, username, password):
+    return hashlib.sha256(f'{host}\0{port}\0{username}\0{password}'.encode('utf-8')).hexdigest()
+
+  @staticmethod
+  def get_token_expiry(token):
+    """
+    ECE tokens are JWTs, the expiry is read from the unverified exp claim.
+    Tokens that cannot be decoded are kept for DEFAULT_TOKEN_TTL seconds.
+    """
+    try:
+      payload = token.split('.')[1]
+      payload += '=' * (-len(payload) % 4)
+      return float(loads(base64.urlsafe_b64decode(payload))['exp'])
+    except Exception:
+      return time.time() + DEFAULT_TOKEN_TTL
+
+  def get(self, key):
+    return super().get(key, margin = EXPIRY_MARGIN)
+
+  def set(self, key, token):
+    super().set(key, token, self.get_token_expiry(token))
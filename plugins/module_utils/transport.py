@@ -0,0 +1,272 @@
+# Copyright 2021 Expedient
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+## Shared keep-alive HTTP(S) transport used by the Kibana, Elastic, ECE and ECE_API_Proxy clients.
+## open_url() opens a new TCP connection (and TLS handshake) for every request, this keeps the
+## connections open per (scheme, host, port, verify) and hands them back out for the next request.
+
+import atexit
+import base64
+import io
+import os
+import ssl
+import threading
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+from urllib.error import HTTPError
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+USER_AGENT = 'ansible-httpget'
+
+class TransportResponse(object):
+  """
+  Wraps an http.client response so it can be used the same way as the object returned by open_url().
+  The connection is handed back to its pool as soon as the body has been fully read.
+  """
+  def __init__(self, pool, conn, response):
+    self.pool = pool
+    self.conn = conn
+    self.response = response
+    self.status = response.status
+    self.reason = response.reason
+    self.msg = response.reason # open_url exposes the reason phrase as msg, keeping that for existing callers
+    self.headers = response.headers
+    if response.length == 0:
+      response.read()
+      self.release()
+
+  def getcode(self):
+    return self.status
+
+  def read(self, amt=None):
+    if amt is None:
+      data = self.response.read()
+    else:
+      data = self.response.read(amt)
+    if self.response.isclosed():
+      self.release()
+    return data
+
+  def readline(self, limit=-1):
+    data = self.response.readline(limit)
+    if self.response.isclosed():
+      self.release()
+    return data
+
+  def release(self):
+    if self.conn is None:
+      return
+    conn = self.conn
+    self.conn = None
+    if self.response.isclosed() and not self.response.will_close:
+      self.pool.put_conn(conn)
+    else:
+      conn.close()
+
+  def close(self):
+    ## A response closed before its body was consumed leaves unread data on the socket, so the connection is dropped
+    if not self.response.isclosed():
+      self.response.close()
+      if self.conn is not None:
+        self.conn.close()
+        self.conn = None
+    self.release()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+class ConnectionPool(object):
+  def __init__(self, scheme, host, port, validate_certs, maxsize = DEFAULT_POOL_MAXSIZE):
+    self.scheme = scheme
+    self.host = host
+    self.port = port
+    self.validate_certs = validate_certs
+    self.maxsize = maxsize
+    self.lock = threading.Lock()
+    self.idle = []
+    self.context = self.get_ssl_context(validate_certs) if scheme == 'https' else None
+    self.proxy = self.get_proxy(scheme, host)
+
+  @staticmethod
+  def get_ssl_context(validate_certs):
+    context = ssl.create_default_context()
+    if not validate_certs:
+      context.check_hostname = False
+      context.verify_mode = ssl.CERT_NONE
+    return context
+
+  @staticmethod
+  def get_proxy(scheme, host):
+    ## Honour the same proxy environment variables open_url does
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+      return None
+    if '://' not in proxy:
+      proxy = f'http://{proxy}'
+    return urllib.parse.urlsplit(proxy)
+
+  def new_conn(self, timeout):
+    if self.proxy:
+      conn_host = self.proxy.hostname
+      conn_port = self.proxy.port or 8080
+    else:
+      conn_host = self.host
+      conn_port = self.port
+    if self.scheme == 'https':
+      conn = HTTPSConnection(conn_host, conn_port, timeout=timeout, context=self.context)
+    else:
+      conn = HTTPConnection(conn_host, conn_port, timeout=timeout)
+    if self.proxy:
+      tunnel_headers = {}
+      if self.proxy.username:
+        credentials = f'{urllib.parse.unquote(self.proxy.username)}:{urllib.parse.unquote(self.proxy.password or "")}'
+        tunnel_headers['Proxy-Authorization'] = 'Basic ' + base64.b64encode(credentials.encode()).decode()
+      conn.set_tunnel(self.host, self.port, headers=tunnel_headers)
+    return conn
+
+  def get_conn(self, timeout):
+    with self.lock:
+      conn = self.idle.pop() if self.idle else None
+    if conn is None:
+      return self.new_conn(timeout), False
+    conn.timeout = timeout
+    if conn.sock is not None:
+      conn.sock.settimeout(timeout)
+    return conn, True
+
+  def put_conn(self, conn):
+    with self.lock:
+      if len(self.idle) < self.maxsize:
+        self.idle.append(conn)
+        return
+    conn.close()
+
+  def urlopen(self, method, path, body=None, headers={}, timeout=120):
+    ## Only bodies that can be sent a second time are retried when a pooled connection turns out to be stale
+    retryable = body is None or isinstance(body, bytes)
+    while True:
+      conn, reused = self.get_conn(timeout)
+      try:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+      except (HTTPException, ConnectionError):
+        conn.close()
+        if reused and retryable:
+          continue
+        raise
+      except Exception:
+        conn.close()
+        raise
+      return TransportResponse(self, conn, response)
+
+  def close(self):
+    with self.lock:
+      idle = self.idle
+      self.idle = []
+    for conn in idle:
+      conn.close()
+
+class Transport(object):
+  def __init__(self, pool_connections = DEFAULT_POOL_CONNECTIONS, pool_maxsize = DEFAULT_POOL_MAXSIZE):
+    self.pool_connections = pool_connections
+    self.pool_maxsize = pool_maxsize
+    self.lock = threading.Lock()
+    self.pools = OrderedDict()
+
+  def get_pool(self, scheme, host, port, validate_certs):
+    key = (scheme, host, port, bool(validate_certs))
+    evicted = []
+    with self.lock:
+      pool = self.pools.pop(key, None)
+      if pool is None:
+        pool = ConnectionPool(scheme, host, port, validate_certs, self.pool_maxsize)
+      self.pools[key] = pool
+      while len(self.pools) > self.pool_connections:
+        evicted.append(self.pools.popitem(last=False)[1])
+    for old_pool in evicted:
+      old_pool.close()
+    return pool
+
+  def open_url(self, url, data=None, headers=None, method=None, validate_certs=True, force_basic_auth=False,
+               url_username=None, url_password=None, timeout=10, *args, **kwargs):
+    """
+    Drop-in replacement for ansible.module_utils.urls.open_url() that reuses pooled connections.
+    Raises HTTPError for 4xx/5xx responses, the same as open_url().
+    """
+    parsed_url = urllib.parse.urlsplit(url)
+    scheme = parsed_url.scheme or 'https'
+    port = parsed_url.port or (443 if scheme == 'https' else 80)
+    path = parsed_url.path or '/'
+    if parsed_url.query:
+      path = f'{path}?{parsed_url.query}'
+
+    request_headers = {'User-Agent': USER_AGENT}
+    if headers:
+      request_headers.update(headers)
+    if force_basic_auth and url_username:
+      credentials = f'{url_username}:{url_password or ""}'
+      request_headers['Authorization'] = 'Basic ' + base64.b64encode(credentials.encode()).decode()
+    if isinstance(data, str):
+      data = data.encode('utf-8')
+    if method is None:
+      method = 'POST' if data is not None else 'GET'
+
+    pool = self.get_pool(scheme, parsed_url.hostname, port, validate_certs)
+    response = pool.urlopen(method.upper(), path, body=data, headers=request_headers, timeout=timeout)
+    if response.status >= 400:
+      body = response.read()
+      raise HTTPError(url, response.status, response.reason, response.headers, io.BytesIO(body))
+    return response
+
+  def close(self):
+    with self.lock:
+      pools = list(self.pools.values())
+      self.pools.clear()
+    for pool in pools:
+      pool.close()
+
+_transport = None
+_transport_lock = threading.Lock()
+
+def get_transport(module = None):
+  """
+  Returns the process wide Transport, creating it from the module's pool options on first use so that every
+  client built for the module run (Kibana, Elastic, ECE, ECE_API_Proxy) shares the same connections.
+  With EXPEDIENT_SESSION_DAEMON set, requests go through the session daemon's connections shared by every task.
+  """
+  global _transport
+  with _transport_lock:
+    if _transport is None:
+      params = module.params if module is not None else {}
+      _transport = Transport(
+        pool_connections = params.get('pool_connections') or DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize = params.get('pool_maxsize') or DEFAULT_POOL_MAXSIZE)
+      if os.environ.get('EXPEDIENT_SESSION_DAEMON'):
+        ## Imported here, session_daemon itself builds on Transport
+        try:
+          from ansible_collections.expedient.elastic.plugins.module_utils.session_daemon import get_session_transport
+        except:
+          import sys
+          util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+          sys.path.append(util_path)
+          from session_daemon import get_session_transport
+        _transport = get_session_transport(_transport) or _transport
+      atexit.register(_transport.close)
+  return _transport
@@ -195,9 +195,16 @@ options:
       - only applies if wait_for_completion is True
     default: 600
     type: int
+  async_plan:
+    description:
+      - Return as soon as the plan change has been submitted instead of waiting for the deployment to come up
+      - The returned plan_handle can be waited on later, together with other handles, using expedient.elastic.ece_plan_status
+    default: False
+    type: bool
 
 extends_documentation_fragment:
   - expedient.elastic.ece_auth_options
+  - expedient.elastic.transport_options
 '''
 
 ## need to support both loading as part of a collection and running in test/debug mode
@@ -210,7 +217,6 @@ except:
   sys.path.append(util_path)
   from ece import ECE
 
-import time
 import yaml
 
 from ansible.module_utils.basic import AnsibleModule
@@ -251,6 +257,9 @@ def main():
     username=dict(type='str', required=True),
     password=dict(type='str', required=True, no_log=True),
     verify_ssl_cert=dict(type='bool', default=True),
+    token_cache_path=dict(type='str', no_log=False),
+    pool_connections=dict(type='int', default=10),
+    pool_maxsize=dict(type='int', default=10),
     state=dict(type='str', default='present'),
     cluster_name=dict(type='str', required=True),
     elastic_settings=dict(type='list', required=False, elements='dict', options=elastic_settings_spec),
@@ -265,6 +274,7 @@ def main():
     deployment_template=dict(type='str', required=True),
     wait_for_completion=dict(type='bool', default=False),
     completion_timeout=dict(type='int', default=600),
+    async_plan=dict(type='bool', default=False),
   )
 
   results = {'changed': False}
@@ -285,6 +295,7 @@ def main():
   deployment_template = module.params.get('deployment_template')
   wait_for_completion = module.params.get('wait_for_completion')
   completion_timeout = module.params.get('completion_timeout')
+  async_plan = module.params.get('async_plan')
   
   ece_cluster = ECE(module)
   
@@ -331,7 +342,7 @@ def main():
           ml_settings, 
           snapshot_settings,
           traffic_rulesets,
-          wait_for_completion,
+          wait_for_completion and not async_plan,
           completion_timeout
           )
 
@@ -339,16 +350,22 @@ def main():
         results['msg'] = 'cluster creation failed'
         module.fail_json(**results)
       results['cluster_data'] = cluster_data
+
+      if async_plan:
+        # Credentials are only returned by the creation call, so they are picked up before handing back the plan handle
+        if not matching_clusters:
+          for resource in cluster_data['resources']:
+            if resource['kind'] == "elasticsearch":
+              results['cluster_data']['credentials'] = resource['credentials']
+        results['plan_handle'] = ece_cluster.get_plan_handle(cluster_data['id'], cluster_health = True, deployment_name = cluster_name)
+        results['msg'] = f'cluster {module.params.get("cluster_name")} plan submitted'
+        module.exit_json(**results)
       
-      ece_cluster.wait_for_cluster_healthy(cluster_data['id'])
-      ece_cluster.wait_for_cluster_state(cluster_data['id'], "elasticsearch" ) # Wait for ElasticSearch
-      ece_cluster.wait_for_cluster_state(cluster_data['id'], "kibana" ) # Wait for Kibana
-      deployment_healthy = ece_cluster.wait_for_cluster_state(cluster_data['id'], "apm") # If APM is healthy then the deployment is healthy since apm is last to come up
+      # Waits for the deployment to be healthy and every resource kind in it to be started with no pending plan
+      deployment_healthy = ece_cluster.wait_for_deployment(cluster_data['id'], cluster_health = True)
       
       if deployment_healthy == False:
         results['cluster_data']['msg'] = "Cluster information may be incomplete because the cluster is not healthy"
-      else:
-        time.sleep(30)
       deployment_object = ece_cluster.get_deployment_byid(cluster_data['id'])
 
       # Checking to see if we matched matching clusters earlier. If we did, we are updating the cluster but we have already retrieved the relevant information
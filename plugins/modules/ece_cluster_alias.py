@@ -59,12 +59,19 @@ options:
   alias_name:
     description: Deployment Alias String
     type: str
-    
 
+  async_plan:
+    description:
+    - Return as soon as the plan change has been submitted instead of waiting for the deployment to come up
+    - The returned plan_handle can be waited on later, together with other handles, using expedient.elastic.ece_plan_status
+    type: bool
+    default: False
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
 '''
 from ansible.module_utils.basic import AnsibleModule
 
-import time
 
 try:
   from ansible_collections.expedient.elastic.plugins.module_utils.ece import ECE
@@ -87,6 +94,9 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
+        async_plan=dict(type='bool', default=False),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
         deployment_name=dict(type='str'),
         deployment_id=dict(type='str', default=None),
         alias_name=dict(type='str', required=True)
@@ -135,15 +145,14 @@ def main():
       
       ElasticDeployments.update_deployment_byid(deployment_object['id'], update_body)
       
-      ElasticDeployments.wait_for_cluster_healthy(deployment_object['id'])
-      ElasticDeployments.wait_for_cluster_state(deployment_object['id'], "elasticsearch" ) # Wait for ElasticSearch
-      ElasticDeployments.wait_for_cluster_state(deployment_object['id'], "kibana" ) # Wait for Kibana
-      deployment_healthy = ElasticDeployments.wait_for_cluster_state(deployment_object['id'], "apm") # If APM is healthy then the deployment is healthy since apm is last to come up
+      if module.params.get('async_plan'):
+        results['plan_handle'] = ElasticDeployments.get_plan_handle(deployment_object['id'], cluster_health = True)
+        module.exit_json(**results)
+
+      deployment_healthy = ElasticDeployments.wait_for_deployment(deployment_object['id'], cluster_health = True)
       
       if deployment_healthy == False:
         results['cluster_alias_status'] = "Cluster information may be incomplete because the cluster is not healthy"
-      else:
-        time.sleep(30)
         
       results['changed'] = True
     else:
@@ -51,6 +51,8 @@ options:
     description: Sometimes it is not neccesary to return all the data of a deployment
     type: bool
 
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
 '''
 from ansible.module_utils.basic import AnsibleModule
 
@@ -75,6 +77,8 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
         deployment_name=dict(type='str'),
         deployment_id=dict(type='str', default=None),
         no_cluster_object=dict(type='bool', default=True)
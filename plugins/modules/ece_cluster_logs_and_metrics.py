@@ -37,10 +37,18 @@ options:
       logging_ref_id: Reference ID for Logging
       metrics_ref_id: Reference ID for Metrics
 
+  async_plan:
+    description:
+    - Return as soon as the plan change has been submitted instead of waiting for the deployment to come up
+    - The returned plan_handle can be waited on later, together with other handles, using expedient.elastic.ece_plan_status
+    type: bool
+    default: False
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
 '''
 from ansible.module_utils.basic import AnsibleModule
 
-import time
 
 try:
   from ansible_collections.expedient.elastic.plugins.module_utils.ece import ECE
@@ -63,6 +71,9 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
+        async_plan=dict(type='bool', default=False),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
         deployment_name=dict(type='str'),
         deployment_id=dict(type='str', default=None),
         logging_dest=dict(type='str', required=True),
@@ -118,14 +129,14 @@ def main():
       }
       ElasticDeployments.update_deployment_byid(deployment_object[0]['id'], body)
       
-      deployment_healthy = ElasticDeployments.wait_for_cluster_state(deployment_object[0]['id'], "elasticsearch" )
-      deployment_healthy = ElasticDeployments.wait_for_cluster_state(deployment_object[0]['id'], "kibana" )
-      deployment_healthy = ElasticDeployments.wait_for_cluster_state(deployment_object[0]['id'], "apm")
+      if module.params.get('async_plan'):
+        results['plan_handle'] = ElasticDeployments.get_plan_handle(deployment_object[0]['id'])
+        module.exit_json(**results)
+
+      deployment_healthy = ElasticDeployments.wait_for_deployment(deployment_object[0]['id'])
       
       if deployment_healthy == False:
-        results['cluster_data']['msg'] = "Cluster information may be incomplete because the cluster is not healthy"
-      else:
-        time.sleep(30)
+        results['msg'] = "Cluster information may be incomplete because the cluster is not healthy"
         
     results['changed'] = True
     module.exit_json(**results)
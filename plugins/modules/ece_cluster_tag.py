@@ -55,6 +55,8 @@ options:
     description: ECE Deployment Tag Value
     type: str
 
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
 '''
 from ansible.module_utils.basic import AnsibleModule
 
@@ -79,6 +81,8 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
         deployment_name=dict(type='str'),
         deployment_id=dict(type='str', default=None),
         tag_label=dict(type='str'),
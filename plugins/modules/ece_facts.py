@@ -52,6 +52,8 @@ module_args = dict(
     username=dict(type='str', required=True),
     password=dict(type='str', required=True, no_log=True),
     verify_ssl_cert=dict(type='bool', default=True),
+    pool_connections=dict(type='int', default=10),
+    pool_maxsize=dict(type='int', default=10),
   )
 
 
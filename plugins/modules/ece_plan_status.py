@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# Copyright 2021 Expedient
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# -*- coding: utf-8 -*-
+
+
+ANSIBLE_METADATA = {
+  'metadata_version': '1.1',
+  'status': ['preview'],
+  'supported_by': 'community'
+}
+
+DOCUMENTATION = r'''
+---
+module: ece_plan_status
+
+short_description: Wait on ECE plan changes submitted with async_plan
+
+version_added: '2.9'
+
+author: Mike Garuccio (@mgaruccio)
+
+requirements:
+  - python3
+
+description:
+  - "Checks or waits on the plan_handle values returned by ece_cluster, ece_cluster_alias and ece_cluster_logs_and_metrics when async_plan is set"
+  - "All handles are polled from a single loop, so many deployments can be created in parallel and waited on together"
+
+options:
+  plan_handles:
+    description:
+      - List of plan_handle values returned by the ECE modules
+    required: true
+    type: list
+    elements: dict
+  wait:
+    description:
+      - Wait until every deployment is ready or completion_timeout is reached
+      - When false, every deployment is checked once and its current status returned
+    default: True
+    type: bool
+  completion_timeout:
+    description:
+      - How long to wait, in seconds, for all of the plan changes to complete
+      - only applies if wait is True
+    default: 1800
+    type: int
+  fail_on_timeout:
+    description:
+      - Fail the task when one or more deployments are not ready once waiting has finished
+      - only applies if wait is True
+    default: True
+    type: bool
+
+extends_documentation_fragment:
+  - expedient.elastic.ece_auth_options
+  - expedient.elastic.transport_options
+'''
+
+## need to support both loading as part of a collection and running in test/debug mode
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.ece import ECE
+except:
+  import sys
+  import os
+  util_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from ece import ECE
+
+from ansible.module_utils.basic import AnsibleModule
+
+def main():
+  module_args = dict(
+    host=dict(type='str', required=True),
+    port=dict(type='int', default=12443),
+    username=dict(type='str', required=True),
+    password=dict(type='str', required=True, no_log=True),
+    verify_ssl_cert=dict(type='bool', default=True),
+    token_cache_path=dict(type='str', no_log=False),
+    pool_connections=dict(type='int', default=10),
+    pool_maxsize=dict(type='int', default=10),
+    plan_handles=dict(type='list', elements='dict', required=True),
+    wait=dict(type='bool', default=True),
+    completion_timeout=dict(type='int', default=1800),
+    fail_on_timeout=dict(type='bool', default=True),
+  )
+
+  results = {'changed': False}
+
+  module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+
+  plan_handles = [plan_handle for plan_handle in module.params.get('plan_handles') if plan_handle and plan_handle.get('deployment_id')]
+  wait = module.params.get('wait')
+  completion_timeout = module.params.get('completion_timeout') if wait else 0
+
+  ece_plan = ECE(module)
+  results['deployments'] = ece_plan.wait_for_plan_handles(plan_handles, completion_timeout)
+  results['all_ready'] = all(status['ready'] for status in results['deployments'].values())
+
+  not_ready = [status['deployment_name'] or deployment_id for deployment_id, status in results['deployments'].items() if not status['ready']]
+  if not_ready:
+    results['msg'] = f'deployments not ready: {", ".join(not_ready)}'
+    if wait and module.params.get('fail_on_timeout'):
+      module.fail_json(**results)
+  else:
+    results['msg'] = 'all deployments ready'
+
+  module.exit_json(**results)
+
+if __name__ == '__main__':
+  main()
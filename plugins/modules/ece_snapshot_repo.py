@@ -77,6 +77,7 @@ options:
 
 extends_documentation_fragment:
   - expedient.elastic.ece_auth_options
+  - expedient.elastic.transport_options
 '''
 
 try:
@@ -138,6 +139,9 @@ def main():
     username=dict(type='str', required=True),
     password=dict(type='str', required=True, no_log=True),
     verify_ssl_cert=dict(type='bool', default=True),
+    token_cache_path=dict(type='str', no_log=False),
+    pool_connections=dict(type='int', default=10),
+    pool_maxsize=dict(type='int', default=10),
     state=dict(type='str', default='present'),
     name=dict(type='str', required=True),
     repo_type=dict(type='str', default='S3'),
@@ -40,6 +40,7 @@ requirements:
 description: ''
 extends_documentation_fragment:
   - expedient.elastic.ece_auth_options
+  - expedient.elastic.transport_options
 
 '''
 
@@ -62,6 +63,7 @@ class ECE_Traffic_Ruleset(ECE):
     self.rules = self.module.params.get('rules')
     self.associations = self.module.params.get('associations')
     self.ignore_associations = self.module.params.get('ignore_associations')
+    self.association_clusters = None
 
     self.ruleset = self.get_traffic_ruleset_by_name(self.rule_name, include_associations=True)
 
@@ -75,11 +77,13 @@ class ECE_Traffic_Ruleset(ECE):
 
     if self.associations:
       # This ensures that the clusters being associated with the ruleset actually exist before trying to add them
-      if not self.validate_assocations():
-        self.module.fail_json(changed=False, msg=f'cluster {association} does not exist')
+      association_clusters = self.get_association_clusters()
+      for association, association_cluster in association_clusters.items():
+        if not association_cluster:
+          self.module.fail_json(changed=False, msg=f'cluster {association} does not exist')
       data['associations'] = [{
         'entity_type': 'cluster', # As far as I can tell this is always "cluster" for anything configurable in the Cloud UI
-        'id': self.get_cluster_by_name(association)['cluster_id']
+        'id': self.get_resource_cluster_id(association_clusters[association])
       } for association in self.associations]
 
     response = self.send_api_request(endpoint, 'POST', data=data)
@@ -96,11 +100,19 @@ class ECE_Traffic_Ruleset(ECE):
     return [x for x in self.rules if x not in [y['source'] for y in self.ruleset['rules']]]
 
 
+  def get_association_clusters(self):
+    # Each association is resolved once, names go through the shared deployment index
+    if self.association_clusters is None:
+      self.association_clusters = {association: self.get_cluster_by_name(association) for association in self.associations}
+    return self.association_clusters
+
+  @staticmethod
+  def get_resource_cluster_id(cluster_resource):
+    # get_cluster_by_name returns the deployments/{id}/elasticsearch/{ref_id} resource, the cluster id is under info
+    return (cluster_resource.get('info') or {}).get('cluster_id') or cluster_resource['id']
+
   def validate_assocations(self):
-    for association in self.associations:
-      if not self.get_cluster_by_name(association):
-        return False
-    return True
+    return all(self.get_association_clusters().values())
 
   def delete_ruleset(self):
     endpoint = f'deployments/ip-filtering/rulesets/{self.ruleset["id"]}?ignore_associations={self.ignore_associations}'
@@ -116,6 +128,9 @@ def main():
     username=dict(type='str', required=True),
     password=dict(type='str', required=True, no_log=True),
     verify_ssl_cert=dict(type='bool', default=True),
+    token_cache_path=dict(type='str', no_log=False),
+    pool_connections=dict(type='int', default=10),
+    pool_maxsize=dict(type='int', default=10),
     state=dict(type='str', default='present'),
     name=dict(type='str', required=True),
     description=dict(type='str', default='Ansible created rule'),
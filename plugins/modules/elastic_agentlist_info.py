@@ -60,7 +60,21 @@ options:
       version:
         description: Deployment Kibana Version
         type: str
+  page_size:
+    description: Number of agents requested per fleet/agents page
+    type: int
+    default: 500
+  page_concurrency:
+    description:
+    - Number of fleet/agents pages fetched concurrently once the first page has returned the agent total
+    - Set to 1 to walk the pages one after another
+    type: int
+    default: 4
 
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.deployments_options
 '''
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
 import json
@@ -74,8 +88,29 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
                 
+def manage_agentlist_info(module, kibana):
+    results = {}
+    results['changed'] = False
+
+    agent_list = kibana.get_agent_list(
+      page_size = module.params.get('page_size'),
+      max_workers = module.params.get('page_concurrency'))
+    
+    results['agent_list_status'] = "Getting Agent List"
+    results['agent_list_object'] = agent_list
+    return results
+
 def main():
 
     module_args=dict(    
@@ -84,22 +119,29 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
-        deployment_info=dict(type='dict', default=None)
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
+        deployment_info=dict(type='dict', default=None),
+        page_size=dict(type='int', default=500),
+        page_concurrency=dict(type='int', default=4)
     )
+    module_args.update(deployments_argument_spec())
     
     argument_dependencies = []
         #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
         #('alert-type', 'metrics_threshold', ('conditions'))
     
-    module = AnsibleModule(argument_spec=module_args, required_if=argument_dependencies, supports_check_mode=True)
-    kibana = Kibana(module)
-    results['changed'] = False
+    module = AnsibleModule(argument_spec=module_args, required_if=argument_dependencies, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
 
-    agent_list = kibana.get_agent_list()
-    
-    results['agent_list_status'] = "Getting Agent List"
-    results['agent_list_object'] = agent_list
-    
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_agentlist_info))
+
+    kibana = Kibana(module)
+    results.update(manage_agentlist_info(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
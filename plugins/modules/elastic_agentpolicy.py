@@ -73,6 +73,11 @@ options:
     description: whether or not to enable agent tamper protection
     type: bool
     default: False
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.deployments_options
 '''
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
 
@@ -85,6 +90,15 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
 
 def compare_agent_policy(agent_policy_object, agent_policy_name, agent_policy_desc, protected, namespace, monitoring):
@@ -99,32 +113,8 @@ def compare_agent_policy(agent_policy_object, agent_policy_name, agent_policy_de
   if agent_policy_object['monitoring_enabled'] != monitoring:
     return False
   return True
-def main():
-
-    module_args=dict(    
-        host=dict(type='str',required=True),
-        port=dict(type='int', default=9243),
-        username=dict(type='str', required=True),
-        password=dict(type='str', no_log=True, required=True),   
-        verify_ssl_cert=dict(type='bool', default=True),
-        agent_policy_name=dict(type='str', required=True),
-        agent_policy_desc=dict(type='str', default='None'),
-        state=dict(type='str', default='present'),
-        monitoring=dict(type='list', default=[]),
-        deployment_info=dict(type='dict', default=None),
-        namespace=dict(type='str', default='default'),
-        protected=dict(type='bool', default=False),
-    )
-    
-    argument_dependencies = []
-        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
-        #('alert-type', 'metrics_threshold', ('conditions'))
-    
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True,
-                            mutually_exclusive=[('agent_policy_name', 'agent_policy_id')],
-                            required_one_of=[('agent_policy_name', 'agent_policy_id')])
-    
-    kibana = Kibana(module)
+def manage_agentpolicy(module, kibana):
+    results = {}
     state = module.params.get('state')
     agent_policy_name = module.params.get('agent_policy_name')
     agent_policy_desc = module.params.get('agent_policy_desc')
@@ -162,7 +152,45 @@ def main():
         results['agent_policy_status'] = "Agent Policy not found"
     else:
       results['agent_policy_status'] = "A valid state was not passed"
+    return results
+
+def main():
+
+    module_args=dict(    
+        host=dict(type='str',required=True),
+        port=dict(type='int', default=9243),
+        username=dict(type='str', required=True),
+        password=dict(type='str', no_log=True, required=True),   
+        verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
+        agent_policy_name=dict(type='str', required=True),
+        agent_policy_desc=dict(type='str', default='None'),
+        state=dict(type='str', default='present'),
+        monitoring=dict(type='list', default=[]),
+        deployment_info=dict(type='dict', default=None),
+        namespace=dict(type='str', default='default'),
+        protected=dict(type='bool', default=False),
+    )
+    module_args.update(deployments_argument_spec())
+    
+    argument_dependencies = []
+        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
+        #('alert-type', 'metrics_threshold', ('conditions'))
     
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True,
+                            mutually_exclusive=[('agent_policy_name', 'agent_policy_id')] + DEPLOYMENTS_MUTUALLY_EXCLUSIVE,
+                            required_one_of=[('agent_policy_name', 'agent_policy_id')])
+    
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_agentpolicy))
+
+    kibana = Kibana(module)
+    results.update(manage_agentpolicy(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
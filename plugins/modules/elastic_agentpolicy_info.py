@@ -66,6 +66,11 @@ options:
   agent_policy_id: 
     description: ID of Agent Policy
     type: str
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.deployments_options
 '''
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
 
@@ -78,10 +83,38 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
                 
 import json
 
+def manage_agentpolicy_info(module, kibana):
+    results = {}
+    results['changed'] = False
+    agent_policy_id = module.params.get('agent_policy_id')
+    agent_policy_name = module.params.get('agent_policy_name')
+
+    if module.params.get('agent_policy_name'):
+      agent_policy_object = kibana.get_agent_policy_byname(agent_policy_name)
+    else:
+      agent_policy_object = kibana.get_agent_policy_byid(agent_policy_id)
+      
+    if agent_policy_object:
+      results['agent_policy_status'] = "Agent Policy Found"
+      results['agent_policy_object'] = agent_policy_object
+    else:
+      results['agent_policy_status'] = "No Agent Policy was returned, check your Agent Policy Name"
+      results['agent_policy_object'] = None
+    return results
+
 def main():
 
     module_args=dict(    
@@ -90,36 +123,31 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
         agent_policy_name=dict(type='str'),
         agent_policy_id=dict(type='str'),
         deployment_info=dict(type='dict', default=None)
     )
+    module_args.update(deployments_argument_spec())
     
     argument_dependencies = []
         #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
         #('alert-type', 'metrics_threshold', ('conditions'))
     
     module = AnsibleModule(argument_spec=module_args, supports_check_mode=True,
-                            mutually_exclusive=[('agent_policy_name', 'agent_policy_id')],
+                            mutually_exclusive=[('agent_policy_name', 'agent_policy_id')] + DEPLOYMENTS_MUTUALLY_EXCLUSIVE,
                             required_one_of=[('agent_policy_name', 'agent_policy_id')])
     
-    kibana = Kibana(module)
-    results['changed'] = False
-    agent_policy_id = module.params.get('agent_policy_id')
-    agent_policy_name = module.params.get('agent_policy_name')
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_agentpolicy_info))
 
-    if module.params.get('agent_policy_name'):
-      agent_policy_object = kibana.get_agent_policy_byname(agent_policy_name)
-    else:
-      agent_policy_object = kibana.get_agent_policy_byid(agent_policy_id)
-      
-    if agent_policy_object:
-      results['agent_policy_status'] = "Agent Policy Found"
-      results['agent_policy_object'] = agent_policy_object
-    else:
-      results['agent_policy_status'] = "No Agent Policy was returned, check your Agent Policy Name"
-      results['agent_policy_object'] = None
-      
+    kibana = Kibana(module)
+    results.update(manage_agentpolicy_info(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
@@ -63,6 +63,23 @@ options:
   security_rule_name: 
         description: Name of Security Rule
         type: str
+  security_rule_names: 
+        description: Names of Security Rules to enable, or disable when active is false, together in bulk
+        type: list
+        elements: str
+  security_rule_tags: 
+        description: Enable, or disable when active is false, every Security Rule carrying one of these tags
+        type: list
+        elements: str
+  bulk_batch_size: 
+        description: Number of rules changed per detection engine _bulk_action request
+        type: int
+        default: 100
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.deployments_options
 '''
 
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
@@ -77,8 +94,46 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
 
+def manage_detection_rule(module, kibana):
+    results = {}
+    state = module.params.get('state')
+    security_rule_name = module.params.get('security_rule_name')
+    active = module.params.get('active')
+    
+    if module.check_mode:
+        results['changed'] = False
+    else:
+        results['changed'] = True
+    security_rule_names = module.params.get('security_rule_names')
+    security_rule_tags = module.params.get('security_rule_tags')
+    if state == "present" and (security_rule_names or security_rule_tags):
+      sec_rule_info = kibana.set_security_rules_enabled(
+        rule_names = security_rule_names,
+        rule_tags = security_rule_tags,
+        enabled = active,
+        batch_size = module.params.get('bulk_batch_size'),
+        check_mode = module.check_mode)
+      results['changed'] = sec_rule_info.pop('changed')
+      results['sec_rule_info'] = sec_rule_info
+    elif state == "present":
+      if active == True:
+        sec_rule_info = kibana.activate_security_rule(security_rule_name)
+        if sec_rule_info == security_rule_name + ': Rule is already enabled':
+          results['changed'] = False
+        results['sec_rule_info'] = sec_rule_info
+    return results
+
 def main():
 
     module_args=dict(   
@@ -87,33 +142,32 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
         state=dict(type='str', default='present'),
         active=dict(type='bool', default=True),
         security_rule_name=dict(type='str'),
+        security_rule_names=dict(type='list', elements='str'),
+        security_rule_tags=dict(type='list', elements='str'),
+        bulk_batch_size=dict(type='int', default=100),
         deployment_info=dict(type='dict', default=None)
     )
+    module_args.update(deployments_argument_spec())
     argument_dependencies = []
         #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
         #('alert-type', 'metrics_threshold', ('conditions'))
     
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
-    
-    state = module.params.get('state')
-    security_rule_name = module.params.get('security_rule_name')
-    active = module.params.get('active')
-    
-    if module.check_mode:
-        results['changed'] = False
-    else:
-        results['changed'] = True
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
+
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_detection_rule))
 
     kibana = Kibana(module)
-    if state == "present":
-      if active == True:
-        sec_rule_info = kibana.activate_security_rule(security_rule_name)
-        if sec_rule_info == security_rule_name + ': Rule is already enabled':
-          results['changed'] = False
-        results['sec_rule_info'] = sec_rule_info
+    results.update(manage_detection_rule(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
@@ -78,6 +78,12 @@ options:
   pkg_policy_desc=dict(type='str'),
   pkg_policy_vars=dict(type='json'),
   integration_settings=dict(type='dict'),
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.epr_cache_options
+  - expedient.elastic.deployments_options
 '''
 
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
@@ -93,95 +99,28 @@ except:
   from kibana import Kibana
   from json import loads, dumps
 
-results = {}
-
-def deep_update(original, updated):
-    """
-    Attempts to update deeply nested dictionaries + lists
-    :param original/the object to be updated:
-    :param updated/changes to be applied:
-    :return:
-    """
-
-    def match_shallow_structure(dictionary_1, dictionary_2):
-        """
-        utility function to check if all the non-dictionary keys and values in a
-        dictionary match those of the other
-        :param dictionary_1:
-        :param dictionary_2:
-        :return:
-        """
-        shallow_1 = {
-            key: value for key, value in dictionary_1.items() if
-            not isinstance(value, dict)
-        }
-        shallow_2 = {
-            key: value for key, value in dictionary_2.items() if
-            not isinstance(value, dict)
-        }
-        return shallow_1 == shallow_2
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.pkg_policy_diff import PkgPolicyDiff
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from pkg_policy_diff import PkgPolicyDiff
 
-    if isinstance(updated, dict):
-        for key, value in updated.items():
-            if (isinstance(value, dict) or isinstance(value, list)) and original.get(
-                key
-            ) is not None:
-                deep_update(original.get(key), updated[key])
-            else:
-                original.update({key: updated[key]})
-    elif isinstance(updated, list) and isinstance(original, list):
-        if all([isinstance(item, dict) for item in updated]):
-            for updated_dictionary_list_item in updated:
-                try:
-                    deep_update(
-                        next(
-                            original_dictionary_list_item
-                            for original_dictionary_list_item in original
-                            if match_shallow_structure(
-                                updated_dictionary_list_item,
-                                original_dictionary_list_item,
-                            )
-                        ),
-                        updated_dictionary_list_item,
-                    )
-                except StopIteration:
-                    original.append(updated_dictionary_list_item)
-        else:
-            original += [i for i in updated if i not in original]
-    return
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
 
-def main():
+results = {}
 
-    module_args=dict(   
-        host=dict(type='str',required=True),
-        port=dict(type='int', default=9243),
-        username=dict(type='str', required=True),
-        password=dict(type='str', no_log=True, required=True),   
-        verify_ssl_cert=dict(type='bool', default=True),
-        agent_policy_id=dict(type='str'),
-        agent_policy_name=dict(type='str'),
-        integration_title=dict(type='str'),
-        integration_ver=dict(type='str'),
-        integration_name=dict(type='str'),
-        pkg_policy_name=dict(type='str', required=True),
-        pkg_policy_desc=dict(type='str'),
-        pkg_policy_vars=dict(type='json'),
-        integration_setting_updates=dict(type='list'),
-        namespace=dict(type='str', default='default'),
-        state=dict(type='str', default='present'),
-        integration_settings=dict(type='dict'),
-        deployment_info=dict(type='dict', default=None)
-    )
-    argument_dependencies = []
-        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
-        #('alert-type', 'metrics_threshold', ('conditions'))
-    
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True,
-                            mutually_exclusive=[('agent_policy_name', 'agent_policy_id')],
-                            required_one_of=[('agent_policy_name', 'agent_policy_id')],
-                            required_together=[('integration_ver','integration_name')]
-                          )
-    
+def manage_expedient_pkgpolicy(module, kibana):
+    results = {}
     state = module.params.get('state')
     integration_setting_updates = module.params.get('integration_setting_updates')
     agent_policy_name = module.params.get('agent_policy_name')
@@ -206,8 +145,6 @@ def main():
         results['changed'] = False
     else:
         results['changed'] = True
-
-    kibana = Kibana(module)
     
     if module.params.get('agent_policy_id'):
       agency_policy_object = kibana.get_agent_policy_byid(agent_policy_id)
@@ -246,8 +183,6 @@ def main():
           integration_version=integration_object['version'], 
           body = body)
       pkg_policy_object = kibana.get_pkg_policy(pkg_policy_name)
-      pkg_policy_object_orig = pkg_policy_object
-      applied_defaults = False
       if 'item' in pkg_policy_object:
         pkg_policy_object = pkg_policy_object['item']      
       if pkg_policy_object:
@@ -257,7 +192,6 @@ def main():
         if module.check_mode == False: 
           ### Make sure Integration is not set to "Keep integration policies up to date"
           pkg_policy_object = kibana.create_pkg_policy(pkg_policy_name, pkg_policy_desc, agent_policy_id, integration_object, namespace, pkg_policy_vars)
-          pkg_policy_object_orig = pkg_policy_object
           if 'item' in pkg_policy_object:
             pkg_policy_object = pkg_policy_object['item']
           #pkg_policy_object = kibana.upgrade_pkg_policy(pkg_policy_object['id'])
@@ -269,12 +203,14 @@ def main():
           results['pkg_policy_object'] = ""
           results['changed'] = False
           
+      # The package defaults and setting updates below edit pkg_policy_object in place, the diff holds the policy as
+      # it was read so that it is only PUT when they actually changed something
+      pkg_policy_diff = PkgPolicyDiff(pkg_policy_object)
       if (not integration_settings or integration_settings is None) and (not integration_setting_updates or integration_setting_updates is None):
         if pkg_policy_object['package']['name'] == 'synthetics':
           i = 0
           for policy_input in pkg_policy_object['inputs']:
             if 'type' in policy_input:
-              applied_defaults = True
               pkg_policy_object['inputs'][i]['enabled'] = False
               if policy_input['type'] == 'synthetics/http' and integration_vars['type'] == "synthetics/http":
                 j = 0
@@ -302,7 +238,6 @@ def main():
           i = 0
           for policy_input in pkg_policy_object['inputs']:
             if 'type' in policy_input:
-              applied_defaults = True
               if policy_input['type'] == 'winlog':
                 pkg_policy_object['inputs'][i]['enabled'] = True
                 j = 0
@@ -322,7 +257,6 @@ def main():
         if pkg_policy_object['package']['name'] == 'osquery_manager':
           i = 0
           for policy_input in pkg_policy_object['inputs']:
-            applied_defaults = True
             pkg_policy_object['inputs'][i]['streams'] = []
             if 'vars' in pkg_policy_object['inputs'][i]:
               pkg_policy_object['inputs'][i].pop('vars')
@@ -334,7 +268,6 @@ def main():
           i = 0
           for policy_input in pkg_policy_object['inputs']:
             if 'type' in policy_input:
-                applied_defaults = True
                 pkg_policy_object['inputs'][i]['enabled'] = False
                 if policy_input['type'] == 'logfile' or \
                   policy_input['type'] == 'winlog':
@@ -374,7 +307,6 @@ def main():
           i = 0
           for policy_input in pkg_policy_object['inputs']:
             if 'type' in policy_input:
-                applied_defaults = True
                 pkg_policy_object['inputs'][i]['enabled'] = False
                 if policy_input['type'] == 'winlog':
                   if 'service' in integration_vars:
@@ -403,7 +335,6 @@ def main():
           for policy_input in pkg_policy_object['inputs']:
             pkg_policy_object['inputs'][i]['enabled'] = False
             if 'type' in policy_input:
-                applied_defaults = True
                 if policy_input['type'] == 'system/metrics' or \
                   policy_input['type'] == 'linux/metrics':
                     pkg_policy_object['inputs'][i]['enabled'] = True
@@ -423,7 +354,6 @@ def main():
           i = 0
           for policy_input in pkg_policy_object['inputs']:
             if 'config' in policy_input:
-                applied_defaults = True
                 pkg_policy_object['inputs'][i]['config']['policy']['value']['linux']['behavior_protection']['mode'] = mode
                 pkg_policy_object['inputs'][i]['config']['policy']['value']['linux']['malware']['mode'] = mode
                 pkg_policy_object['inputs'][i]['config']['policy']['value']['linux']['memory_protection']['mode'] = mode
@@ -441,7 +371,6 @@ def main():
           i = 0
           for policy_input in pkg_policy_object['inputs']:
             if 'type' in policy_input:
-                applied_defaults = True
                 pkg_policy_object['inputs'][i]['enabled'] = False
                 if policy_input['type'] == 'udp':
                     pkg_policy_object['inputs'][i]['enabled'] = True
@@ -454,46 +383,19 @@ def main():
                       j=j+1
             i = i+1
       elif (integration_setting_updates and integration_setting_updates != None):
-          
-        i = 0
-        for policy_input in pkg_policy_object['inputs']:
-          if 'type' in policy_input:
-              applied_defaults = True
-              pkg_policy_object['inputs'][i]['enabled'] = False
-              j = 0
-              for stream in policy_input['streams']:
-                pkg_policy_object['inputs'][i]['streams'][j]['enabled'] = False
-                j = j +1
-              for integration_setting_update in integration_setting_updates:
-                for setting_key_type, setting_params in integration_setting_update.items():
-                  if policy_input['type'] == setting_key_type:
-                    for setting_param, setting_value in setting_params.items():
-                      if ':' in setting_param:
-                        data_stream_type_or_dataset, stream_param = setting_param.split(':')
-                      else:
-                        data_stream_type_or_dataset = None
-                        if setting_param == "vars":
-                          for var_name, var_value in setting_value.items():
-                            for pkg_policy_var_name, pkg_policy_var_attr in pkg_policy_object['inputs'][i][setting_param].items():
-                              if pkg_policy_var_name == var_name:
-                                pkg_policy_object['inputs'][i][setting_param][var_name]['value'] = var_value
-                        else:
-                          pkg_policy_object['inputs'][i][setting_param] = setting_value
-                      k = 0
-                      for stream in policy_input['streams']:
-                        if stream['data_stream']['type'] == data_stream_type_or_dataset:
-                          pkg_policy_object['inputs'][i]['streams'][k][stream_param] = setting_value
-                        if stream['data_stream']['dataset'] == data_stream_type_or_dataset:
-                          pkg_policy_object['inputs'][i]['streams'][k][stream_param] = setting_value
-                        k = k +1
-          i = i+1        
+        pkg_policy_diff.apply_setting_updates(integration_setting_updates)
 
-      if pkg_policy_object == pkg_policy_object_orig and applied_defaults is False:
-        results['pkg_policy_object_updated'] = "False"
-      else:
+      results['pkg_policy_changes'] = pkg_policy_diff.get_changes()
+      if pkg_policy_diff.changed:
         results['pkg_policy_object_updated'] = "True"
-      pkg_policy_object_id = pkg_policy_object['id']
-      pkg_policy_info = kibana.update_pkg_policy(pkg_policy_object_id, pkg_policy_object)
+        results['changed'] = True
+        if module.check_mode:
+          pkg_policy_info = "Package Policy differs from the requested settings, no update sent because check_mode is set to true"
+        else:
+          pkg_policy_info = kibana.update_pkg_policy(pkg_policy_object['id'], pkg_policy_object)
+      else:
+        results['pkg_policy_object_updated'] = "False"
+        pkg_policy_info = "Package Policy already has the requested settings, no update sent"
       body = {
         "keepPoliciesUpToDate": True
       }
@@ -503,7 +405,54 @@ def main():
           integration_version=integration_object['version'], 
           body = body)
       results['pkg_policy_object_update'] = pkg_policy_info
+    return results
 
+def main():
+
+    module_args=dict(   
+        host=dict(type='str',required=True),
+        port=dict(type='int', default=9243),
+        username=dict(type='str', required=True),
+        password=dict(type='str', no_log=True, required=True),   
+        verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
+        epr_revalidate_after=dict(type='int', default=86400),
+        epr_offline=dict(type='bool', default=False),
+        agent_policy_id=dict(type='str'),
+        agent_policy_name=dict(type='str'),
+        integration_title=dict(type='str'),
+        integration_ver=dict(type='str'),
+        integration_name=dict(type='str'),
+        pkg_policy_name=dict(type='str', required=True),
+        pkg_policy_desc=dict(type='str'),
+        pkg_policy_vars=dict(type='json'),
+        integration_setting_updates=dict(type='list'),
+        namespace=dict(type='str', default='default'),
+        state=dict(type='str', default='present'),
+        integration_settings=dict(type='dict'),
+        deployment_info=dict(type='dict', default=None)
+    )
+    module_args.update(deployments_argument_spec())
+    argument_dependencies = []
+        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
+        #('alert-type', 'metrics_threshold', ('conditions'))
+    
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True,
+                            mutually_exclusive=[('agent_policy_name', 'agent_policy_id')] + DEPLOYMENTS_MUTUALLY_EXCLUSIVE,
+                            required_one_of=[('agent_policy_name', 'agent_policy_id')],
+                            required_together=[('integration_ver','integration_name')]
+                          )
+
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_expedient_pkgpolicy))
+
+    kibana = Kibana(module)
+    results.update(manage_expedient_pkgpolicy(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
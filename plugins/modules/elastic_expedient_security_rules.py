@@ -70,7 +70,18 @@ options:
       security_rule_items: 
         description:
           - List of Endpoint Exceptions in JSON format
-        required: true  
+          - Items are matched to existing entries by item_id, or by name when they have none, and only created or updated when they differ
+        required: true
+      purge: 
+        description:
+          - Delete endpoint_list entries that are not in security_rule_items
+        type: bool
+        default: false
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.deployments_options
 '''
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
 
@@ -83,29 +94,21 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
-results = {}
-
-def main():
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
 
-    module_args=dict(   
-        host=dict(type='str',required=True),
-        port=dict(type='int', default=9243),
-        username=dict(type='str', required=True),
-        password=dict(type='str', no_log=True, required=True),   
-        verify_ssl_cert=dict(type='bool', default=True),
-        deployment_info=dict(type='dict', default=None),
-        security_rule_items=dict(type='list', default=None),
-    )
-    argument_dependencies = []
-        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
-        #('alert-type', 'metrics_threshold', ('conditions'))
-    
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+results = {}
 
+def manage_expedient_security_rules(module, kibana):
+    results = {}
     results['changed'] = False
     security_rule_exception_items = module.params.get('security_rule_items')
-  
-    kibana = Kibana(module)
       
     exception_lists = kibana.get_security_exception_list()
     target_object = None
@@ -123,20 +126,46 @@ def main():
     if target_object:
       results['exception_list_status'] = "endpoint_list found"
       results['exception_list_object'] = target_object
-      endpoint_list_items = kibana.get_security_exception_list_item()
-      results['exception_list_item_object'] = endpoint_list_items
     
-    if not endpoint_list_items:
-      results['exception_list_item_status'] = "INFO: Endpoint Security has no entries, that's ok, we will create one"
-    else:
-      for security_rule_exception_item in security_rule_exception_items:      
-        for endpoint_list_item in endpoint_list_items:
-          if endpoint_list_item['name'].upper() == security_rule_exception_item['name'].upper():
-            endpoint_list_item_delete = kibana.delete_security_exception_list_items(item_id = endpoint_list_item['item_id'])
-            results['endpoint_list_item_delete'] = endpoint_list_item_delete
-        endpoint_list_item_update = kibana.create_security_exception_list_items(id = 'endpoint_list', body = security_rule_exception_item)
-        results['endpoint_list_item_update_object_' + security_rule_exception_item['name']] = endpoint_list_item_update
+    sync_result = kibana.sync_security_exception_list_items(
+      security_rule_exception_items or [],
+      list_id = 'endpoint_list',
+      purge = module.params.get('purge'),
+      check_mode = module.check_mode)
+    results['changed'] = sync_result.pop('changed')
+    results['exception_list_item_sync'] = sync_result
+    return results
+
+def main():
+
+    module_args=dict(   
+        host=dict(type='str',required=True),
+        port=dict(type='int', default=9243),
+        username=dict(type='str', required=True),
+        password=dict(type='str', no_log=True, required=True),   
+        verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
+        deployment_info=dict(type='dict', default=None),
+        security_rule_items=dict(type='list', default=None),
+        purge=dict(type='bool', default=False),
+    )
+    module_args.update(deployments_argument_spec())
+    argument_dependencies = []
+        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
+        #('alert-type', 'metrics_threshold', ('conditions'))
     
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
+
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_expedient_security_rules))
+
+    kibana = Kibana(module)
+    results.update(manage_expedient_security_rules(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
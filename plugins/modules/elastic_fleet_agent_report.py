@@ -60,7 +60,26 @@ options:
       version:
         description: Deployment Kibana Version
         type: str
+  page_size:
+    description: Number of agents requested per fleet/agents page
+    type: int
+    default: 500
+  page_concurrency:
+    description:
+    - Number of fleet/agents pages fetched concurrently once the first page has returned the agent total
+    - Set to 1 to walk the pages one after another
+    type: int
+    default: 4
+  report_file:
+    description:
+    - Path of a file to stream the report to, one JSON agent entry per line
+    - When set, agent_list is not returned and only agent_count and report_file are, which keeps memory flat for very large fleets
+    type: str
 
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.deployments_options
 '''
 from ansible.module_utils.basic import AnsibleModule
 import json
@@ -74,8 +93,78 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
                 
+def manage_fleet_agent_report(module, kibana):
+    results = {}
+    results['changed'] = False
+
+    report_file = module.params.get('report_file')
+
+    # Index package policies and agent policies by id once, so every agent is matched with a dict lookup
+    pkg_policy_index = {}
+    for pkg_policy in kibana.iter_pkg_policies():
+      pkg_policy_index[pkg_policy['id']] = {
+        'pkg_policy_name': pkg_policy['name'],
+        'integration_name': pkg_policy['package']['name'],
+        #'integration_title': pkg_policy['package']['title'],
+        #'integration_version': pkg_policy['package']['version'],
+      }
+
+    agent_policy_index = {}
+    for agent_policy in kibana.iter_agent_policies():
+      package_policy_info = []
+      for pkg_policy_per_agent_policy in agent_policy.get('package_policies') or []:
+        # Depending on the Kibana version this is either a list of ids or a list of package policy objects
+        if isinstance(pkg_policy_per_agent_policy, dict):
+          pkg_policy_per_agent_policy = pkg_policy_per_agent_policy.get('id')
+        if pkg_policy_per_agent_policy in pkg_policy_index:
+          package_policy_info.append(pkg_policy_index[pkg_policy_per_agent_policy])
+      agent_policy_index[agent_policy['id']] = {
+        'name': agent_policy['name'],
+        'package_policy_info': package_policy_info
+      }
+
+    def agent_report():
+      for fleet_agent in kibana.iter_agents(
+          page_size = module.params.get('page_size'),
+          max_workers = module.params.get('page_concurrency')):
+        agent_policy = agent_policy_index.get(fleet_agent.get('policy_id'))
+        if agent_policy is None:
+          continue
+        agent_version = (fleet_agent.get('agent') or {}).get('version', "N/A")
+        yield {
+          'agent_name': fleet_agent['local_metadata']['host']['name'],
+          'host_name':fleet_agent['local_metadata']['host']['hostname'],
+          'agent_active': fleet_agent['active'],
+          'agent_status': fleet_agent['status'],
+          'agent_version': agent_version,
+          'agent_policy': agent_policy['name'],
+          'pkg_policy_info': agent_policy['package_policy_info']
+        }
+
+    if report_file:
+      agent_count = 0
+      with open(report_file, 'w') as report:
+        for agent_entry in agent_report():
+          report.write(json.dumps(agent_entry) + '\n')
+          agent_count = agent_count + 1
+      results['report_file'] = report_file
+      results['agent_count'] = agent_count
+    else:
+      results['agent_list'] = list(agent_report())
+      results['agent_count'] = len(results['agent_list'])
+    return results
+
 def main():
 
     module_args=dict(    
@@ -84,62 +173,30 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),
         verify_ssl_cert=dict(type='bool', default=True),
-        deployment_info=dict(type='dict', default=None)
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
+        deployment_info=dict(type='dict', default=None),
+        page_size=dict(type='int', default=500),
+        page_concurrency=dict(type='int', default=4),
+        report_file=dict(type='str', default=None)
     )
+    module_args.update(deployments_argument_spec())
     
     argument_dependencies = []
         #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
         #('alert-type', 'metrics_threshold', ('conditions'))
     
-    module = AnsibleModule(argument_spec=module_args, required_if=argument_dependencies, supports_check_mode=True)
-    kibana = Kibana(module)
-    results['changed'] = False
+    module = AnsibleModule(argument_spec=module_args, required_if=argument_dependencies, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
 
-    fleet_agent_list = kibana.get_agent_list()
-    pkg_policy_list = kibana.get_all_pkg_policies()
-    agent_policy_list = kibana.get_all_agent_policys()
-    
-    #results['pkg_policy_list'] = pkg_policy_list
-    #results['agent_policy_list'] = agent_policy_list
-    #results['agent_list'] = agent_list
-    i=0
-    for agent_policy in agent_policy_list['items']:
-      if 'package_policy_info' not in agent_policy:
-        agent_policy_list['items'][i]['package_policy_info'] = []
-      if 'package_policies' in agent_policy:
-        for pkg_policy_per_agent_policy in agent_policy['package_policies']:
-          for pkg_policy in pkg_policy_list['items']:
-            if pkg_policy_per_agent_policy == pkg_policy['id']:
-              package_policy_info = {
-                'pkg_policy_name': pkg_policy['name'],
-                'integration_name': pkg_policy['package']['name'],
-                #'integration_title': pkg_policy['package']['title'],
-                #'integration_version': pkg_policy['package']['version'],              
-              }
-              agent_policy_list['items'][i]['package_policy_info'].append(package_policy_info)
-      
-      i=i+1
-    agent_list = []
-    for fleet_agent in fleet_agent_list['list']:
-      for agent_policy in agent_policy_list['items']:
-        if fleet_agent['policy_id'] == agent_policy['id']:
-          if 'agent' not in fleet_agent:
-            fleet_agent['agent'] = {}
-          if 'version' not in fleet_agent['agent']:
-            fleet_agent['agent']['version'] = "N/A"
-          agent_entry = {
-            'agent_name': fleet_agent['local_metadata']['host']['name'],
-            'host_name':fleet_agent['local_metadata']['host']['hostname'],
-            'agent_active': fleet_agent['active'],
-            'agent_status': fleet_agent['status'],
-            'agent_version': fleet_agent['agent']['version'],
-            'agent_policy': agent_policy['name'],
-            'pkg_policy_info': agent_policy['package_policy_info']
-          }
-          agent_list.append(agent_entry)
-          results['agent_list'] = agent_list
-      
-    
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_fleet_agent_report))
+
+    kibana = Kibana(module)
+    results.update(manage_fleet_agent_report(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
@@ -66,6 +66,11 @@ options:
   component_template_body: 
     description: Component Template Body
     type: str
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.bulk_definitions_options
+  - expedient.elastic.deployments_options
 '''
 
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
@@ -80,8 +85,55 @@ except:
   sys.path.append(util_path)
   from elastic import Elastic
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.definitions import apply_definitions
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from definitions import apply_definitions
+
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
 
+def manage_index_component_template(module, elastic):
+    results = {}
+    results['changed'] = False
+    if module.params.get('definitions') or module.params.get('definitions_dir'):
+      results.update(apply_definitions(module, elastic, 'component_template'))
+      if results.get('failed'):
+        module.fail_json(**results)
+      module.exit_json(**results)
+
+    component_template_name = module.params.get('component_template')
+    component_template_body = module.params.get('component_template_body')
+    state = module.params.get('state')
+
+    if component_template_name:
+      component_template_object = elastic.get_component_template(component_template_name)
+      results['component_template_object'] = component_template_object
+      if state == 'present':
+        component_template_update = elastic.update_component_template(component_template_name, component_template_body, check_mode = module.check_mode)
+        results['changed'] = component_template_update['changed']
+        results['component_template_differences'] = component_template_update['differences']
+        if component_template_update['changed'] and not module.check_mode:
+          updated_component_template_object = elastic.get_component_template(component_template_name)
+          results['component_template_status'] = "Component Template Updated"
+        else:
+          updated_component_template_object = component_template_object
+          results['component_template_status'] = "Component Template already up to date" if not component_template_update['changed'] else "Component Template would be updated"
+        results['updated_component_template_object'] = updated_component_template_object
+    return results
+
 def main():
 
     module_args=dict(   
@@ -90,34 +142,31 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
         deployment_info=dict(type='dict', default=None),
+        definitions=dict(type='list', elements='dict', options=dict(name=dict(type='str', required=True), body=dict(type='dict', required=True))),
+        definitions_dir=dict(type='path'),
+        definitions_concurrency=dict(type='int', default=8),
         component_template=dict(type='str'),
         component_template_body=dict(type='dict'),
         state=dict(type='str', default='present'),
     )
+    module_args.update(deployments_argument_spec())
     argument_dependencies = []
         #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
         #('alert-type', 'metrics_threshold', ('conditions'))
     
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True,
+                           mutually_exclusive=[('definitions', 'component_template'), ('definitions_dir', 'component_template')] + DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
 
-    results['changed'] = False
-    
-    elastic = Elastic(module)
-    component_template_name = module.params.get('component_template')
-    component_template_body = module.params.get('component_template_body')
-    state = module.params.get('state')
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Elastic, manage_index_component_template))
 
-    if component_template_name:
-      component_template_object = elastic.get_component_template(component_template_name)
-      results['component_template_object'] = component_template_object
-      if state == 'present':
-        results['changed'] = True
-        elastic.update_component_template(component_template_name, component_template_body)
-        updated_component_template_object = elastic.get_component_template(component_template_name)
-        results['updated_component_template_object'] = updated_component_template_object
-        results['component_template_status'] = "Component Template Updated"
-        
+    elastic = Elastic(module)
+    results.update(manage_index_component_template(module, elastic))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
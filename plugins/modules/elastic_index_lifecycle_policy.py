@@ -78,6 +78,10 @@ options:
             delete:
               delete_searchable_snapshot: true
 
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.deployments_options
+  - expedient.elastic.bulk_definitions_options
 '''
 
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
@@ -92,8 +96,45 @@ except:
   sys.path.append(util_path)
   from elastic import Elastic
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.definitions import apply_definitions
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from definitions import apply_definitions
+
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
 
+def manage_index_lifecycle_policy(module, elastic):
+    if module.params.get('definitions') or module.params.get('definitions_dir'):
+      return apply_definitions(module, elastic, 'ilm_policy')
+
+    results = {'changed': False}
+    index_lifecycle_policy_name = module.params.get('index_lifecycle_policy_name')
+    new_settings = module.params.get('settings')
+    
+    if index_lifecycle_policy_name and new_settings:
+      results['elastic_index_lifecycle_status'] = "Elastic Index Lifecycle Policy found"
+      elastic_index_lifecycle_policy_update = elastic.update_index_lifecycle_policy(index_lifecycle_policy_name, new_settings, check_mode = module.check_mode)
+      results['index_lifecycle_policy_object'] = elastic_index_lifecycle_policy_update['index_lifecycle_policy']
+      results['index_lifecycle_policy_differences'] = elastic_index_lifecycle_policy_update['differences']
+      results['changed'] = elastic_index_lifecycle_policy_update['changed']
+    else:
+      results['elastic_index_lifecycle_status'] = "Elastic Index Lifecycle Policy NOT found"
+      results['index_lifecycle_policy_object'] = ""
+    return results
+
 def main():
 
     module_args=dict(   
@@ -102,31 +143,30 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
         index_lifecycle_policy_name=dict(type='str'),
         settings=dict(type='dict'),
-        deployment_info=dict(type='dict', default=None)
+        deployment_info=dict(type='dict', default=None),
+        definitions=dict(type='list', elements='dict', options=dict(name=dict(type='str', required=True), body=dict(type='dict', required=True))),
+        definitions_dir=dict(type='path'),
+        definitions_concurrency=dict(type='int', default=8),
     )
+    module_args.update(deployments_argument_spec())
     argument_dependencies = []
         #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
         #('alert-type', 'metrics_threshold', ('conditions'))
     
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True,
+                           mutually_exclusive=[('definitions', 'index_lifecycle_policy_name'), ('definitions_dir', 'index_lifecycle_policy_name')] + DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
+
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Elastic, manage_index_lifecycle_policy))
 
-    results['changed'] = False
-    
     elastic = Elastic(module)
-    index_lifecycle_policy_name = module.params.get('index_lifecycle_policy_name')
-    new_settings = module.params.get('settings')
-    
-    if index_lifecycle_policy_name and new_settings:
-      results['elastic_index_lifecycle_status'] = "Elastic Index Lifecycle Policy found"
-      elastic_index_lifecycle_policy_object = elastic.update_index_lifecycle_policy(index_lifecycle_policy_name, new_settings)
-      results['index_lifecycle_policy_object'] = elastic_index_lifecycle_policy_object
-      results['changed'] = True
-    else:
-      results['elastic_index_lifecycle_status'] = "Elastic Index Lifecycle Policy NOT found"
-      results['index_lifecycle_policy_object'] = ""
-    
+    results.update(manage_index_lifecycle_policy(module, elastic))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
@@ -63,6 +63,10 @@ options:
   index_lifecycle_policy_name: Name of lifecycle policy
     description: ILM Policy Name
     type: str
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.deployments_options
 '''
 
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
@@ -77,8 +81,31 @@ except:
   sys.path.append(util_path)
   from elastic import Elastic
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
 
+def manage_index_lifecycle_policy_info(module, elastic):
+    results = {}
+    results['changed'] = False
+    index_lifecycle_policy_name = module.params.get('index_lifecycle_policy_name')
+    
+    if index_lifecycle_policy_name:
+      results['elastic_index_lifecycle_status'] = "Elastic Index Lifecycle Policy found"
+      elastic_index_lifecycle_policy_object = elastic.get_index_lifecycle_policy(index_lifecycle_policy_name)
+      results['index_lifecycle_policy_object'] = elastic_index_lifecycle_policy_object
+    else:
+      results['elastic_index_lifecycle_status'] = "Elastic Index Lifecycle Policy NOT found"
+      results['index_lifecycle_policy_object'] = ""
+    return results
+
 def main():
 
     module_args=dict(   
@@ -87,29 +114,26 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
         index_lifecycle_policy_name=dict(type='str'),
         #settings=dict(type='dict'),
         deployment_info=dict(type='dict', default=None)
     )
+    module_args.update(deployments_argument_spec())
     argument_dependencies = []
         #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
         #('alert-type', 'metrics_threshold', ('conditions'))
     
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
+
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Elastic, manage_index_lifecycle_policy_info))
 
-    results['changed'] = False
-    
     elastic = Elastic(module)
-    index_lifecycle_policy_name = module.params.get('index_lifecycle_policy_name')
-    
-    if index_lifecycle_policy_name:
-      results['elastic_index_lifecycle_status'] = "Elastic Index Lifecycle Policy found"
-      elastic_index_lifecycle_policy_object = elastic.get_index_lifecycle_policy(index_lifecycle_policy_name)
-      results['index_lifecycle_policy_object'] = elastic_index_lifecycle_policy_object
-    else:
-      results['elastic_index_lifecycle_status'] = "Elastic Index Lifecycle Policy NOT found"
-      results['index_lifecycle_policy_object'] = ""
-    
+    results.update(manage_index_lifecycle_policy_info(module, elastic))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
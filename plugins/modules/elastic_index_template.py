@@ -87,10 +87,16 @@ options:
   template:
     description: data_stream
     type: dict
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.bulk_definitions_options
+  - expedient.elastic.deployments_options
 '''
 
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
 #from ansible.module_utils.basic import *
+from copy import deepcopy
 
 try:
   from ansible_collections.expedient.elastic.plugins.module_utils.elastic import Elastic
@@ -101,37 +107,35 @@ except:
   sys.path.append(util_path)
   from elastic import Elastic
 
-results = {}
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.definitions import apply_definitions
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from definitions import apply_definitions
 
-def main():
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
 
-    module_args=dict(   
-        host=dict(type='str'),
-        port=dict(type='int', default=12443),
-        username=dict(type='str', required=True),
-        password=dict(type='str', no_log=True, required=True),   
-        verify_ssl_cert=dict(type='bool', default=True),
-        deployment_info=dict(type='dict', default=None),
-        index_template=dict(type='str'),
-        state=dict(type='str', default='present'),
-        index_patterns=dict(type='list'),
-        index_patterns_action=dict(type='str', default='add'),
-        composed_of=dict(type='list'),
-        composed_of_action=dict(type='str', default='add'),
-        template_priority=dict(type='int', default=100),
-        index_priority=dict(type='int', default=100),
-        data_stream=dict(type='dict'),
-        template=dict(type='dict')
-    )
-    argument_dependencies = []
-        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
-        #('alert-type', 'metrics_threshold', ('conditions'))
-    
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+results = {}
 
+def manage_index_template(module, elastic):
+    results = {}
     results['changed'] = False
-    
-    elastic = Elastic(module)
+    if module.params.get('definitions') or module.params.get('definitions_dir'):
+      results.update(apply_definitions(module, elastic, 'index_template'))
+      if results.get('failed'):
+        module.fail_json(**results)
+      module.exit_json(**results)
+
     index_template_name = module.params.get('index_template')
     index_priority = module.params.get('index_priority')
     state = module.params.get('state')
@@ -147,20 +151,19 @@ def main():
       index_template_object = elastic.get_index_template(index_template_name)
       results['index_template_object'] = index_template_object
       if index_template_object:
+        live_index_template = deepcopy(index_template_object['index_template'])
         if index_patterns:
           if index_patterns_action == "add":
-            index_template_object['index_template']['index_patterns'] += index_patterns
+            existing_index_patterns = set(index_template_object['index_template']['index_patterns'])
+            index_template_object['index_template']['index_patterns'] += [index_pattern for index_pattern in dict.fromkeys(index_patterns) if index_pattern not in existing_index_patterns]
         if composed_of:
           if composed_of_action == "add":
-            for component_template in composed_of:
-              component_template_object = elastic.get_component_template(component_template)
-              if component_template_object:
-                component_exists = False
-                for existing_component_template in index_template_object['index_template']['composed_of']:
-                  if existing_component_template == component_template:
-                    component_exists = True
-                if component_exists == False:
-                  index_template_object['index_template']['composed_of'] += [component_template]
+            ## One GET _component_template/a,b,c instead of one request per component
+            component_template_objects = elastic.get_component_templates(composed_of)
+            existing_component_templates = set(index_template_object['index_template'].get('composed_of', []))
+            index_template_object['index_template']['composed_of'] = index_template_object['index_template'].get('composed_of', []) + [
+              component_template for component_template in dict.fromkeys(composed_of)
+              if component_template in component_template_objects and component_template not in existing_component_templates]
         if template_priority:
           index_template_object['index_template']['priority'] = template_priority
         if data_stream:
@@ -169,12 +172,59 @@ def main():
           index_template_object['index_template']['template'] = template
         if index_priority:
           index_template_object['priority'] = index_priority
-        updated_index_template_object = elastic.update_index_template(index_template_name, index_template_object['index_template'])
-        results['updated_index_template_object'] = updated_index_template_object
-        results['index_template_status'] = "Index Template Updated"
+        index_template_update = elastic.update_index_template(index_template_name, index_template_object['index_template'],
+                                                              live_template = live_index_template, check_mode = module.check_mode)
+        results['changed'] = index_template_update['changed']
+        results['index_template_differences'] = index_template_update['differences']
+        if index_template_update['changed']:
+          results['index_template_status'] = "Index Template Updated"
+        else:
+          results['index_template_status'] = "Index Template already up to date"
         
     
     results['updated_index_template_object'] = index_template_object
+    return results
+
+def main():
+
+    module_args=dict(   
+        host=dict(type='str'),
+        port=dict(type='int', default=12443),
+        username=dict(type='str', required=True),
+        password=dict(type='str', no_log=True, required=True),   
+        verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        deployment_info=dict(type='dict', default=None),
+        definitions=dict(type='list', elements='dict', options=dict(name=dict(type='str', required=True), body=dict(type='dict', required=True))),
+        definitions_dir=dict(type='path'),
+        definitions_concurrency=dict(type='int', default=8),
+        index_template=dict(type='str'),
+        state=dict(type='str', default='present'),
+        index_patterns=dict(type='list'),
+        index_patterns_action=dict(type='str', default='add'),
+        composed_of=dict(type='list'),
+        composed_of_action=dict(type='str', default='add'),
+        template_priority=dict(type='int', default=100),
+        index_priority=dict(type='int', default=100),
+        data_stream=dict(type='dict'),
+        template=dict(type='dict')
+    )
+    module_args.update(deployments_argument_spec())
+    argument_dependencies = []
+        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
+        #('alert-type', 'metrics_threshold', ('conditions'))
+    
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True,
+                           mutually_exclusive=[('definitions', 'index_template'), ('definitions_dir', 'index_template')] + DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
+
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Elastic, manage_index_template))
+
+    elastic = Elastic(module)
+    results.update(manage_index_template(module, elastic))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
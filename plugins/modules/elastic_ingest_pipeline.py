@@ -72,6 +72,7 @@ options:
 
 extends_documentation_fragment:
   - expedient.elastic.elastic_auth_options
+  - expedient.elastic.transport_options
 '''
 
 
@@ -121,6 +122,8 @@ def main():
     username=dict(type='str', required=True),
     password=dict(type='str', required=True, no_log=True),
     verify_ssl_cert=dict(type='bool', default=True),
+    pool_connections=dict(type='int', default=10),
+    pool_maxsize=dict(type='int', default=10),
     state=dict(type='str', default='present'),
     name=dict(type='str', required=True),
     description=dict(type='str', required=False),
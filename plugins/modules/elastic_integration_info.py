@@ -63,6 +63,10 @@ options:
       integration_title: Title or Label of intregration (seems to change between versions on occasion, but name does not)
       integration_name: Name of intregration
 
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.deployments_options
 '''
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
 
@@ -75,32 +79,23 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
-results = {}
-
-def main():
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
 
-    module_args=dict(   
-        host=dict(type='str',required=True),
-        port=dict(type='int', default=9243),
-        username=dict(type='str', required=True),
-        password=dict(type='str', no_log=True, required=True),   
-        verify_ssl_cert=dict(type='bool', default=True),
-        integration_title=dict(type='str'),
-        integration_name=dict(type='str'),
-        deployment_info=dict(type='dict', default=None)
-    )
-    argument_dependencies = []
-        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
-        #('alert-type', 'metrics_threshold', ('conditions'))
-    
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+results = {}
 
+def manage_integration_info(module, kibana):
+    results = {}
     results['changed'] = False
     
     integration_title = module.params.get('integration_title')
     integration_name = module.params.get('integration_name')
-  
-    kibana = Kibana(module)
       
     integration_object = kibana.check_integration(integration_title, integration_name)
     
@@ -116,7 +111,38 @@ def main():
       results['integration_status'] = "Integration Package NOT found"
     
     results['integration_object'] = integration_object
+    return results
+
+def main():
+
+    module_args=dict(   
+        host=dict(type='str',required=True),
+        port=dict(type='int', default=9243),
+        username=dict(type='str', required=True),
+        password=dict(type='str', no_log=True, required=True),   
+        verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
+        integration_title=dict(type='str'),
+        integration_name=dict(type='str'),
+        deployment_info=dict(type='dict', default=None)
+    )
+    module_args.update(deployments_argument_spec())
+    argument_dependencies = []
+        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
+        #('alert-type', 'metrics_threshold', ('conditions'))
     
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
+
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_integration_info))
+
+    kibana = Kibana(module)
+    results.update(manage_integration_info(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
@@ -60,6 +60,12 @@ options:
       version:
         description: Deployment Kibana Version
         type: str
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.space_fanout_options
+  - expedient.elastic.deployments_options
 '''
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
 #from ansible.module_utils.basic import *
@@ -73,8 +79,44 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
 
+def manage_kibana_settings(module, kibana):
+    results = {'changed': False}
+    space_id = module.params.get('space_id')
+    space_ids = module.params.get('space_ids')
+    new_settings = module.params.get('settings')
+    
+    if new_settings and space_ids:
+      results['spaces'] = kibana.run_in_spaces(
+        kibana.resolve_space_ids(space_ids),
+        lambda each_space: kibana.update_kibana_settings(new_settings, space_id = each_space, check_mode = module.check_mode),
+        max_workers = module.params.get('space_concurrency'))
+      results['kibana_settings_status'] = "Kibana Settings found"
+      results['changed'] = any(space_result.get('result', {}).get('changed') for space_result in results['spaces'].values())
+      results['failed_spaces'] = [each_space for each_space, space_result in results['spaces'].items() if space_result.get('failed')]
+      if results['failed_spaces']:
+        results['failed'] = True
+        results['msg'] = f"Kibana Settings could not be updated in spaces: {', '.join(results['failed_spaces'])}"
+    elif new_settings:
+      results['kibana_settings_status'] = "Kibana Settings found"
+      kibana_settings = kibana.update_kibana_settings(new_settings, space_id = space_id, check_mode = module.check_mode)
+      results['changed'] = kibana_settings['changed']
+      results['kibana_settings_object'] = kibana_settings
+    else:
+      results['kibana_settings_status'] = "Integration Package NOT found"
+      results['kibana_settings_object'] = ""
+    return results
+
 def main():
 
     module_args=dict(   
@@ -83,30 +125,30 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
         space_id=dict(type='str', default='default'),
+        space_ids=dict(type='list', elements='str'),
+        space_concurrency=dict(type='int', default=8),
         settings=dict(type='dict'),
-        deployment_info=dict(type='dict', default=None)
+        deployment_info=dict(type='dict', default=None),
     )
+    module_args.update(deployments_argument_spec())
     argument_dependencies = []
         #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
         #('alert-type', 'metrics_threshold', ('conditions'))
     
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
+
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_kibana_settings))
 
-    results['changed'] = False
-    
     kibana = Kibana(module)
-    space_id = module.params.get('space_id')
-    new_settings = module.params.get('settings')
-    
-    if new_settings:
-      results['kibana_settings_status'] = "Kibana Settings found"
-      kibana_settings = kibana.update_kibana_settings(new_settings, space_id = space_id)
-      results['kibana_settings_object'] = kibana_settings
-    else:
-      results['kibana_settings_status'] = "Integration Package NOT found"
-      results['kibana_settings_object'] = ""
-    
+    results.update(manage_kibana_settings(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
@@ -43,6 +43,8 @@ options:
 
 extends_documentation_fragment:
   - expedient.elastic.elastic_auth_options
+  - expedient.elastic.transport_options
+  - expedient.elastic.deployments_options
 '''
 
 
@@ -57,24 +59,17 @@ except:
 
 from ansible.module_utils.basic import AnsibleModule
 
-def main():
-  module_args=dict(
-    host=dict(type='str', required=True),
-    port=dict(type='int', default=12443),
-    username=dict(type='str', required=True),
-    password=dict(type='str', required=True, no_log=True),
-    verify_ssl_cert=dict(type='bool', default=True),
-    state=dict(type='str', default='present'),
-    pipeline_name=dict(type='str', required=False),
-    pipeline_object=dict(type='dict', default={}),
-    deployment_info=dict(type='dict', default=None)
-  )
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
 
+def manage_pipeline(module, elastic_inst):
   results = {'changed': False}
-
-  module = AnsibleModule(argument_spec=module_args, supports_check_mode=False)
-  
-  elastic_inst = Elastic(module)
   state = module.params.get('state')
   pipeline_name = module.params.get('pipeline_name')
   pipeline_object = module.params.get('pipeline_object')
@@ -96,6 +91,36 @@ def main():
       results['msg'] = f'pipeline {pipeline_name} does not exist'
     results['operation_result'] = elastic_inst.delete_ingest_pipeline(pipeline_name)
     module.exit_json(**results)
+  return results
+
+def main():
+  module_args=dict(
+    host=dict(type='str', required=True),
+    port=dict(type='int', default=12443),
+    username=dict(type='str', required=True),
+    password=dict(type='str', required=True, no_log=True),
+    verify_ssl_cert=dict(type='bool', default=True),
+    pool_connections=dict(type='int', default=10),
+    pool_maxsize=dict(type='int', default=10),
+    state=dict(type='str', default='present'),
+    pipeline_name=dict(type='str', required=False),
+    pipeline_object=dict(type='dict', default={}),
+    deployment_info=dict(type='dict', default=None)
+  )
+  module_args.update(deployments_argument_spec())
+
+  results = {'changed': False}
+
+  module = AnsibleModule(argument_spec=module_args, supports_check_mode=False, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
+  
+  if module.params.get('deployments'):
+    exit_with_deployment_results(module, run_on_deployments(module, Elastic, manage_pipeline))
+
+  elastic_inst = Elastic(module)
+  results.update(manage_pipeline(module, elastic_inst))
+  if results.get('failed'):
+    module.fail_json(**results)
+  module.exit_json(**results)
 
 if __name__ == '__main__':
   main()
\ No newline at end of file
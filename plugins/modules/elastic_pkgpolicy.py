@@ -68,11 +68,17 @@ options:
       integration_name: Integration Name 
       integration_ver: Integration Version. The version will determine what integration settings are valid
       namespace: Elastic namespace, always default for now (Optional)
-      integration_settings: Integration settings (Optional)
-      
+      integration_settings: Integration settings (Optional), the keys given for each input and stream are applied onto the existing ones matched by type and dataset
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.epr_cache_options
+  - expedient.elastic.deployments_options
 '''
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
 #from ansible.module_utils.basic import *
+from copy import deepcopy
 
 try:
   from ansible_collections.expedient.elastic.plugins.module_utils.kibana import Kibana
@@ -83,92 +89,27 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
-results = {}
-
-def deep_update(original, updated):
-    """
-    Attempts to update deeply nested dictionaries + lists
-    :param original/the object to be updated:
-    :param updated/changes to be applied:
-    :return:
-    """
-
-    def match_shallow_structure(dictionary_1, dictionary_2):
-        """
-        utility function to check if all the non-dictionary keys and values in a
-        dictionary match those of the other
-        :param dictionary_1:
-        :param dictionary_2:
-        :return:
-        """
-        shallow_1 = {
-            key: value for key, value in dictionary_1.items() if
-            not isinstance(value, dict)
-        }
-        shallow_2 = {
-            key: value for key, value in dictionary_2.items() if
-            not isinstance(value, dict)
-        }
-        return shallow_1 == shallow_2
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.pkg_policy_diff import PkgPolicyDiff
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from pkg_policy_diff import PkgPolicyDiff
 
-    if isinstance(updated, dict):
-        for key, value in updated.items():
-            if (isinstance(value, dict) or isinstance(value, list)) and original.get(
-                key
-            ) is not None:
-                deep_update(original.get(key), updated[key])
-            else:
-                original.update({key: updated[key]})
-    elif isinstance(updated, list) and isinstance(original, list):
-        if all([isinstance(item, dict) for item in updated]):
-            for updated_dictionary_list_item in updated:
-                try:
-                    deep_update(
-                        next(
-                            original_dictionary_list_item
-                            for original_dictionary_list_item in original
-                            if match_shallow_structure(
-                                updated_dictionary_list_item,
-                                original_dictionary_list_item,
-                            )
-                        ),
-                        updated_dictionary_list_item,
-                    )
-                except StopIteration:
-                    original.append(updated_dictionary_list_item)
-        else:
-            original += [i for i in updated if i not in original]
-    return
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
 
-def main():
+results = {}
 
-    module_args=dict(   
-        host=dict(type='str',required=True),
-        port=dict(type='int', default=9243),
-        username=dict(type='str', required=True),
-        password=dict(type='str', no_log=True, required=True),   
-        verify_ssl_cert=dict(type='bool', default=True),
-        agent_policy_id=dict(type='str'),
-        agent_policy_name=dict(type='str'),
-        integration_title=dict(type='str', required=True),
-        integration_ver=dict(type='str'),
-        integration_name=dict(type='str'),
-        pkg_policy_name=dict(type='str', required=True),
-        pkg_policy_desc=dict(type='str'),
-        namespace=dict(type='str', default='default'),
-        state=dict(type='str', default='present'),
-        integration_settings=dict(type='dict'),
-        deployment_info=dict(type='dict', default=None)
-    )
-    argument_dependencies = []
-        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
-        #('alert-type', 'metrics_threshold', ('conditions'))
-    
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True,
-                            mutually_exclusive=[('agent_policy_name', 'agent_policy_id')],
-                            required_one_of=[('agent_policy_name', 'agent_policy_id')],
-                            required_together=[('integration_ver','integration_name')])
-    
+def manage_pkg_policy(module, kibana):
     state = module.params.get('state')
     agent_policy_name = module.params.get('agent_policy_name')
     agent_policy_id = module.params.get('agent_policy_id')
@@ -178,14 +119,15 @@ def main():
     pkg_policy_name = module.params.get('pkg_policy_name')
     pkg_policy_desc = module.params.get('pkg_policy_desc')
     namespace = module.params.get('namespace')
-    integration_settings = module.params.get('integration_settings') # inputs policy settings only, aka Defaults
+    # inputs policy settings only, aka Defaults. Copied because the inputs are amended per policy and the same
+    # module params are shared by every deployment when running on several at once
+    integration_settings = deepcopy(module.params.get('integration_settings'))
     
+    results = {}
     if module.check_mode:
         results['changed'] = False
     else:
         results['changed'] = True
-
-    kibana = Kibana(module)
     
     if module.params.get('agent_policy_id'):
       agency_policy_object = kibana.get_agent_policy_byid(agent_policy_id)
@@ -197,14 +139,14 @@ def main():
     except:
       results['agent_policy_status'] = "Agent Policy was not found. Cannot continue without valid Agent Policy Name or ID"
       results['changed'] = False
-      module.exit_json(**results)
+      return results
     
     if module.params.get('integration_title'):
       integration_object = kibana.check_integration(integration_title)
     else:
       results['integration_status'] = "No Integration Name provided to get the integration object"
       results['changed'] = False
-      module.exit_json(**results)
+      return results
     
     if ( integration_name and integration_ver and integration_name) and not integration_object:
       results['integration_status'] = "No integration found, but Integration Name, Version, and Title found"
@@ -216,7 +158,7 @@ def main():
     elif not integration_object and not ( integration_title and integration_ver and integration_name):
       results['integration_status'] = 'Integration Title is not valid and integration name and integration version are not found'
       results['changed'] = False
-      module.exit_json(**results) 
+      return results 
     
     if state == "present":
       pkg_policy_object = kibana.get_pkg_policy(pkg_policy_name)
@@ -240,34 +182,63 @@ def main():
           results['changed'] = False
 
     if integration_settings and pkg_policy_object:
-      input_no = 0
-      for orig_input in pkg_policy_object['inputs']:
-        for update_input in integration_settings['inputs']:
-          if orig_input['type'] == update_input['type']:
-            if 'config' in orig_input:
-              if 'artifact_manifest' in orig_input['config']:
-                integration_settings['inputs'][input_no]['config']['artifact_manifest'] = orig_input['config']['artifact_manifest']
-        input_no = input_no + 1
-      pkg_policy_object['inputs'] = integration_settings['inputs']
-      pkg_policy_object_id = pkg_policy_object['id']  
-      
+      pkg_policy_diff = PkgPolicyDiff(pkg_policy_object)
+      pkg_policy_diff.overlay_inputs(integration_settings['inputs'])
       results['passed_integration_settings'] = integration_settings
+      results['pkg_policy_changes'] = pkg_policy_diff.get_changes()
       
-      '''  
-    for current_setting in integration_settings:
-        if current_setting == 'inputs':
-          for new_entry in integration_settings[current_setting]:
-            a = 0
-            for exist_entry in pkg_policy_object[current_setting]:
-              if new_entry['type'] == exist_entry['type']:
-                  #pkg_policy_object[current_setting][a]['config']['policy'] = new_entry['config']['policy']
-                  deep_update(pkg_policy_object['inputs'][a], integration_settings['inputs'][a])        
-              a = a +1
-      '''
-      
-      pkg_policy_info = kibana.update_pkg_policy(pkg_policy_object_id, pkg_policy_object)
-      results['pkg_policy_object_update'] = pkg_policy_info
+      if pkg_policy_diff.changed:
+        if module.check_mode:
+          results['pkg_policy_object_update'] = "Package Policy differs from the requested settings, no update sent because check_mode is set to true"
+        else:
+          results['pkg_policy_object_update'] = kibana.update_pkg_policy(pkg_policy_object['id'], pkg_policy_object)
+        results['changed'] = True
+      else:
+        results['pkg_policy_object_update'] = "Package Policy already has the requested settings, no update sent"
 
+    return results
+
+def main():
+
+    module_args=dict(   
+        host=dict(type='str',required=True),
+        port=dict(type='int', default=9243),
+        username=dict(type='str', required=True),
+        password=dict(type='str', no_log=True, required=True),   
+        verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
+        epr_revalidate_after=dict(type='int', default=86400),
+        epr_offline=dict(type='bool', default=False),
+        agent_policy_id=dict(type='str'),
+        agent_policy_name=dict(type='str'),
+        integration_title=dict(type='str', required=True),
+        integration_ver=dict(type='str'),
+        integration_name=dict(type='str'),
+        pkg_policy_name=dict(type='str', required=True),
+        pkg_policy_desc=dict(type='str'),
+        namespace=dict(type='str', default='default'),
+        state=dict(type='str', default='present'),
+        integration_settings=dict(type='dict'),
+        deployment_info=dict(type='dict', default=None),
+    )
+    module_args.update(deployments_argument_spec())
+    argument_dependencies = []
+        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
+        #('alert-type', 'metrics_threshold', ('conditions'))
+    
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True,
+                            mutually_exclusive=[('agent_policy_name', 'agent_policy_id')] + DEPLOYMENTS_MUTUALLY_EXCLUSIVE,
+                            required_one_of=[('agent_policy_name', 'agent_policy_id')],
+                            required_together=[('integration_ver','integration_name')])
+    
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_pkg_policy))
+
+    kibana = Kibana(module)
+    results.update(manage_pkg_policy(module, kibana))
     module.exit_json(**results)
 
 if __name__ == "__main__":
@@ -61,6 +61,11 @@ options:
         description: Deployment Kibana Version
         type: str
       pkg_policy_name: Package Policy name
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.deployments_options
 '''
 
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
@@ -75,8 +80,33 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
 
+def manage_pkgpolicy_info(module, kibana):
+    results = {}
+    results['changed'] = False
+    pkg_policy_name = module.params.get('pkg_policy_name')
+    
+    pkg_policy_object = kibana.get_pkg_policy(pkg_policy_name)
+    
+    if pkg_policy_object:
+      results['pkg_policy_status'] = "Integration Package found"
+      results['pkg_policy_object'] = pkg_policy_object
+    else:
+      results['pkg_policy_status'] = "Integration Package NOT found"
+    
+    results['pkg_policy_object'] = pkg_policy_object
+    return results
+
 def main():
 
     module_args=dict(   
@@ -85,30 +115,27 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
         pkg_policy_name=dict(type='str'),
         deployment_info=dict(type='dict', default=None)
     )
+    module_args.update(deployments_argument_spec())
     argument_dependencies = []
         #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
         #('alert-type', 'metrics_threshold', ('conditions'))
     
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
+
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_pkgpolicy_info))
 
-    results['changed'] = False
-    
     kibana = Kibana(module)
-    pkg_policy_name = module.params.get('pkg_policy_name')
-    
-    pkg_policy_object = kibana.get_pkg_policy(pkg_policy_name)
-    
-    if pkg_policy_object:
-      results['pkg_policy_status'] = "Integration Package found"
-      results['pkg_policy_object'] = pkg_policy_object
-    else:
-      results['pkg_policy_status'] = "Integration Package NOT found"
-    
-    results['pkg_policy_object'] = pkg_policy_object
-    
+    results.update(manage_pkgpolicy_info(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
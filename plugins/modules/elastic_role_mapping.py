@@ -88,7 +88,10 @@ options:
       groups:
         description: User Group
         type: str
-  
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.deployments_options
 '''
 
 try:
@@ -103,9 +106,18 @@ except:
 from ansible.module_utils.basic import AnsibleModule
 
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 class ElasticRoleMapping(Elastic):
-  def __init__(self, module):
-    super().__init__(module)
+  def __init__(self, module, deployment_info = None, ece_auth = None):
+    super().__init__(module, deployment_info = deployment_info, ece_auth = ece_auth)
     self.role_mapping_name = self.module.params.get('name')
     self.enabled = self.module.params.get('enabled')
     self.roles = self.module.params.get('roles')
@@ -127,6 +139,16 @@ class ElasticRoleMapping(Elastic):
 
 
 
+def manage_role_mapping(module, role_mapping):
+  results = {'changed': False}
+  state = module.params.get('state')
+
+  if state == 'present':
+    if role_mapping.role_mapping:
+      results['msg'] = f'role mapping {role_mapping.role_mapping_name} exists'
+      module.exit_json(**results)
+  return results
+
 def main():
   module_args=dict(
     host=dict(type='str'),
@@ -134,6 +156,8 @@ def main():
     username=dict(type='str', required=True),
     password=dict(type='str', required=True, no_log=True),
     verify_ssl_cert=dict(type='bool', default=True),
+    pool_connections=dict(type='int', default=10),
+    pool_maxsize=dict(type='int', default=10),
     state=dict(type='str', default='present'),
     name=dict(type='str', required=True),
     enabled=dict(type='bool', default=True),
@@ -142,17 +166,20 @@ def main():
     metadata=dict(type='dict', default={}),
     deployment_info=dict(type='dict')
   )
+  module_args.update(deployments_argument_spec())
 
   results = {'changed': False}
 
-  module = AnsibleModule(argument_spec=module_args, supports_check_mode=False)
-  state = module.params.get('state')
-  role_mapping = ElasticRoleMapping(module)
+  module = AnsibleModule(argument_spec=module_args, supports_check_mode=False, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
 
-  if state == 'present':
-    if role_mapping.role_mapping:
-      results['msg'] = f'role mapping {role_mapping.role_mapping_name} exists'
-      module.exit_json(**results)
+  if module.params.get('deployments'):
+    exit_with_deployment_results(module, run_on_deployments(module, ElasticRoleMapping, manage_role_mapping))
+
+  role_mapping = ElasticRoleMapping(module)
+  results.update(manage_role_mapping(module, role_mapping))
+  if results.get('failed'):
+    module.fail_json(**results)
+  module.exit_json(**results)
     
 
 
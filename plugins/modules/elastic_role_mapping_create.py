@@ -79,7 +79,10 @@ options:
       groups:
         description: User Group
         type: str
-      
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.deployments_options
 '''
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
 
@@ -92,10 +95,37 @@ except:
   sys.path.append(util_path)
   from elastic import Elastic
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
                 
 import json
 
+def manage_role_mapping_create(module, elastic):
+    results = {}
+    results['changed'] = False
+    role_mapping_name = module.params.get('role_mapping_name')
+    enable_mapping = module.params.get('enable_mapping')
+    assigned_roles = module.params.get('assigned_roles')
+    role_mapping_rules = module.params.get('role_mapping_rules')
+    metadata = module.params.get('metadata')
+    state = module.params.get('state')
+    
+    if role_mapping_name and state == "present":
+      
+      role_mapping_object = elastic.create_role_mapping(role_mapping_name, assigned_roles, role_mapping_rules, metadata, enable_mapping)
+      results['userrole_status'] = "Role Mapping Created"
+        
+    results['role_mapping_object'] = role_mapping_object
+    return results
+
 def main():
 
     module_args=dict(    
@@ -104,6 +134,8 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
         role_mapping_name=dict(type='str', required=True),
         enable_mapping=dict(type='bool', default=True),
         assigned_roles=dict(type='list', required=True),
@@ -112,30 +144,21 @@ def main():
         state=dict(type='str', default='present'),
         deployment_info=dict(type='dict', default=None)
     )
+    module_args.update(deployments_argument_spec())
     
     argument_dependencies = []
         #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
         #('alert-type', 'metrics_threshold', ('conditions'))
     
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True
-                            )
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
     
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Elastic, manage_role_mapping_create))
+
     elastic = Elastic(module)
-    results['changed'] = False
-    role_mapping_name = module.params.get('role_mapping_name')
-    enable_mapping = module.params.get('enable_mapping')
-    assigned_roles = module.params.get('assigned_roles')
-    role_mapping_rules = module.params.get('role_mapping_rules')
-    metadata = module.params.get('metadata')
-    state = module.params.get('state')
-    
-    if role_mapping_name and state == "present":
-      
-      role_mapping_object = elastic.create_role_mapping(role_mapping_name, assigned_roles, role_mapping_rules, metadata, enable_mapping)
-      results['userrole_status'] = "Role Mapping Created"
-        
-    results['role_mapping_object'] = role_mapping_object
-    
+    results.update(manage_role_mapping_create(module, elastic))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
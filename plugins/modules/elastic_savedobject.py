@@ -68,6 +68,14 @@ options:
       space_id: Space to search for the Saved Object List or create the Saved Object in
       overwrite: True/False When Importing, if a Saved Object is found with the same ID whether or not to overwrite that object
       createNewCopies: True/False When Importing, Whether or not to create a new copy
+      bulk_batch_size: Number of Saved Objects deleted per _bulk_delete request when deleting
+      export_file: Path to stream the export of the Saved Object found by object_name or object_id to, as NDJSON. saved_object is then not returned, only export_file and exported_count
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.space_fanout_options
+  - expedient.elastic.deployments_options
 '''
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
 
@@ -80,48 +88,30 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
                 
 import json
 
-def main():
-
-    module_args=dict(    
-        host=dict(type='str',required=True),
-        port=dict(type='int', default=9243),
-        username=dict(type='str', required=True),
-        password=dict(type='str', no_log=True, required=True),   
-        verify_ssl_cert=dict(type='bool', default=True),
-        object_name=dict(type='str'),
-        object_id=dict(type='str', default=None),
-        object_type=dict(type='str'),
-        search_string=dict(type='str'),
-        object_attributes=dict(type='str'),
-        space_id=dict(type='str', default="default"),
-        overwrite=dict(type='bool', default=True),
-        deployment_info=dict(type='dict', default=None),
-        createNewCopies=dict(type='bool', default=False),
-        state=dict(type='str', default='present')
-    )
-    
-    argument_dependencies = []
-        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
-        #('alert-type', 'metrics_threshold', ('conditions'))
-    
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True
-                            ,mutually_exclusive=[(('object_name','search_string'),'object_attributes')]
-                            ,required_one_of=[('object_name','search_string','object_attributes','object_id')]
-                            )
-    
-    kibana = Kibana(module)
-    results['changed'] = False
+def manage_saved_object(module, kibana, space_id, export_file = None):
+    """
+    Runs the requested saved object operation in one space and returns that space's results
+    """
+    results = {'changed': False}
     object_name = module.params.get('object_name')
     object_id = module.params.get('object_id')
     search_string = module.params.get('search_string')
     object_attributes = module.params.get('object_attributes')
     overwrite = module.params.get('overwrite')
     createNewCopies = module.params.get('createNewCopies')
-    space_id = module.params.get('space_id')
     object_type = module.params.get('object_type')
     state = module.params.get('state')
 
@@ -133,6 +123,15 @@ def main():
         object_id = object_id, 
         object_name = object_name, 
         space_id = space_id)
+      if export_file:
+        results['exported_count'] = kibana.export_saved_object(
+          object_type = object_type, 
+          object_id = saved_object_info['id'], 
+          space_id = space_id,
+          export_file = export_file)
+        results['object_status'] = "Saved Object exported"
+        results['export_file'] = export_file
+        return results
       saved_object = kibana.export_saved_object(
         object_type = object_type, 
         object_id = saved_object_info['id'], 
@@ -165,29 +164,28 @@ def main():
         object_attributes = object_attributes)
 
     if (object_name or object_id) and state == "delete":
+      # Names are resolved with one _find and everything is deleted through _bulk_delete, bulk_batch_size at a time
+      object_ids = []
       if object_name != None and object_name != '': 
-        object_name_list = object_name.split(",")
-        for each_dashboard in object_name_list:
-          saved_object_info = kibana.get_saved_object(
-            object_type = object_type, 
-            object_name = each_dashboard, 
-            space_id = space_id)
-          if saved_object_info != {}:
-            saved_object_id = saved_object_info['id']
-            saved_object = kibana.delete_saved_object(
-              object_type = object_type, 
-              object_id = saved_object_id, 
-              space_id = space_id)
+        object_name_list = [each_dashboard for each_dashboard in object_name.split(",") if each_dashboard != '']
+        resolved_names = kibana.resolve_saved_object_names(object_type, object_name_list, space_id = space_id)
+        results['not_found'] = [each_dashboard for each_dashboard in object_name_list if each_dashboard not in resolved_names]
+        object_ids.extend(resolved_names[each_dashboard] for each_dashboard in object_name_list if each_dashboard in resolved_names)
 
       if object_id != None and object_id != '':      
-        object_id_list = object_id.split(",")
-        for each_dashboard in object_id_list:
-          if each_dashboard != '':
-            saved_object = kibana.delete_saved_object(
-              object_type = object_type, 
-              object_id = each_dashboard, 
-              space_id = space_id)
+        object_ids.extend(each_dashboard for each_dashboard in object_id.split(",") if each_dashboard != '')
 
+      object_ids = list(dict.fromkeys(object_ids))
+      if object_ids and not module.check_mode:
+        saved_object = kibana.bulk_delete_saved_objects(
+          object_type = object_type,
+          object_ids = object_ids,
+          space_id = space_id,
+          batch_size = module.params.get('bulk_batch_size'))
+        results['changed'] = any(status.get('success') for status in saved_object)
+      elif object_ids:
+        results['changed'] = True
+        saved_object = [{'id': each_dashboard, 'type': object_type} for each_dashboard in object_ids]
 
     if saved_object != "":
       results['object_status'] = "Saved Object Found"
@@ -196,6 +194,80 @@ def main():
       results['object_status'] = "No Saved Object was returned, check your Saved Object Info"
       results['saved_object'] = None
       
+    return results
+
+def manage_saved_objects(module, kibana):
+    results = {}
+    results['changed'] = False
+    space_id = module.params.get('space_id')
+    space_ids = module.params.get('space_ids')
+    export_file = module.params.get('export_file')
+
+    if space_ids:
+      if export_file and '{space_id}' not in export_file:
+        module.fail_json(msg="export_file must contain {space_id} when space_ids is set, so each space is exported to its own file")
+      results['spaces'] = kibana.run_in_spaces(
+        kibana.resolve_space_ids(space_ids),
+        lambda each_space: manage_saved_object(
+          module,
+          kibana,
+          each_space,
+          export_file = export_file.replace('{space_id}', each_space) if export_file else None),
+        max_workers = module.params.get('space_concurrency'))
+      results['changed'] = any(space_result.get('result', {}).get('changed') for space_result in results['spaces'].values())
+      results['failed_spaces'] = [each_space for each_space, space_result in results['spaces'].items() if space_result.get('failed')]
+      if results['failed_spaces']:
+        module.fail_json(msg=f"Saved Object operation failed in spaces: {', '.join(results['failed_spaces'])}", **results)
+      module.exit_json(**results)
+
+    results.update(manage_saved_object(module, kibana, space_id, export_file = export_file))
+    return results
+
+def main():
+
+    module_args=dict(    
+        host=dict(type='str',required=True),
+        port=dict(type='int', default=9243),
+        username=dict(type='str', required=True),
+        password=dict(type='str', no_log=True, required=True),   
+        verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
+        object_name=dict(type='str'),
+        object_id=dict(type='str', default=None),
+        object_type=dict(type='str'),
+        search_string=dict(type='str'),
+        object_attributes=dict(type='str'),
+        space_id=dict(type='str', default="default"),
+        space_ids=dict(type='list', elements='str'),
+        space_concurrency=dict(type='int', default=8),
+        overwrite=dict(type='bool', default=True),
+        deployment_info=dict(type='dict', default=None),
+        createNewCopies=dict(type='bool', default=False),
+        export_file=dict(type='str', default=None),
+        bulk_batch_size=dict(type='int', default=100),
+        state=dict(type='str', default='present')
+    )
+    module_args.update(deployments_argument_spec())
+    
+    argument_dependencies = []
+        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
+        #('alert-type', 'metrics_threshold', ('conditions'))
+    
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True
+                            ,mutually_exclusive=[(('object_name','search_string'),'object_attributes')] + DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+                            ,required_one_of=[('object_name','search_string','object_attributes','object_id')]
+                            )
+    
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_saved_objects))
+
+    kibana = Kibana(module)
+    results.update(manage_saved_objects(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
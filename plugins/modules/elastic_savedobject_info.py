@@ -60,10 +60,31 @@ options:
       version:
         description: Deployment Kibana Version
         type: str
-      object_name: Saved Object name (Required)
-      object_type: Type of Object
+      object_name: Saved Object name (Required if objects is not present)
+      object_type: Type of Object (Required with object_name)
       space_id: Name of Space the Object is in
-      
+  objects:
+    description:
+    - Saved Objects to look up together instead of object_name, each with type and either id or name
+    - Ids are fetched with _bulk_get and names with one combined _find, results are returned in saved_objects in the same order
+    type: list
+    elements: dict
+    suboptions:
+      type:
+        description: Type of Object
+        type: str
+        required: true
+      id:
+        description: Saved Object id
+        type: str
+      name:
+        description: Saved Object name, used when id is not given
+        type: str
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.deployments_options
 '''
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
 
@@ -76,10 +97,49 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
                 
 import json
 
+def manage_savedobject_info(module, kibana):
+    results = {}
+    results['changed'] = False
+    object_name = module.params.get('object_name')
+    object_type = module.params.get('object_type')
+    space_id = module.params.get('space_id')
+    objects = module.params.get('objects')
+
+    if objects:
+      saved_objects = kibana.get_saved_objects(objects, space_id = space_id)
+      results['saved_objects'] = saved_objects
+      results['not_found'] = [saved_object for saved_object, found_object in zip(objects, saved_objects) if found_object is None]
+      if results['not_found']:
+        results['object_status'] = f"{len(results['not_found'])} of {len(objects)} Saved Objects were not found"
+      else:
+        results['object_status'] = "Saved Objects Found"
+      module.exit_json(**results)
+
+    saved_object = None
+    if module.params.get('object_name'):
+      saved_object = kibana.get_saved_object(object_type, object_name, space_id = space_id)
+      
+    if saved_object:
+      results['object_status'] = "Saved Object Found"
+      results['saved_object'] = saved_object
+    else:
+      results['object_status'] = "No Saved Object was returned, check your Saved Object Name"
+      results['saved_object'] = None
+    return results
+
 def main():
 
     module_args=dict(    
@@ -88,37 +148,36 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
-        object_name=dict(type='str', required=True),
-        object_type=dict(type='str', required=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
+        object_name=dict(type='str'),
+        object_type=dict(type='str'),
+        objects=dict(type='list', elements='dict', options=dict(type=dict(type='str', required=True), id=dict(type='str'), name=dict(type='str')),
+                     required_one_of=[('id', 'name')]),
         space_id=dict(type='str', default='default'),
         deployment_info=dict(type='dict', default=None),
     )
+    module_args.update(deployments_argument_spec())
     
     argument_dependencies = []
         #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
         #('alert-type', 'metrics_threshold', ('conditions'))
     
     module = AnsibleModule(argument_spec=module_args, supports_check_mode=True
-                            #,mutually_exclusive=[('agent_policy_name', 'agent_policy_id')],
-                            #required_one_of=[('agent_policy_name', 'agent_policy_id')]
+                            ,mutually_exclusive=[('object_name', 'objects')] + DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+                            ,required_one_of=[('object_name', 'objects')]
+                            ,required_together=[('object_name', 'object_type')]
                             )
     
-    kibana = Kibana(module)
-    results['changed'] = False
-    object_name = module.params.get('object_name')
-    object_type = module.params.get('object_type')
-    space_id = module.params.get('space_id')
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_savedobject_info))
 
-    if module.params.get('object_name'):
-      saved_object = kibana.get_saved_object(object_type, object_name, space_id = space_id)
-      
-    if saved_object:
-      results['object_status'] = "Saved Object Found"
-      results['saved_object'] = saved_object
-    else:
-      results['object_status'] = "No Saved Object was returned, check your Saved Object Name"
-      results['saved_object'] = None
-      
+    kibana = Kibana(module)
+    results.update(manage_savedobject_info(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
@@ -25,33 +25,19 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
                 
-def main():
-
-    module_args=dict(    
-        host=dict(type='str',required=True),
-        port=dict(type='int', default=9243),
-        username=dict(type='str', required=True),
-        password=dict(type='str', no_log=True, required=True),   
-        verify_ssl_cert=dict(type='bool', default=True),
-        connector_name=dict(type='str', required=True),
-        rule_name=dict(type='str', required=True),
-        action_body=dict(type='str'),
-        action_group=dict(type='str'),
-        replace_or_append=dict(type='str'),
-        state=dict(type='str', default='present'),
-        #existing_actions=dict(type='str'),
-        deployment_info=dict(type='dict', default=None)
-    ) 
-    
-    argument_dependencies = []
-        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
-        #('alert-type', 'metrics_threshold', ('conditions'))
-    
-    module = AnsibleModule(argument_spec=module_args, required_if=argument_dependencies, supports_check_mode=True,
-                            required_together=[['action_body', 'action_group', 'replace_or_append']])
-    kibana = Kibana(module)
+def manage_security_rule(module, kibana):
+    results = {}
     results['changed'] = True
     connector_name = module.params.get('connector_name')
     rule_name = module.params.get('rule_name')
@@ -96,7 +82,45 @@ def main():
       )
       results['rule_action_status'] = "Created Rule Action Connector"
       results['rule_action_object'] = rule_action_object
-      
+    return results
+
+def main():
+
+    module_args=dict(    
+        host=dict(type='str',required=True),
+        port=dict(type='int', default=9243),
+        username=dict(type='str', required=True),
+        password=dict(type='str', no_log=True, required=True),   
+        verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
+        connector_name=dict(type='str', required=True),
+        rule_name=dict(type='str', required=True),
+        action_body=dict(type='str'),
+        action_group=dict(type='str'),
+        replace_or_append=dict(type='str'),
+        state=dict(type='str', default='present'),
+        #existing_actions=dict(type='str'),
+        deployment_info=dict(type='dict', default=None)
+    ) 
+    module_args.update(deployments_argument_spec())
+    
+    argument_dependencies = []
+        #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
+        #('alert-type', 'metrics_threshold', ('conditions'))
+    
+    module = AnsibleModule(argument_spec=module_args, required_if=argument_dependencies, supports_check_mode=True,
+                            required_together=[['action_body', 'action_group', 'replace_or_append']], mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
+
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_security_rule))
+
+    kibana = Kibana(module)
+    results.update(manage_security_rule(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
@@ -73,6 +73,10 @@ options:
       description:
         - elastic var value
       required: true
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.deployments_options
 '''
 
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
@@ -87,8 +91,33 @@ except:
   sys.path.append(util_path)
   from elastic import Elastic
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
 
+def manage_settings(module, elastic):
+    results = {'changed': False}
+    elastic_settings = module.params.get('elastic_settings')
+    
+    body = {
+      "persistent": {},
+      "transient": {}
+    }
+    for elastic_setting in elastic_settings:
+      body[elastic_setting['state']][elastic_setting['var']] = elastic_setting['value']
+    
+    elastic_settings_object = elastic.update_settings(body)
+  
+    results['elastic_settings_object'] = elastic_settings_object
+    return results
+
 def main():
 
     elastic_settings_spec=dict(
@@ -103,30 +132,23 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
         deployment_info=dict(type='dict', default=None),
         elastic_settings=dict(type='list', required=False, elements='dict', options=elastic_settings_spec)
     )
+    module_args.update(deployments_argument_spec())
     argument_dependencies = []
         #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
         #('alert-type', 'metrics_threshold', ('conditions'))
     
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
+
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Elastic, manage_settings))
 
-    results['changed'] = False
-    elastic_settings = module.params.get('elastic_settings')
-    
     elastic = Elastic(module)
-    body = {
-      "persistent": {},
-      "transient": {}
-    }
-    for elastic_setting in elastic_settings:
-      body[elastic_setting['state']][elastic_setting['var']] = elastic_setting['value']
-    
-    elastic_settings_object = elastic.update_settings(body)
-  
-    results['elastic_settings_object'] = elastic_settings_object
-    
+    results.update(manage_settings(module, elastic))
     module.exit_json(**results)
 
 if __name__ == "__main__":
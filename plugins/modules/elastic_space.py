@@ -66,6 +66,11 @@ options:
       disabledFeatures: List of Features to be disabled within this space
       initials: Initials of Space
       color: Color of Space Icon Background
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.deployments_options
 '''
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
 
@@ -78,8 +83,44 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
                 
+def manage_space(module, kibana):
+    results = {}
+    results['changed'] = False
+    space_name = module.params.get('space_name')
+    space_description = module.params.get('space_description')
+    space_id = module.params.get('space_id')
+    disabledFeatures = module.params.get('disabledFeatures')
+    initials = module.params.get('initials')
+    color = module.params.get('color')
+    imageUrl = module.params.get('imageUrl')
+    state = module.params.get('state')
+    
+    space_object = None
+    
+    if space_id and state == "present":
+      
+      space_object = kibana.get_space(space_id)
+      results['space_status'] = "Space Object Found"
+      
+      if space_object == None:
+        space_object = kibana.create_space(space_id, space_name, space_description, disabledFeatures, initials, color, imageUrl)
+        results['space_status'] = "Space Object Created"
+      else:
+        space_object = kibana.update_space(space_id, space_name, space_description, disabledFeatures, initials, color, imageUrl)
+        results['space_status'] = "Space Object Updated"
+    return results
+
 def main():
 
     module_args=dict(    
@@ -88,6 +129,10 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
         space_name=dict(type='str', required=True),
         space_description=dict(type='str', default="None"),
         space_id=dict(type='str', required=True),
@@ -98,39 +143,21 @@ def main():
         deployment_info=dict(type='dict', default=None),
         state=dict(type='str', default='present')
     )
+    module_args.update(deployments_argument_spec())
     
     argument_dependencies = []
         #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
         #('alert-type', 'metrics_threshold', ('conditions'))
     
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True
-                            )
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
     
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_space))
+
     kibana = Kibana(module)
-    results['changed'] = False
-    space_name = module.params.get('space_name')
-    space_description = module.params.get('space_description')
-    space_id = module.params.get('space_id')
-    disabledFeatures = module.params.get('disabledFeatures')
-    initials = module.params.get('initials')
-    color = module.params.get('color')
-    imageUrl = module.params.get('imageUrl')
-    state = module.params.get('state')
-    
-    space_object = None
-    
-    if space_id and state == "present":
-      
-      space_object = kibana.get_space(space_id)
-      results['space_status'] = "Space Object Found"
-      
-      if space_object == None:
-        space_object = kibana.create_space(space_id, space_name, space_description, disabledFeatures, initials, color, imageUrl)
-        results['space_status'] = "Space Object Created"
-      else:
-        space_object = kibana.update_space(space_id, space_name, space_description, disabledFeatures, initials, color, imageUrl)
-        results['space_status'] = "Space Object Updated"
-        
+    results.update(manage_space(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
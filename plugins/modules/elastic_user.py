@@ -88,6 +88,8 @@ options:
 
 extends_documentation_fragment:
   - expedient.elastic.elastic_auth_options
+  - expedient.elastic.transport_options
+  - expedient.elastic.deployments_options
 '''
 
 
@@ -104,9 +106,18 @@ except:
 from ansible.module_utils.basic import AnsibleModule
 
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 class ElasticUser(Elastic):
-  def __init__(self, module):
-    super().__init__(module)
+  def __init__(self, module, deployment_info = None, ece_auth = None):
+    super().__init__(module, deployment_info = deployment_info, ece_auth = ece_auth)
     self.elastic_username = self.module.params.get('elastic_user')
     self.elastic_password = self.module.params.get('elastic_password')
     self.roles = self.module.params.get('roles')
@@ -138,6 +149,24 @@ class ElasticUser(Elastic):
 
 
 
+def manage_user(module, elastic_user):
+  results = {'changed': False}
+  state = module.params.get('state')
+
+  if state == 'present':
+    if elastic_user.user:
+      results['msg'] = f'user {elastic_user.user["username"]} exists'
+      module.exit_json(**results)
+    results['operation_result'] = elastic_user.create_user()
+    module.exit_json(**results)
+
+  if state == 'absent':
+    if not elastic_user.user:
+      results['msg'] = f'user {module.params.get("elastic_user")} does not exist'
+    results['operation_result'] = elastic_user.delete_user()
+    module.exit_json(**results)
+  return results
+
 def main():
   module_args=dict(
     host=dict(type='str', required=True),
@@ -145,6 +174,8 @@ def main():
     username=dict(type='str', required=True),
     password=dict(type='str', required=True, no_log=True),
     verify_ssl_cert=dict(type='bool', default=True),
+    pool_connections=dict(type='int', default=10),
+    pool_maxsize=dict(type='int', default=10),
     state=dict(type='str', default='present'),
     elastic_user=dict(type='str', required=True),
     elastic_password=dict(type='str', required=False, no_log=True),
@@ -155,25 +186,20 @@ def main():
     enabled=dict(type='bool', default=True),
     deployment_info=dict(type='dict', default=None)
   )
+  module_args.update(deployments_argument_spec())
 
   results = {'changed': False}
 
-  module = AnsibleModule(argument_spec=module_args, supports_check_mode=False)
-  state = module.params.get('state')
-  elastic_user = ElasticUser(module)
+  module = AnsibleModule(argument_spec=module_args, supports_check_mode=False, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
 
-  if state == 'present':
-    if elastic_user.user:
-      results['msg'] = f'user {elastic_user.user["username"]} exists'
-      module.exit_json(**results)
-    results['operation_result'] = elastic_user.create_user()
-    module.exit_json(**results)
+  if module.params.get('deployments'):
+    exit_with_deployment_results(module, run_on_deployments(module, ElasticUser, manage_user))
 
-  if state == 'absent':
-    if not elastic_user.user:
-      results['msg'] = f'user {module.params.get("elastic_user")} does not exist'
-    results['operation_result'] = elastic_user.delete_user()
-    module.exit_json(**results)
+  elastic_user = ElasticUser(module)
+  results.update(manage_user(module, elastic_user))
+  if results.get('failed'):
+    module.fail_json(**results)
+  module.exit_json(**results)
 
 if __name__ == '__main__':
   main()
\ No newline at end of file
@@ -71,6 +71,11 @@ options:
           Role Permission Data
         spaces:
           List of spaces for the role
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.deployments_options
 '''
 from ansible.module_utils.basic import _ANSIBLE_ARGS, AnsibleModule
 
@@ -83,10 +88,34 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 results = {}
                 
 import json
 
+def manage_userrole(module, kibana):
+    results = {}
+    results['changed'] = False
+    role_name = module.params.get('role_name')
+    body = module.params.get('body')
+    state = module.params.get('state')
+    
+    if role_name and state == "present":
+      
+      userrole_object = kibana.create_userrole(role_name, body)
+      results['userrole_status'] = "User Role Object Created"
+        
+    results['userrole_object'] = userrole_object
+    return results
+
 def main():
 
     module_args=dict(    
@@ -95,32 +124,30 @@ def main():
         username=dict(type='str', required=True),
         password=dict(type='str', no_log=True, required=True),   
         verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
         role_name=dict(type='str', required=True),
         body=dict(type='dict'),
         state=dict(type='str', default='present'),
         deployment_info=dict(type='dict', default=None)
     )
+    module_args.update(deployments_argument_spec())
     
     argument_dependencies = []
         #('state', 'present', ('enabled', 'alert_type', 'conditions', 'actions')),
         #('alert-type', 'metrics_threshold', ('conditions'))
     
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True
-                            )
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
     
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_userrole))
+
     kibana = Kibana(module)
-    results['changed'] = False
-    role_name = module.params.get('role_name')
-    body = module.params.get('body')
-    state = module.params.get('state')
-    
-    if role_name and state == "present":
-      
-      userrole_object = kibana.create_userrole(role_name, body)
-      results['userrole_status'] = "User Role Object Created"
-        
-    results['userrole_object'] = userrole_object
-    
+    results.update(manage_userrole(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 if __name__ == "__main__":
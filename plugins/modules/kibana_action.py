@@ -66,6 +66,11 @@ options:
       action_type: Tyep of Action
       config: Changes based on type of action
       secrets: Secrets for the Action
+
+extends_documentation_fragment:
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.deployments_options
 '''
 
 from ansible.module_utils.six import assertRaisesRegex
@@ -89,29 +94,17 @@ except:
 
 from ansible.module_utils.basic import AnsibleModule
 
-def main():
-  module_args=dict(
-    host=dict(type='str'),
-    port=dict(type='int'),
-    username=dict(type='str', required=True),
-    password=dict(type='str', required=True, no_log=True),
-    verify_ssl_cert=dict(type='bool', default=True),
-    state=dict(type='str', default='present', choices=['present', 'absent']),
-    action_name=dict(type='str'),
-    action_type=dict(type='str', choices=['Email', 'Webhook']), #only the listed choices have been implemented
-    config=dict(type='dict'),
-    deployment_info=dict(type='dict', default=None),
-    secrets=dict(type='dict')
-  )
-
-  argument_dependencies = [
-    ('state', 'present', ('action_name', 'action_type', 'config'))
-  ]
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
 
+def manage_kibana_action(module, kibana):
   results = {'changed': False}
-
-  module = AnsibleModule(argument_spec=module_args, required_if=argument_dependencies, supports_check_mode=True)
-  kibana = Kibana(module)
   
   state = module.params.get('state')
   action_name = module.params.get('action_name')
@@ -143,6 +136,44 @@ def main():
     if not module.check_mode:
       kibana.delete_action()
     module.exit_json(**results)
+  return results
+
+def main():
+  module_args=dict(
+    host=dict(type='str'),
+    port=dict(type='int'),
+    username=dict(type='str', required=True),
+    password=dict(type='str', required=True, no_log=True),
+    verify_ssl_cert=dict(type='bool', default=True),
+    pool_connections=dict(type='int', default=10),
+    pool_maxsize=dict(type='int', default=10),
+    kibana_version=dict(type='str'),
+    version_cache_ttl=dict(type='int', default=3600),
+    state=dict(type='str', default='present', choices=['present', 'absent']),
+    action_name=dict(type='str'),
+    action_type=dict(type='str', choices=['Email', 'Webhook']), #only the listed choices have been implemented
+    config=dict(type='dict'),
+    deployment_info=dict(type='dict', default=None),
+    secrets=dict(type='dict')
+  )
+  module_args.update(deployments_argument_spec())
+
+  argument_dependencies = [
+    ('state', 'present', ('action_name', 'action_type', 'config'))
+  ]
+
+  results = {'changed': False}
+
+  module = AnsibleModule(argument_spec=module_args, required_if=argument_dependencies, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
+
+  if module.params.get('deployments'):
+    exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_kibana_action))
+
+  kibana = Kibana(module)
+  results.update(manage_kibana_action(module, kibana))
+  if results.get('failed'):
+    module.fail_json(**results)
+  module.exit_json(**results)
 
 if __name__ == '__main__':
   main()
\ No newline at end of file
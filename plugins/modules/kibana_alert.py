@@ -162,6 +162,8 @@ options:
 
 extends_documentation_fragment:
   - expedient.elastic.elastic_auth_options.documentation
+  - expedient.elastic.transport_options
+  - expedient.elastic.deployments_options
 '''
 
 
@@ -179,9 +181,18 @@ except:
 from ansible.module_utils.basic import AnsibleModule
 from json import dumps
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
 class KibanaAlert(Kibana):
-  def __init__(self, module):
-    super().__init__(module)
+  def __init__(self, module, deployment_info = None, ece_auth = None):
+    super().__init__(module, deployment_info = deployment_info, ece_auth = ece_auth)
     self.module = module
     self.alert_name = self.module.params.get('alert_name')
     self.alert_type = self.module.params.get('alert_type')
@@ -204,6 +215,39 @@ class KibanaAlert(Kibana):
     head = time_string[:len(time_string) - len(tail)]
     return head, tail
 
+def manage_kibana_alert(module, kibana_alert):
+  results = {'changed': False}
+  state = module.params.get('state')
+  alert = kibana_alert.get_alert_by_name(module.params.get('alert_name'))
+  if state == 'present':
+    if kibana_alert.alert:
+      results['msg'] = f'alert named {kibana_alert.alert_name} exists, and will be updated'
+      if not module.check_mode:
+        update_result = kibana_alert.ensure_alert(alert_id=alert['id'])
+        if update_result is not None:
+          results['msg'] = f'alert named {kibana_alert.alert_name} updated'
+          results['changed'] = True
+        else:
+          results['msg'] = f'identical to existing alert {kibana_alert.alert_name}'
+          results['changed'] = False
+      module.exit_json(**results)
+    results['changed'] = True
+    results['msg'] = f'alert named {module.params.get("alert_name")} will be created'
+    if not module.check_mode:
+      results['alert'] = kibana_alert.ensure_alert()
+      results['msg'] = f'alert named {module.params.get("alert_name")} created'
+    module.exit_json(**results)
+  if state == 'absent':
+    if not kibana_alert.alert:
+      results['msg'] = f'alert named {kibana_alert.alert_name} does not exist'
+      module.exit_json(**results)
+    results['changed'] = True
+    results['msg'] = f'alert named {module.params.get("alert_name")} will be deleted'
+    if not module.check_mode:
+      kibana_alert.delete_alert(alert_id=alert['id'])
+    module.exit_json(**results)
+  return results
+
 def main():
   module_args=dict(
     host=dict(type='str'),
@@ -211,6 +255,8 @@ def main():
     username=dict(type='str', required=True),
     password=dict(type='str', required=True, no_log=True),
     verify_ssl_cert=dict(type='bool', default=True),
+    pool_connections=dict(type='int', default=10),
+    pool_maxsize=dict(type='int', default=10),
     state=dict(type='str', default='present', choices=['present', 'absent']),
     alert_name=dict(type='str', required=True),
     enabled=dict(type='bool', default=True),
@@ -255,6 +301,7 @@ def main():
     deployment_info=dict(type='dict', default=None)
 
   )
+  module_args.update(deployments_argument_spec())
 
   # https://docs.ansible.com/ansible/latest/dev_guide/developing_program_flow_modules.html#argument-spec-dependencies
   argument_dependencies = [
@@ -265,37 +312,16 @@ def main():
 
   results = {'changed': False}
 
-  module = AnsibleModule(argument_spec=module_args, required_if=argument_dependencies, supports_check_mode=True)
-  state = module.params.get('state')
+  module = AnsibleModule(argument_spec=module_args, required_if=argument_dependencies, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
+
+  if module.params.get('deployments'):
+    exit_with_deployment_results(module, run_on_deployments(module, KibanaAlert, manage_kibana_alert))
+
   kibana_alert = KibanaAlert(module)
-  alert = kibana_alert.get_alert_by_name(module.params.get('alert_name'))
-  if state == 'present':
-    if kibana_alert.alert:
-      results['msg'] = f'alert named {kibana_alert.alert_name} exists, and will be updated'
-      if not module.check_mode:
-        update_result = kibana_alert.ensure_alert(alert_id=alert['id'])
-        if update_result is not None:
-          results['msg'] = f'alert named {kibana_alert.alert_name} updated'
-          results['changed'] = True
-        else:
-          results['msg'] = f'identical to existing alert {kibana_alert.alert_name}'
-          results['changed'] = False
-      module.exit_json(**results)
-    results['changed'] = True
-    results['msg'] = f'alert named {module.params.get("alert_name")} will be created'
-    if not module.check_mode:
-      results['alert'] = kibana_alert.ensure_alert()
-      results['msg'] = f'alert named {module.params.get("alert_name")} created'
-    module.exit_json(**results)
-  if state == 'absent':
-    if not kibana_alert.alert:
-      results['msg'] = f'alert named {kibana_alert.alert_name} does not exist'
-      module.exit_json(**results)
-    results['changed'] = True
-    results['msg'] = f'alert named {module.params.get("alert_name")} will be deleted'
-    if not module.check_mode:
-      kibana_alert.delete_alert(alert_id=alert['id'])
-    module.exit_json(**results)
+  results.update(manage_kibana_alert(module, kibana_alert))
+  if results.get('failed'):
+    module.fail_json(**results)
+  module.exit_json(**results)
 
 if __name__ == '__main__':
   main()
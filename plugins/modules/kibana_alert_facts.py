@@ -82,6 +82,9 @@ options:
     
 extends_documentation_fragment:
   - expedient.elastic.elastic_auth_options.documentation
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.deployments_options
 '''
 
 
@@ -97,6 +100,20 @@ except:
 from ansible.module_utils.basic import AnsibleModule
 
 
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+
+def manage_kibana_alert_facts(module, kibana):
+  results = {'changed': False}
+  results['alert_config'] = kibana.get_alert_by_name(module.params.get('alert_name'))
+  return results
+
 def main():
   module_args=dict(
     host=dict(type='str'),
@@ -104,17 +121,27 @@ def main():
     username=dict(type='str', required=True),
     password=dict(type='str', required=True, no_log=True),
     verify_ssl_cert=dict(type='bool', default=True),
+    pool_connections=dict(type='int', default=10),
+    pool_maxsize=dict(type='int', default=10),
+    kibana_version=dict(type='str'),
+    version_cache_ttl=dict(type='int', default=3600),
     state=dict(type='str', default='present', choices=['present', 'absent']),
     alert_name=dict(type='str', required=True),
     deployment_info=dict(type='dict', default=None)
   )
+  module_args.update(deployments_argument_spec())
 
   results = {'changed': False}
 
-  module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+  module = AnsibleModule(argument_spec=module_args, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
+
+  if module.params.get('deployments'):
+    exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_kibana_alert_facts))
 
   kibana = Kibana(module)
-  results['alert_config'] = kibana.get_alert_by_name(module.params.get('alert_name'))
+  results.update(manage_kibana_alert_facts(module, kibana))
+  if results.get('failed'):
+    module.fail_json(**results)
   module.exit_json(**results)
 
 
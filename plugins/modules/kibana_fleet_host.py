@@ -100,6 +100,9 @@ options:
 
 extends_documentation_fragment:
   - expedient.elastic.elastic_auth_options.documentation
+  - expedient.elastic.transport_options
+  - expedient.elastic.kibana_version_options
+  - expedient.elastic.deployments_options
 '''
 
 from ansible.module_utils.basic import AnsibleModule
@@ -113,26 +116,17 @@ except:
   sys.path.append(util_path)
   from kibana import Kibana
 
-def main():
-    module_args=dict(
-        host=dict(type='str'),
-        port=dict(type='int', default=12443),
-        username=dict(type='str', required=True),
-        password=dict(type='str', required=True, no_log=True),
-        verify_ssl_cert=dict(type='bool', default=True),
-        url_type=dict(type='str', choices=['fleet_server', 'elasticsearch'], required=True),
-        urls=dict(type='list', elements='str', required=True),
-        action=dict(type='str', choices=['add', 'overwrite', 'remove'], default='add'),
-        deployment_info=dict(type='dict', default=None)
-    )
-
-    results = {
-        'changed': False,
-        'msg': ''
-        }
+try:
+  from ansible_collections.expedient.elastic.plugins.module_utils.deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
+except:
+  import sys
+  import os
+  util_path = new_path = f'{os.getcwd()}/plugins/module_utils'
+  sys.path.append(util_path)
+  from deployments import run_on_deployments, exit_with_deployment_results, deployments_argument_spec, DEPLOYMENTS_MUTUALLY_EXCLUSIVE
 
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
-    kibana = Kibana(module)
+def manage_kibana_fleet_host(module, kibana):
+    results = {}
     
     action = module.params.get('action')
     url_type = module.params.get('url_type')
@@ -177,7 +171,40 @@ def main():
             results['msg'] += f"\nSuccessful {action}"
             results['fleet_server_urls'] = kibana.get_fleet_server_hosts()
             results['fleet_elasticsearch_urls'] = kibana.get_fleet_elasticsearch_hosts()
+    return results
+
+def main():
+    module_args=dict(
+        host=dict(type='str'),
+        port=dict(type='int', default=12443),
+        username=dict(type='str', required=True),
+        password=dict(type='str', required=True, no_log=True),
+        verify_ssl_cert=dict(type='bool', default=True),
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        kibana_version=dict(type='str'),
+        version_cache_ttl=dict(type='int', default=3600),
+        url_type=dict(type='str', choices=['fleet_server', 'elasticsearch'], required=True),
+        urls=dict(type='list', elements='str', required=True),
+        action=dict(type='str', choices=['add', 'overwrite', 'remove'], default='add'),
+        deployment_info=dict(type='dict', default=None)
+    )
+    module_args.update(deployments_argument_spec())
 
+    results = {
+        'changed': False,
+        'msg': ''
+        }
+
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True, mutually_exclusive=DEPLOYMENTS_MUTUALLY_EXCLUSIVE)
+
+    if module.params.get('deployments'):
+      exit_with_deployment_results(module, run_on_deployments(module, Kibana, manage_kibana_fleet_host))
+
+    kibana = Kibana(module)
+    results.update(manage_kibana_fleet_host(module, kibana))
+    if results.get('failed'):
+      module.fail_json(**results)
     module.exit_json(**results)
 
 